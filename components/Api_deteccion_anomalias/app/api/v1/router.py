@@ -1,8 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.admission import admission
 from app.infrastructure.database import redis_manager
+from app.infrastructure.live_feed import live_feed
 from app.repositories.measurement_repo import MeasurementRepository
 from app.services.anomaly_service import AnomalyService
-from app.models.schemas import MeasurementInput, MeasurementOutput, HistoryResponse
+from app.models.schemas import (
+    MeasurementInput, MeasurementOutput, HistoryResponse, AnomalyPage,
+    MultiHistoryResponse, LatestResponse
+)
 
 router = APIRouter()
 
@@ -11,20 +22,131 @@ def get_service():
     if not client:
         raise HTTPException(status_code=503, detail="Redis no disponible")
     repo = MeasurementRepository(client)
-    return AnomalyService(repo)
+    return AnomalyService(repo, feed=live_feed)
 
+def admitir(request: Request):
+    """Control de admisión: decide el nivel de degradación o rechaza con 503 + Retry-After."""
+    with admission.admit(getattr(request.state, "llegada", None)) as nivel:
+        yield nivel
+
+# 'nivel' va antes que 'service': se decide la admisión antes de construir el servicio
 @router.post("/nuevo", response_model=MeasurementOutput)
-def registrar(data: MeasurementInput, service: AnomalyService = Depends(get_service)):
-    return service.process_measurement(data.sensor_id, data.valor)
+def registrar(
+    data: MeasurementInput,
+    nivel: str = Depends(admitir),
+    service: AnomalyService = Depends(get_service)
+):
+    return service.process_measurement(data.sensor_id, data.valor, round_id=data.round_id, nivel=nivel)
 
 @router.get("/listar", response_model=HistoryResponse)
 def listar(sensor_id: str, service: AnomalyService = Depends(get_service)):
     return service.get_history(sensor_id)
 
+_AGREGACIONES = {"avg", "sum", "min", "max", "range", "count", "first", "last", "std.p", "std.s", "var.p", "var.s", "twa"}
+_REDUCTORES = {"avg", "sum", "min", "max", "range", "count", "std.p", "std.s", "var.p", "var.s"}
+
+# Caracteres con significado en los filtros de etiquetas de TS.MRANGE/TS.MGET
+_CARACTERES_FILTRO = set(",()=")
+
+def _validar_etiqueta(valor: Optional[str], campo: str) -> Optional[str]:
+    if valor and _CARACTERES_FILTRO & set(valor):
+        raise HTTPException(status_code=422, detail=f"'{campo}' no admite los caracteres , ( ) =: {valor}")
+    return valor
+
+def _parse_sensor_ids(sensor_ids: Optional[str]):
+    ids = [s.strip() for s in sensor_ids.split(",") if s.strip()] if sensor_ids else None
+    for sensor_id in ids or []:
+        _validar_etiqueta(sensor_id, "sensor_ids")
+    return ids
+
+@router.get("/multi", response_model=MultiHistoryResponse)
+def listar_multi(
+    sensor_ids: Optional[str] = None,
+    kind: Optional[str] = None,
+    desde: Optional[float] = None,
+    hasta: Optional[float] = None,
+    agregacion: Optional[str] = None,
+    bucket_ms: int = Query(60000, ge=1),
+    agrupar_por: Optional[str] = None,
+    reducir: Optional[str] = None,
+    service: AnomalyService = Depends(get_service)
+):
+    """Histórico de varios sensores en una sola consulta (TS.MRANGE por etiquetas)."""
+    if agregacion and agregacion not in _AGREGACIONES:
+        raise HTTPException(status_code=422, detail=f"Agregación no soportada: {agregacion}")
+    if bool(agrupar_por) != bool(reducir):
+        raise HTTPException(status_code=422, detail="'agrupar_por' y 'reducir' van juntos")
+    if reducir and reducir not in _REDUCTORES:
+        raise HTTPException(status_code=422, detail=f"Reductor no soportado: {reducir}")
+    return service.get_multi_history(
+        sensor_ids=_parse_sensor_ids(sensor_ids),
+        kind=_validar_etiqueta(kind, "kind"),
+        desde=int(desde * 1000) if desde is not None else "-",
+        hasta=int(hasta * 1000) if hasta is not None else "+",
+        aggregation=agregacion,
+        bucket_ms=bucket_ms,
+        group_by=agrupar_por,
+        reduce=reducir
+    )
+
+@router.get("/ultimos", response_model=LatestResponse)
+def ultimos_valores(
+    sensor_ids: Optional[str] = None,
+    kind: Optional[str] = None,
+    service: AnomalyService = Depends(get_service)
+):
+    """Último valor de varios sensores en una sola consulta (TS.MGET por etiquetas)."""
+    return service.get_latest_values(sensor_ids=_parse_sensor_ids(sensor_ids), kind=_validar_etiqueta(kind, "kind"))
+
+@router.get("/anomalias", response_model=AnomalyPage)
+def listar_anomalias(
+    desde: Optional[float] = None,
+    hasta: Optional[float] = None,
+    sensor_id: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=settings.ANOMALY_PAGE_MAX),
+    service: AnomalyService = Depends(get_service)
+):
+    # Por defecto: la última semana
+    hasta = hasta if hasta is not None else time.time()
+    desde = desde if desde is not None else hasta - 7 * 86400
+    if desde > hasta:
+        raise HTTPException(status_code=422, detail="'desde' debe ser anterior a 'hasta'")
+    return service.list_anomalies(desde, hasta, sensor_id=sensor_id, offset=offset, limit=limit)
+
 @router.get("/detectar")
 def detectar_anomalia(
     sensor_id: str, 
     valor: float, 
+    nivel: str = Depends(admitir),
     service: AnomalyService = Depends(get_service)
 ):
-    return service.evaluate_measurement(sensor_id, valor)
\ No newline at end of file
+    return service.evaluate_measurement(sensor_id, valor, nivel=nivel)
+
+@router.get("/stream")
+async def stream(sensor_id: Optional[str] = None, solo_anomalias: bool = False):
+    """Feed en vivo (Server-Sent Events) de mediciones y anomalías confirmadas."""
+    client = live_feed.subscribe(sensor_id=sensor_id, solo_anomalias=solo_anomalias)
+
+    async def eventos():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(client.queue.get(), timeout=settings.FEED_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comentario SSE para mantener viva la conexión a través de proxies
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    # Expulsado por consumidor lento
+                    yield "event: expulsado\ndata: {}\n\n"
+                    break
+                yield f"event: {event['tipo']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            live_feed.unsubscribe(client)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
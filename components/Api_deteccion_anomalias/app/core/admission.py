@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_TOTAL
+
+logger = logging.getLogger("admission")
+
+# Niveles de degradación, de más caro a más barato
+NIVEL_COMPLETO = "completo"   # Ensemble completo (IF + Autoencoder + LSTM + regla + online)
+NIVEL_LIGERO = "ligero"       # Solo votantes baratos: regla física + Isolation Forest + online
+NIVEL_FISICO = "fisico"       # Solo la regla física (value > 100.0)
+
+
+class Overloaded(Exception):
+    """La petición no se admite ni siquiera en el nivel más barato."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Sobrecarga")
+        self.retry_after = retry_after
+
+
+class ArrivalTimeMiddleware:
+    """
+    Middleware ASGI que anota el instante de llegada de cada petición en request.state.
+    La diferencia con el inicio real del handler es el retraso de cola (espera de hilo).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["llegada"] = time.perf_counter()
+        await self.app(scope, receive, send)
+
+
+class AdmissionController:
+    """
+    Control de admisión por worker: peticiones de inferencia en vuelo y retraso de cola.
+    Al superar los umbrales primero degrada a votantes baratos y, solo después, rechaza.
+    Mejor perder precisión que perder la medición por el timeout de 5s del sensor.
+    """
+
+    def __init__(self):
+        self._inflight = 0
+        self._lock = threading.Lock()
+        # Avisos por nivel: instante del último y peticiones acumuladas desde entonces
+        self._ultimo_aviso = {}
+        self._sin_avisar = {}
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def _nivel(self, inflight: int, delay_ms: float) -> Optional[str]:
+        if inflight > settings.ADMISSION_REJECT_INFLIGHT or delay_ms > settings.ADMISSION_REJECT_DELAY_MS:
+            return None
+        if inflight > settings.ADMISSION_PHYSICAL_INFLIGHT or delay_ms > settings.ADMISSION_PHYSICAL_DELAY_MS:
+            return NIVEL_FISICO
+        if inflight > settings.ADMISSION_LIGHT_INFLIGHT or delay_ms > settings.ADMISSION_LIGHT_DELAY_MS:
+            return NIVEL_LIGERO
+        return NIVEL_COMPLETO
+
+    @contextmanager
+    def admit(self, llegada: Optional[float] = None):
+        """Reserva un hueco de inferencia y devuelve el nivel de degradación a aplicar."""
+        delay_ms = (time.perf_counter() - llegada) * 1000 if llegada else 0.0
+        with self._lock:
+            nivel = self._nivel(self._inflight + 1, delay_ms)
+            if nivel is not None:
+                self._inflight += 1
+            inflight = self._inflight
+
+        if nivel is None:
+            ADMISSION_TOTAL.labels(nivel="rechazado").inc()
+            peticiones = self._aviso_pendiente("rechazado")
+            if peticiones:
+                logger.warning(f"Petición rechazada por sobrecarga (en vuelo={inflight}, cola={delay_ms:.0f}ms; "
+                               f"rechazos desde el último aviso: {peticiones})")
+            raise Overloaded(settings.ADMISSION_RETRY_AFTER_SECONDS)
+
+        ADMISSION_TOTAL.labels(nivel=nivel).inc()
+        if nivel != NIVEL_COMPLETO:
+            peticiones = self._aviso_pendiente(nivel)
+            if peticiones:
+                logger.warning(f"Degradación '{nivel}' (en vuelo={inflight}, cola={delay_ms:.0f}ms; "
+                               f"peticiones desde el último aviso: {peticiones})")
+        try:
+            yield nivel
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    def _aviso_pendiente(self, nivel: str) -> int:
+        """
+        Limita el log en plena sobrecarga: como mucho un aviso por nivel cada
+        ADMISSION_LOG_INTERVAL_SECONDS. Devuelve las peticiones a incluir en el aviso (0 = callar).
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            self._sin_avisar[nivel] = self._sin_avisar.get(nivel, 0) + 1
+            ultimo = self._ultimo_aviso.get(nivel)
+            if ultimo is not None and ahora - ultimo < settings.ADMISSION_LOG_INTERVAL_SECONDS:
+                return 0
+            self._ultimo_aviso[nivel] = ahora
+            return self._sin_avisar.pop(nivel)
+
+
+admission = AdmissionController()
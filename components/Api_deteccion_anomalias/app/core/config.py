@@ -14,6 +14,47 @@ class Settings(BaseSettings):
     
     WINDOW_SIZE: int = int(os.getenv("WINDOW_SIZE", 10))
 
+    # Etiquetas de las series temporales (TS.MRANGE / TS.MGET)
+    CLUSTER_NAME: str = os.getenv("CLUSTER_NAME", "aeroguard")
+    AGGREGATE_SENSOR_ID: str = os.getenv("AGGREGATE_SENSOR_ID", "CLUSTER_AGGREGATE")
+
+    # Segundos antes de reintentar la carga de modelos tras un fallo (mientras, modo fallback)
+    MODEL_RETRY_SECONDS: float = float(os.getenv("MODEL_RETRY_SECONDS", 60))
+
+    # Consenso M-of-N
+    VOTE_QUORUM: int = int(os.getenv("VOTE_QUORUM", 3))
+
+    # Votante de estadística online por sensor (Welford + EWMA)
+    # Desactivado por defecto: al activarlo el consenso pasa de 3-de-4 a VOTE_QUORUM-de-5
+    ONLINE_VOTER_ENABLED: bool = os.getenv("ONLINE_VOTER_ENABLED", "false").lower() == "true"
+    ONLINE_MIN_SAMPLES: int = int(os.getenv("ONLINE_MIN_SAMPLES", 30))
+    ONLINE_Z_THRESHOLD: float = float(os.getenv("ONLINE_Z_THRESHOLD", 4.0))
+    ONLINE_EWMA_ALPHA: float = float(os.getenv("ONLINE_EWMA_ALPHA", 0.1))
+    ONLINE_EWMA_BAND_K: float = float(os.getenv("ONLINE_EWMA_BAND_K", 4.0))
+
+    # Control de admisión (por worker). Umbrales de peticiones en vuelo y retraso de cola (ms).
+    # Se degrada primero a votantes baratos, luego a la regla física y solo al final se rechaza.
+    ADMISSION_LIGHT_INFLIGHT: int = int(os.getenv("ADMISSION_LIGHT_INFLIGHT", 8))
+    ADMISSION_LIGHT_DELAY_MS: float = float(os.getenv("ADMISSION_LIGHT_DELAY_MS", 250))
+    ADMISSION_PHYSICAL_INFLIGHT: int = int(os.getenv("ADMISSION_PHYSICAL_INFLIGHT", 16))
+    ADMISSION_PHYSICAL_DELAY_MS: float = float(os.getenv("ADMISSION_PHYSICAL_DELAY_MS", 1000))
+    ADMISSION_REJECT_INFLIGHT: int = int(os.getenv("ADMISSION_REJECT_INFLIGHT", 32))
+    ADMISSION_REJECT_DELAY_MS: float = float(os.getenv("ADMISSION_REJECT_DELAY_MS", 3000))
+    ADMISSION_RETRY_AFTER_SECONDS: int = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", 2))
+    # Como mucho un aviso en el log por nivel y ventana (ADMISSION_TOTAL ya cuenta cada petición)
+    ADMISSION_LOG_INTERVAL_SECONDS: float = float(os.getenv("ADMISSION_LOG_INTERVAL_SECONDS", 10))
+    # Quórum en modo ligero (regla + IF + online): mayoría simple
+    LIGHT_VOTE_QUORUM: int = int(os.getenv("LIGHT_VOTE_QUORUM", 2))
+
+    # Índice de anomalías (consultas forenses por rango)
+    ANOMALY_RETENTION_MS: int = int(os.getenv("ANOMALY_RETENTION_MS", 30 * 86400000))
+    ANOMALY_PAGE_MAX: int = int(os.getenv("ANOMALY_PAGE_MAX", 500))
+
+    # Feed en vivo (SSE sobre Redis Pub/Sub)
+    FEED_CHANNEL: str = os.getenv("FEED_CHANNEL", "sentinel:feed")
+    FEED_CLIENT_BUFFER: int = int(os.getenv("FEED_CLIENT_BUFFER", 100))
+    FEED_KEEPALIVE_SECONDS: float = float(os.getenv("FEED_KEEPALIVE_SECONDS", 15))
+
     class Config:
         case_sensitive = True
 
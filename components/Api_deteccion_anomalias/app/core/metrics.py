@@ -0,0 +1,50 @@
+import os
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+# Buckets pensados para etapas de milisegundos (Redis, scaler) hasta segundos (TensorFlow)
+_STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Etapas de una petición: repo.save, scaler.transform, vote, ...
+STAGE_SECONDS = Histogram(
+    "sentinel_stage_seconds", "Duración de cada etapa del procesamiento de una medición",
+    ["stage"], buckets=_STAGE_BUCKETS
+)
+
+# Predicción de cada votante del ensemble
+VOTER_SECONDS = Histogram(
+    "sentinel_voter_seconds", "Duración de la predicción de cada votante",
+    ["voter"], buckets=_STAGE_BUCKETS
+)
+
+VERDICTS_TOTAL = Counter(
+    "sentinel_verdicts_total", "Veredictos emitidos", ["resultado"]
+)
+
+REDIS_RECONNECTS_TOTAL = Counter(
+    "sentinel_redis_reconnects_total", "Intentos de (re)conexión a Redis vía Sentinel", ["resultado"]
+)
+
+ADMISSION_TOTAL = Counter(
+    "sentinel_admission_total", "Decisiones del control de admisión por nivel de degradación", ["nivel"]
+)
+
+MODEL_LOAD_SECONDS = Histogram(
+    "sentinel_model_load_seconds", "Tiempo de carga de los artefactos de IA",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+
+def render_metrics():
+    """
+    Serializa las métricas en formato Prometheus.
+    Con gunicorn cada worker es un proceso: si PROMETHEUS_MULTIPROC_DIR está definido,
+    agregamos los ficheros de todos los workers en lugar de exponer solo el actual.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
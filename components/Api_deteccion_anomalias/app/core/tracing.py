@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger("tracing")
+
+
+class Tracer:
+    """
+    Spans de la fase de inferencia, correlacionados por el round_id que envía el líder.
+    Mismo formato JSONL que el nodo sensor para poder unir ambos ficheros en el informe.
+      - TRACE_FILE: fichero JSONL local (escrituras en modo append, seguras entre workers).
+      - TRACE_COLLECTOR_URL: colector HTTP que recibe lotes de spans (POST JSON).
+    """
+
+    _BATCH_SIZE = 50
+
+    def __init__(self, file_path: Optional[str] = None, collector_url: Optional[str] = None, component: str = "api"):
+        self.file_path = file_path
+        self.collector_url = collector_url
+        self.component = component
+        self.host = socket.gethostname()
+        self._file_lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        if collector_url:
+            self._queue = queue.Queue(maxsize=10000)
+            threading.Thread(target=self._ship, daemon=True, name="TraceShipper").start()
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(file_path=os.getenv("TRACE_FILE"), collector_url=os.getenv("TRACE_COLLECTOR_URL"))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.file_path or self.collector_url)
+
+    @contextmanager
+    def span(self, name: str, round_id: Optional[str], **attrs):
+        start = time.time()
+        try:
+            yield attrs
+        finally:
+            if self.enabled and round_id:
+                end = time.time()
+                self.export({
+                    "round_id": round_id,
+                    "name": name,
+                    "component": self.component,
+                    "host": self.host,
+                    "start": start,
+                    "end": end,
+                    "duration_ms": (end - start) * 1000,
+                    "attrs": attrs,
+                })
+
+    def export(self, span: dict) -> None:
+        if self.file_path:
+            line = json.dumps(span) + "\n"
+            try:
+                with self._file_lock, open(self.file_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                logger.warning(f"No se pudo escribir el span en {self.file_path}: {e}")
+        if self._queue is not None:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                pass
+
+    def _ship(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self._BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            request = urllib.request.Request(
+                self.collector_url, data=json.dumps(batch).encode("utf-8"),
+                headers={"Content-Type": "application/json"}, method="POST"
+            )
+            try:
+                urllib.request.urlopen(request, timeout=2.0).close()
+            except Exception as e:
+                logger.warning(f"Colector de trazas no disponible ({e}). Se descartan {len(batch)} spans.")
+
+
+tracer = Tracer.from_env()
@@ -0,0 +1,19 @@
+import os
+import shutil
+from prometheus_client import multiprocess
+
+# Directorio compartido donde cada worker vuelca sus métricas (modo multiproceso)
+_METRICS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+    # Limpiamos métricas de ejecuciones anteriores para no arrastrar contadores viejos
+    if _METRICS_DIR:
+        shutil.rmtree(_METRICS_DIR, ignore_errors=True)
+        os.makedirs(_METRICS_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Limpia las métricas "live" del worker que ha terminado
+    if _METRICS_DIR:
+        multiprocess.mark_process_dead(worker.pid)
@@ -3,6 +3,7 @@ from redis.sentinel import Sentinel
 import time
 import logging
 from app.core.config import settings
+from app.core.metrics import REDIS_RECONNECTS_TOTAL
 
 logger = logging.getLogger("infrastructure")
 logging.basicConfig(level=logging.INFO)
@@ -30,8 +31,10 @@ class RedisManager:
                 )
                 if self.master_connection.ping():
                     logger.info("✅ Conectado a Redis Master")
+                    REDIS_RECONNECTS_TOTAL.labels(resultado="ok").inc()
                     return
             except Exception as e:
+                REDIS_RECONNECTS_TOTAL.labels(resultado="error").inc()
                 logger.warning(f"⚠️ Redis no listo ({e}). Reintentando en {delay}s...")
                 time.sleep(delay)
                 retries -= 1
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import Optional, Set
+
+from app.core.config import settings
+from app.infrastructure.database import redis_manager
+
+logger = logging.getLogger("live_feed")
+
+
+class FeedClient:
+    """Suscriptor SSE conectado a este worker, con buffer acotado."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, sensor_id: Optional[str], solo_anomalias: bool):
+        self.loop = loop
+        self.sensor_id = sensor_id
+        self.solo_anomalias = solo_anomalias
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.FEED_CLIENT_BUFFER)
+        self.evicted = False
+
+    def accepts(self, event: dict) -> bool:
+        if self.sensor_id and event.get("sensor_id") != self.sensor_id:
+            return False
+        if self.solo_anomalias and event.get("tipo") != "anomalia":
+            return False
+        return True
+
+
+class LiveFeed:
+    """
+    Difusión en vivo de mediciones y anomalías.
+    Cada worker publica sus veredictos en un canal Redis Pub/Sub y mantiene
+    UN solo hilo suscriptor que reparte los eventos a sus clientes SSE locales.
+    Así todos los workers y réplicas comparten el mismo feed.
+    """
+
+    def __init__(self):
+        self._clients: Set[FeedClient] = set()
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+
+    # --- Publicación (lado productor) ---
+    def publish(self, redis_client, event: dict) -> None:
+        # Admite un cliente o un pipeline (la ingesta lo encola junto al veredicto).
+        # El feed es best-effort: nunca debe tumbar la ingesta
+        try:
+            redis_client.publish(settings.FEED_CHANNEL, json.dumps(event))
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo publicar en el feed en vivo: {e}")
+
+    # --- Suscripción (lado consumidor) ---
+    def subscribe(self, sensor_id: Optional[str] = None, solo_anomalias: bool = False) -> FeedClient:
+        client = FeedClient(asyncio.get_running_loop(), sensor_id, solo_anomalias)
+        with self._lock:
+            self._clients.add(client)
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, daemon=True, name="LiveFeedListener")
+                self._listener.start()
+        return client
+
+    def unsubscribe(self, client: FeedClient) -> None:
+        with self._lock:
+            self._clients.discard(client)
+
+    def _listen(self):
+        """Hilo único por worker: Redis Pub/Sub -> colas de los clientes."""
+        pubsub = None
+        while True:
+            with self._lock:
+                if not self._clients:
+                    # Sin clientes no mantenemos la suscripción abierta
+                    self._listener = None
+                    break
+            try:
+                if pubsub is None:
+                    pubsub = redis_manager.get_client().pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(settings.FEED_CHANNEL)
+                message = pubsub.get_message(timeout=0.4)
+                if message and message.get("type") == "message":
+                    self._dispatch(json.loads(message["data"]))
+            except Exception as e:
+                logger.warning(f"⚠️ Suscripción al feed caída ({e}). Reintentando...")
+                pubsub = None
+                threading.Event().wait(1.0)
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+    def _dispatch(self, event: dict):
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            if client.accepts(event):
+                client.loop.call_soon_threadsafe(self._deliver, client, event)
+
+    def _deliver(self, client: FeedClient, event: dict):
+        # Se ejecuta dentro del event loop del cliente
+        if client.evicted:
+            return
+        try:
+            client.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Consumidor lento: lo expulsamos en lugar de acumular memoria
+            logger.warning(f"🐢 Cliente del feed expulsado por buffer lleno ({settings.FEED_CLIENT_BUFFER} eventos).")
+            client.evicted = True
+            self.unsubscribe(client)
+            while not client.queue.empty():
+                client.queue.get_nowait()
+            client.queue.put_nowait(None)
+
+
+live_feed = LiveFeed()
@@ -1,10 +1,23 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from app.infrastructure.database import redis_manager
 from app.api.v1.router import router
 from app.core.config import settings
+from app.core.metrics import render_metrics
+from app.core.admission import ArrivalTimeMiddleware, Overloaded
 # Eliminamos 'import uvicorn' porque solo lo usa el bloque __main__
 
 app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION)
+app.add_middleware(ArrivalTimeMiddleware)
+
+# Sobrecarga: el sensor debe reintentar más tarde en vez de esperar hasta su timeout
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "API sobrecargada", "nivel_degradacion": "rechazado"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 @app.on_event("startup")
 async def startup():
@@ -28,4 +41,10 @@ def health_check():
     # Devolver 503 hace que el healthcheck de Docker falle y reinicie el contenedor
     raise HTTPException(status_code=503, detail="Redis connection failed during health check")
 
+# --- MÉTRICAS PROMETHEUS (agregadas entre workers de gunicorn) ---
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # NO DEBE HABER NADA MÁS DEBAJO. NO if __name__ == "__main__":
\ No newline at end of file
@@ -5,6 +5,7 @@ class MeasurementInput(BaseModel):
     sensor_id: str = Field(..., min_length=1, example="sensor-01")
     valor: float
     timestamp: Optional[float] = None 
+    round_id: Optional[str] = None
 
 class MeasurementOutput(BaseModel):
     sensor_id: str
@@ -12,6 +13,8 @@ class MeasurementOutput(BaseModel):
     timestamp: float
     procesado_por: str
     es_anomalia: bool
+    round_id: Optional[str] = None
+    nivel_degradacion: str = "completo"
     
     class Config:
         from_attributes = True
@@ -19,4 +22,32 @@ class MeasurementOutput(BaseModel):
 class HistoryResponse(BaseModel):
     sensor_id: str
     total_records: int
-    measurements: List[dict]
\ No newline at end of file
+    measurements: List[dict]
+
+class AnomalyEvent(BaseModel):
+    sensor_id: str
+    timestamp: float
+    votos_consenso: int
+    detalles: dict
+
+class AnomalyPage(BaseModel):
+    sensor_id: Optional[str] = None
+    desde: float
+    hasta: float
+    total: int
+    offset: int
+    limit: int
+    anomalias: List[AnomalyEvent]
+
+class SeriesData(BaseModel):
+    key: str
+    labels: dict
+    measurements: List[dict]
+
+class MultiHistoryResponse(BaseModel):
+    total_series: int
+    series: List[SeriesData]
+
+class LatestResponse(BaseModel):
+    total_series: int
+    latest: List[dict]
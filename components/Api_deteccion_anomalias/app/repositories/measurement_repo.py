@@ -1,34 +1,170 @@
 from redis import Redis
 from redis.exceptions import ResponseError
+import json
 import logging
+from app.core.config import settings
 
 logger = logging.getLogger("repository")
 
+# Series a las que este proceso ya ha asegurado las etiquetas (1 TS.ALTER por serie y worker)
+_LABELED_KEYS = set()
+
 class MeasurementRepository:
+    # Índice global de anomalías confirmadas (score = timestamp en ms)
+    ANOMALY_INDEX_KEY = "anomalias:index"
+    # Reintentos al desplazar una medición que choca en el mismo milisegundo
+    _DUPLICATE_RETRIES = 3
+
     def __init__(self, redis_client: Redis):
         self.redis = redis_client
         self.RETENTION_MS = 86400000
 
+    @staticmethod
+    def _labels(sensor_id: str, kind: str = None) -> dict:
+        """Etiquetas de la serie: permiten consultar N sensores con un solo TS.MRANGE/TS.MGET."""
+        if kind is None:
+            kind = "aggregate" if sensor_id == settings.AGGREGATE_SENSOR_ID else "raw"
+        return {"sensor_id": sensor_id, "cluster": settings.CLUSTER_NAME, "kind": kind}
+
+    def _ensure_labels(self, key: str, labels: dict) -> None:
+        # Las series creadas antes de etiquetar no reciben LABELS en TS.ADD: las migramos una vez
+        if key in _LABELED_KEYS:
+            return
+        try:
+            self.redis.ts().alter(key, labels=labels)
+            _LABELED_KEYS.add(key)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo etiquetar la serie {key}: {e}")
+
     def save(self, sensor_id: str, value: float, timestamp: float = None) -> int:
         key = f"sensor:{sensor_id}:ts"
+        labels = self._labels(sensor_id)
         
         try:
             # Capturamos el timestamp que Redis genera
-            ts_ms = self.redis.ts().add(key, "*", value) 
+            ts_ms = self.redis.ts().add(key, "*", value, retention_msecs=self.RETENTION_MS, labels=labels)
+            self._ensure_labels(key, labels)
             # Devolvemos el timestamp en segundos (dividir por 1000)
             return ts_ms / 1000 
         except ResponseError as e:
+            if "DUPLICATE_POLICY" in str(e):
+                return self._save_after_last(key, value, labels)
             if "key does not exist" in str(e):
                 try:
-                    self.redis.ts().create(key, retention_msecs=self.RETENTION_MS)
+                    self.redis.ts().create(key, retention_msecs=self.RETENTION_MS, labels=labels)
                     return self.save(sensor_id, value)
                 except:
                     pass
             raise e
 
+    def _save_after_last(self, key: str, value: float, labels: dict) -> float:
+        """
+        Dos mediciones de la misma serie en el mismo milisegundo: con la política BLOCK
+        (la de por defecto) Redis rechaza la segunda. En lugar de perderla (ON_DUPLICATE LAST)
+        o devolver un 500, se guarda en el milisegundo siguiente al último de la serie.
+        """
+        for intento in range(self._DUPLICATE_RETRIES):
+            last_ts = self.redis.ts().get(key)[0]
+            try:
+                ts_ms = self.redis.ts().add(key, last_ts + 1, value, retention_msecs=self.RETENTION_MS, labels=labels)
+                return ts_ms / 1000
+            except ResponseError as e:
+                # Otro worker ha ocupado ese milisegundo entre el GET y el ADD: se reintenta
+                if "DUPLICATE_POLICY" not in str(e) or intento == self._DUPLICATE_RETRIES - 1:
+                    raise
+
     def get_all(self, sensor_id: str):
         key = f"sensor:{sensor_id}:ts"
         try:
             return self.redis.ts().range(key, "-", "+")
         except:
-            return []
\ No newline at end of file
+            return []
+
+    @staticmethod
+    def _label_filters(sensor_ids=None, kind: str = None) -> list:
+        # TS.MRANGE exige al menos un matcher de igualdad: el clúster siempre lo es
+        filtros = [f"cluster={settings.CLUSTER_NAME}"]
+        if sensor_ids:
+            filtros.append(f"sensor_id=({','.join(sensor_ids)})")
+        if kind:
+            filtros.append(f"kind={kind}")
+        return filtros
+
+    def get_many(self, sensor_ids=None, kind: str = None, desde="-", hasta="+",
+                 aggregation: str = None, bucket_ms: int = 0, group_by: str = None, reduce: str = None):
+        """Rango de muchas series en UNA ida y vuelta (TS.MRANGE por filtro de etiquetas)."""
+        kwargs = {}
+        if aggregation:
+            kwargs.update(aggregation_type=aggregation, bucket_size_msec=bucket_ms)
+        if group_by:
+            kwargs.update(groupby=group_by, reduce=reduce)
+        try:
+            raw = self.redis.ts().mrange(
+                desde, hasta, self._label_filters(sensor_ids, kind), with_labels=True, **kwargs
+            )
+        except Exception as e:
+            logger.error(f"Error en TS.MRANGE: {e}")
+            return []
+        series = []
+        for item in raw:
+            for key, (labels, samples) in item.items():
+                series.append({"key": key, "labels": labels, "samples": samples})
+        return series
+
+    def get_latest(self, sensor_ids=None, kind: str = None):
+        """Último valor de muchas series en UNA ida y vuelta (TS.MGET)."""
+        try:
+            raw = self.redis.ts().mget(self._label_filters(sensor_ids, kind), with_labels=True)
+        except Exception as e:
+            logger.error(f"Error en TS.MGET: {e}")
+            return []
+        latest = []
+        for item in raw:
+            for key, (labels, ts, value) in item.items():
+                latest.append({"key": key, "labels": labels, "time": ts / 1000 if ts else None, "value": value})
+        return latest
+
+    def record_verdict(self, sensor_id: str, ts_ms: int, votos: int, es_anomalia: bool, detalles: dict,
+                       extra=None) -> None:
+        """
+        Guarda el veredicto en un índice compacto:
+        - Serie de votos por sensor (sensor:{id}:votes) para ver la tendencia del consenso.
+        - Sorted sets (global y por sensor) SOLO con las anomalías confirmadas.
+        'extra(pipe)' añade comandos a la misma ida y vuelta (p. ej. el PUBLISH del feed en vivo).
+        """
+        votes_key = f"sensor:{sensor_id}:votes"
+        votes_labels = self._labels(sensor_id, kind="votes")
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.ts().add(
+            votes_key, ts_ms, votos,
+            retention_msecs=self.RETENTION_MS, duplicate_policy="last",
+            labels=votes_labels
+        )
+        if es_anomalia:
+            evento = json.dumps({
+                "sensor_id": sensor_id,
+                "timestamp": ts_ms / 1000,
+                "votos_consenso": votos,
+                "detalles": detalles,
+            })
+            limite = ts_ms - settings.ANOMALY_RETENTION_MS
+            for key in (self.ANOMALY_INDEX_KEY, f"anomalias:sensor:{sensor_id}"):
+                pipe.zadd(key, {evento: ts_ms})
+                # Retención: podamos lo antiguo en la misma ida y vuelta
+                pipe.zremrangebyscore(key, "-inf", f"({limite}")
+        if extra is not None:
+            extra(pipe)
+        pipe.execute()
+        # Las series de votos creadas sin LABELS también se migran (si no, MRANGE/MGET no las ven)
+        self._ensure_labels(votes_key, votes_labels)
+
+    def get_anomalies(self, desde_ms: int, hasta_ms: int, sensor_id: str = None, offset: int = 0, limit: int = 100):
+        """Anomalías en [desde, hasta] paginadas. Coste O(log N + anomalías devueltas)."""
+        key = f"anomalias:sensor:{sensor_id}" if sensor_id else self.ANOMALY_INDEX_KEY
+        try:
+            total = self.redis.zcount(key, desde_ms, hasta_ms)
+            eventos = self.redis.zrangebyscore(key, desde_ms, hasta_ms, start=offset, num=limit)
+            return total, [json.loads(e) for e in eventos]
+        except Exception as e:
+            logger.error(f"Error consultando índice de anomalías: {e}")
+            return 0, []
@@ -1,4 +1,5 @@
 import socket
+import threading
 import time
 import logging
 import numpy as np
@@ -11,127 +12,280 @@ try:
 except ImportError:
     load_model = None
 
+from app.core.config import settings
+from app.core.admission import NIVEL_COMPLETO, NIVEL_FISICO
+from app.core.tracing import tracer
+from app.core.metrics import STAGE_SECONDS, VOTER_SECONDS, VERDICTS_TOTAL, MODEL_LOAD_SECONDS
 from app.repositories.measurement_repo import MeasurementRepository
+from app.services.online_stats import online_stats
 
 logger = logging.getLogger("service")
 
+# Artefactos cargados una sola vez por worker (el servicio se instancia en cada petición)
+_ARTEFACTOS = {}
+_ARTEFACTOS_LOCK = threading.Lock()
+# Último fallo de carga por ruta (time.monotonic): evita releer los joblib en cada petición
+_FALLOS_CARGA = {}
+
+# Rutas absolutas dentro del contenedor (/code/app/models)
+# O relativas si estamos en local
+MODELS_DIR = "/code/app/models" if os.path.exists("/code/app/models") else "app/models"
+
+
+def load_artifacts(base_path: str = MODELS_DIR):
+    """
+    Carga un juego de modelos (scaler, IF, Autoencoder, LSTM) desde un directorio.
+    La usa el servicio y también el replay offline para puntuar con juegos candidatos.
+    """
+    # 1. Cargar Scikit-Learn
+    scaler = joblib.load(os.path.join(base_path, "scaler.joblib"))
+    isolation_model = joblib.load(os.path.join(base_path, "isolation_forest.joblib"))
+
+    # 2. Cargar TensorFlow
+    if load_model:
+        # compile=False hace que la carga sea más rápida y segura en producción
+        autoencoder = load_model(os.path.join(base_path, "autoencoder_model.h5"), compile=False)
+        lstm_model = load_model(os.path.join(base_path, "lstm_model.h5"), compile=False)
+    else:
+        raise ImportError("Librería TensorFlow no encontrada")
+    return scaler, isolation_model, autoencoder, lstm_model
+
+
 class AnomalyService:
-    def __init__(self, repo: MeasurementRepository):
+    # Umbrales de sensibilidad (Basados en tu entrenamiento)
+    # Si el error de reconstrucción supera esto, es anomalía
+    AE_THRESHOLD = 0.5
+    LSTM_THRESHOLD = 0.5
+
+    def __init__(self, repo: MeasurementRepository, feed=None):
         self.repo = repo
+        self.feed = feed
         self.hostname = socket.gethostname()
         self.model_loaded = False
         
-        # Rutas absolutas dentro del contenedor (/code/app/models)
-        # O relativas si estamos en local
-        base_path = "/code/app/models" if os.path.exists("/code/app/models") else "app/models"
+        base_path = MODELS_DIR
         
         self.SCALER_PATH = os.path.join(base_path, "scaler.joblib")
         self.ISO_PATH = os.path.join(base_path, "isolation_forest.joblib")
         self.AE_PATH = os.path.join(base_path, "autoencoder_model.h5")
         self.LSTM_PATH = os.path.join(base_path, "lstm_model.h5")
-        
-        # Umbrales de sensibilidad (Basados en tu entrenamiento)
-        # Si el error de reconstrucción supera esto, es anomalía
-        self.AE_THRESHOLD = 0.5  
-        self.LSTM_THRESHOLD = 0.5
-        
+
         self._load_models()
 
     def _load_models(self):
-        try:
-            logger.info("🔄 Cargando red neuronal y modelos estadísticos...")
-            
-            # 1. Cargar Scikit-Learn
-            self.scaler = joblib.load(self.SCALER_PATH)
-            self.isolation_model = joblib.load(self.ISO_PATH)
-            
-            # 2. Cargar TensorFlow
-            if load_model:
-                # compile=False hace que la carga sea más rápida y segura en producción
-                self.autoencoder = load_model(self.AE_PATH, compile=False)
-                self.lstm_model = load_model(self.LSTM_PATH, compile=False)
-            else:
-                raise ImportError("Librería TensorFlow no encontrada")
-
-            self.model_loaded = True
-            logger.info("✅ CEREBRO CARGADO: Sistema de Votación 4-Way listo.")
-        except Exception as e:
-            logger.error(f"⚠️ Error crítico cargando modelos IA: {e}. Activando modo fallback.")
+        artefactos = _ARTEFACTOS.get(self.SCALER_PATH)
+        if artefactos is None and not self._en_espera_reintento():
+            try:
+                with _ARTEFACTOS_LOCK:
+                    artefactos = _ARTEFACTOS.get(self.SCALER_PATH)
+                    # Otro hilo puede haber fallado mientras esperábamos el lock: no se repite la carga
+                    if artefactos is None and not self._en_espera_reintento():
+                        artefactos = self._read_artifacts()
+                        _ARTEFACTOS[self.SCALER_PATH] = artefactos
+                        _FALLOS_CARGA.pop(self.SCALER_PATH, None)
+            except Exception as e:
+                _FALLOS_CARGA[self.SCALER_PATH] = time.monotonic()
+                logger.error(
+                    f"⚠️ Error crítico cargando modelos IA: {e}. Activando modo fallback "
+                    f"(reintento en {settings.MODEL_RETRY_SECONDS:.0f}s)."
+                )
+                artefactos = None
+
+        if artefactos is None:
             self.model_loaded = False
+            return
+        self.scaler, self.isolation_model, self.autoencoder, self.lstm_model = artefactos
+        self.model_loaded = True
 
-    def process_measurement(self, sensor_id: str, value: float) -> dict:
-        # 1. Persistencia (Siempre guardar primero)
-        timestamp_sec = self.repo.save(sensor_id, value)
-        
+    def _en_espera_reintento(self) -> bool:
+        fallo = _FALLOS_CARGA.get(self.SCALER_PATH)
+        return fallo is not None and time.monotonic() - fallo < settings.MODEL_RETRY_SECONDS
+
+    def _read_artifacts(self):
+        logger.info("🔄 Cargando red neuronal y modelos estadísticos...")
+        t_inicio = time.perf_counter()
+        scaler, isolation_model, autoencoder, lstm_model = load_artifacts(os.path.dirname(self.SCALER_PATH))
+        MODEL_LOAD_SECONDS.observe(time.perf_counter() - t_inicio)
+        logger.info("✅ CEREBRO CARGADO: Sistema de Votación 4-Way listo.")
+        return scaler, isolation_model, autoencoder, lstm_model
+
+    # Claves de 'detalles' por votante (la ingesta y la simulación exponen nombres distintos)
+    _CLAVES_INGESTA = {
+        "fisico": "Regla_Fisica", "iso": "Isolation_Forest", "ae": "Autoencoder",
+        "lstm": "LSTM", "online": "Estadistica_Online"
+    }
+    _CLAVES_SIMULACION = {
+        "fisico": "VOTO_1_Fisico", "iso": "VOTO_2_ISO", "ae": "VOTO_3_AE",
+        "lstm": "VOTO_4_LSTM", "online": "VOTO_5_ONLINE"
+    }
+
+    @staticmethod
+    def total_votantes(nivel: str = NIVEL_COMPLETO) -> int:
+        # En nivel 'fisico' solo vota la regla dura (ni IA ni estadística online)
+        if nivel == NIVEL_FISICO:
+            return 1
+        base = 4 if nivel == NIVEL_COMPLETO else 2
+        return base + (1 if settings.ONLINE_VOTER_ENABLED else 0)
+
+    @staticmethod
+    def _voto_fisico(value: float, clave: str, detalles: dict) -> int:
+        """Voto de la regla física cuando es el único votante (sobrecarga, fallo o sin IA)."""
+        if value > 100.0:
+            detalles[clave] = 'CRITICO (>100)'
+            return 1
+        return 0
+
+    @staticmethod
+    def quorum(nivel: str = NIVEL_COMPLETO) -> int:
+        return settings.VOTE_QUORUM if nivel == NIVEL_COMPLETO else settings.LIGHT_VOTE_QUORUM
+
+    def _votar(self, sensor_id: str, value: float, claves: dict, nivel: str = NIVEL_COMPLETO):
+        """
+        Ejecuta la votación M-of-N. Devuelve (votos, detalles).
+        En nivel 'ligero' se omiten Autoencoder y LSTM (los votantes caros).
+        """
         votos = 0
         detalles = {}
-        es_anomalia = False
+
+        # A. Preprocesamiento (Escalar el dato)
+        # La IA no entiende "50 grados", entiende "0.5 normalizado"
+        raw_data = np.array([[value]])
+        with STAGE_SECONDS.labels(stage="scaler.transform").time():
+            scaled_data = self.scaler.transform(raw_data)
         
-        if self.model_loaded:
-            try:
-                # A. Preprocesamiento (Escalar el dato)
-                # La IA no entiende "50 grados", entiende "0.5 normalizado"
-                raw_data = np.array([[value]])
-                scaled_data = self.scaler.transform(raw_data)
-                
-                # Input para LSTM requiere 3 dimensiones [Samples, TimeSteps, Features]
-                lstm_input = scaled_data.reshape((1, 1, 1))
+        # Input para LSTM requiere 3 dimensiones [Samples, TimeSteps, Features]
+        lstm_input = scaled_data.reshape((1, 1, 1))
 
-                # --- B. LA VOTACIÓN (M-of-N) ---
+        # --- B. LA VOTACIÓN (M-of-N) ---
 
-                # VOTO 1: Regla Física (Seguridad Hard)
-                if value > 100.0:
-                    votos += 1
-                    detalles['Regla_Fisica'] = 'CRITICO (>100)'
+        # VOTO 1: Regla Física (Seguridad Hard)
+        if value > 100.0:
+            votos += 1
+            detalles[claves['fisico']] = 'CRITICO (>100)'
 
-                # VOTO 2: Isolation Forest (Estadístico)
-                pred_iso = self.isolation_model.predict(scaled_data)[0]
-                if pred_iso == -1: # -1 significa anomalía
-                    votos += 1
-                    detalles['Isolation_Forest'] = 'Outlier detectado'
+        # VOTO 2: Isolation Forest (Estadístico)
+        with VOTER_SECONDS.labels(voter="isolation_forest").time():
+            pred_iso = self.isolation_model.predict(scaled_data)[0]
+        if pred_iso == -1: # -1 significa anomalía
+            votos += 1
+            detalles[claves['iso']] = 'Outlier detectado'
 
-                # VOTO 3: Autoencoder (Patrón)
-                # Si no puede reconstruir el dato, es que no lo ha visto antes
+        if nivel == NIVEL_COMPLETO:
+            # VOTO 3: Autoencoder (Patrón)
+            # Si no puede reconstruir el dato, es que no lo ha visto antes
+            with VOTER_SECONDS.labels(voter="autoencoder").time():
                 reconstruccion = self.autoencoder.predict(scaled_data, verbose=0)
-                mse_ae = np.mean(np.power(scaled_data - reconstruccion, 2))
-                if mse_ae > self.AE_THRESHOLD:
-                    votos += 1
-                    detalles['Autoencoder'] = f'Error Patrón ({mse_ae:.2f})'
+            mse_ae = np.mean(np.power(scaled_data - reconstruccion, 2))
+            if mse_ae > self.AE_THRESHOLD:
+                votos += 1
+                detalles[claves['ae']] = f'Error Patrón ({mse_ae:.2f})'
 
-                # VOTO 4: LSTM (Secuencia)
+            # VOTO 4: LSTM (Secuencia)
+            with VOTER_SECONDS.labels(voter="lstm").time():
                 pred_lstm = self.lstm_model.predict(lstm_input, verbose=0)
-                mse_lstm = np.mean(np.power(scaled_data - pred_lstm, 2))
-                if mse_lstm > self.LSTM_THRESHOLD:
-                    votos += 1
-                    detalles['LSTM'] = f'Error Secuencia ({mse_lstm:.2f})'
+            mse_lstm = np.mean(np.power(scaled_data - pred_lstm, 2))
+            if mse_lstm > self.LSTM_THRESHOLD:
+                votos += 1
+                detalles[claves['lstm']] = f'Error Secuencia ({mse_lstm:.2f})'
+
+        # VOTO 5: Estadística online por sensor (adaptativa, O(1))
+        if settings.ONLINE_VOTER_ENABLED:
+            with VOTER_SECONDS.labels(voter="online_stats").time():
+                es_outlier, z, ew_dev = online_stats.score(sensor_id, value, self.repo.redis)
+            if es_outlier:
+                votos += 1
+                detalles[claves['online']] = f'Desvío Online (z={z:.2f}, ewma={ew_dev:.2f})'
+
+        return votos, detalles
+
+    def process_measurement(self, sensor_id: str, value: float, round_id: str = None,
+                            nivel: str = NIVEL_COMPLETO) -> dict:
+        # El round_id lo genera el líder del clúster: une este span con los de la ronda
+        with tracer.span("api.inferencia", round_id, sensor_id=sensor_id) as span_attrs:
+            resultado = self._process_measurement(sensor_id, value, round_id, nivel)
+            span_attrs["es_anomalia"] = resultado["es_anomalia"]
+            span_attrs["votos"] = resultado["votos_consenso"]
+            span_attrs["nivel"] = resultado["nivel_degradacion"]
+        return resultado
+
+    def _process_measurement(self, sensor_id: str, value: float, round_id: str = None,
+                             nivel: str = NIVEL_COMPLETO) -> dict:
+        # 1. Persistencia (Siempre guardar primero)
+        with tracer.span("api.persistencia", round_id), STAGE_SECONDS.labels(stage="repo.save").time():
+            timestamp_sec = self.repo.save(sensor_id, value)
+        
+        votos = 0
+        detalles = {}
+        es_anomalia = False
+        
+        if self.model_loaded and nivel != NIVEL_FISICO:
+            try:
+                with tracer.span("api.votacion", round_id), STAGE_SECONDS.labels(stage="vote").time():
+                    votos, detalles = self._votar(sensor_id, value, self._CLAVES_INGESTA, nivel)
 
                 # --- C. VEREDICTO FINAL ---
-                # Consenso Robusto: Necesitamos 3 de 4 votos para dar la alarma
-                if votos >= 3:
+                # Consenso Robusto: Necesitamos M votos (3 por defecto) para dar la alarma
+                if votos >= self.quorum(nivel):
                     es_anomalia = True
                 
             except Exception as e:
                 logger.error(f"Error durante inferencia IA: {e}")
                 # Si falla la IA, usamos regla simple por seguridad
-                es_anomalia = value > 100.0
+                detalles = {}
+                votos = self._voto_fisico(value, self._CLAVES_INGESTA['fisico'], detalles)
+                es_anomalia = votos == 1
+                nivel = NIVEL_FISICO
+        elif self.model_loaded:
+            # Sobrecarga: solo la regla física, pero la medición se guarda igualmente
+            votos = self._voto_fisico(value, self._CLAVES_INGESTA['fisico'], detalles)
+            es_anomalia = votos == 1
+            detalles['sistema'] = 'DEGRADADO_REGLA_FISICA'
         else:
             # Modo Fallback (Sin IA)
-            es_anomalia = value > 100.0
+            votos = self._voto_fisico(value, self._CLAVES_INGESTA['fisico'], detalles)
+            es_anomalia = votos == 1
             detalles['sistema'] = 'IA_OFFLINE'
+            nivel = NIVEL_FISICO
+
+        # La estadística online aprende de cada muestra (después de votar con la previa).
+        # Desactivada o en nivel 'fisico' no se paga el EVALSHA: es justo la carga que se quiere recortar
+        if settings.ONLINE_VOTER_ENABLED and nivel != NIVEL_FISICO:
+            try:
+                online_stats.update(sensor_id, value, self.repo.redis)
+            except Exception as e:
+                logger.error(f"Error actualizando estadística online de {sensor_id}: {e}")
+
+        VERDICTS_TOTAL.labels(resultado="anomalia" if es_anomalia else "normal").inc()
 
         # Log solo si es anomalía (para no saturar)
         if es_anomalia:
-            logger.warning(f"🚨 ANOMALÍA CONFIRMADA ({sensor_id}): Valor {value} | Votos: {votos}/4")
+            logger.warning(f"🚨 ANOMALÍA CONFIRMADA ({sensor_id}): Valor {value} | Votos: {votos}/{self.total_votantes(nivel)} [{nivel}]")
 
-        return {
+        resultado = {
             "sensor_id": sensor_id,
             "valor": value,
             "timestamp": timestamp_sec,
             "es_anomalia": es_anomalia,
             "votos_consenso": votos,
             "detalles": detalles,
-            "procesado_por": self.hostname
+            "procesado_por": self.hostname,
+            "round_id": round_id,
+            "nivel_degradacion": nivel
         }
+
+        # Índice de veredictos para consultas forenses O(anomalías). El push en vivo para
+        # dashboards/operadores viaja en el mismo pipeline: sin ida y vuelta extra por medición
+        publicar = None
+        if self.feed:
+            evento = {**resultado, "tipo": "anomalia" if es_anomalia else "medicion"}
+            publicar = lambda pipe: self.feed.publish(pipe, evento)
+        try:
+            self.repo.record_verdict(sensor_id, int(round(timestamp_sec * 1000)), votos, es_anomalia, detalles,
+                                     extra=publicar)
+        except Exception as e:
+            logger.error(f"Error indexando veredicto de {sensor_id}: {e}")
+
+        return resultado
     
     def get_history(self, sensor_id: str):
         raw = self.repo.get_all(sensor_id)
@@ -141,56 +295,73 @@ class AnomalyService:
             "measurements": [{"time": ts/1000, "value": val} for ts, val in raw]
         }
     
-    def evaluate_measurement(self, sensor_id: str, value: float) -> dict:
+    def get_multi_history(self, sensor_ids=None, kind=None, desde="-", hasta="+",
+                          aggregation=None, bucket_ms=0, group_by=None, reduce=None):
+        series = self.repo.get_many(
+            sensor_ids=sensor_ids, kind=kind, desde=desde, hasta=hasta,
+            aggregation=aggregation, bucket_ms=bucket_ms, group_by=group_by, reduce=reduce
+        )
+        return {
+            "total_series": len(series),
+            "series": [
+                {
+                    "key": s["key"],
+                    "labels": s["labels"],
+                    "measurements": [{"time": ts/1000, "value": val} for ts, val in s["samples"]]
+                }
+                for s in series
+            ]
+        }
+
+    def get_latest_values(self, sensor_ids=None, kind=None):
+        latest = self.repo.get_latest(sensor_ids=sensor_ids, kind=kind)
+        return {"total_series": len(latest), "latest": latest}
+
+    def list_anomalies(self, desde: float, hasta: float, sensor_id: str = None, offset: int = 0, limit: int = 100):
+        total, eventos = self.repo.get_anomalies(
+            int(desde * 1000), int(hasta * 1000), sensor_id=sensor_id, offset=offset, limit=limit
+        )
+        return {
+            "sensor_id": sensor_id,
+            "desde": desde,
+            "hasta": hasta,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "anomalias": eventos
+        }
+
+    def evaluate_measurement(self, sensor_id: str, value: float, nivel: str = NIVEL_COMPLETO) -> dict:
         """Evalúa sin guardar en base de datos (Simulación)"""
         votos = 0
         detalles = {}
         es_anomalia = False
         timestamp_simulado = time.time() # Generamos timestamp al vuelo
         
-        if self.model_loaded:
+        if self.model_loaded and nivel != NIVEL_FISICO:
             try:
-                # --- COPIA DE LA LÓGICA DE VOTACIÓN ---
-                raw_data = np.array([[value]])
-                scaled_data = self.scaler.transform(raw_data)
-                lstm_input = scaled_data.reshape((1, 1, 1))
-
-                # VOTO 1: Físico
-                if value > 100.0:
-                    votos += 1
-                    detalles['VOTO_1_Fisico'] = 'CRITICO (>100)'
-
-                # VOTO 2: Isolation Forest
-                pred_iso = self.isolation_model.predict(scaled_data)[0]
-                if pred_iso == -1: 
-                    votos += 1
-                    detalles['VOTO_2_ISO'] = 'Outlier detectado'
-
-                # VOTO 3: Autoencoder
-                reconstruccion = self.autoencoder.predict(scaled_data, verbose=0)
-                mse_ae = np.mean(np.power(scaled_data - reconstruccion, 2))
-                if mse_ae > self.AE_THRESHOLD:
-                    votos += 1
-                    detalles['VOTO_3_AE'] = f'Error Patrón ({mse_ae:.2f})'
-
-                # VOTO 4: LSTM
-                pred_lstm = self.lstm_model.predict(lstm_input, verbose=0)
-                mse_lstm = np.mean(np.power(scaled_data - pred_lstm, 2))
-                if mse_lstm > self.LSTM_THRESHOLD:
-                    votos += 1
-                    detalles['VOTO_4_LSTM'] = f'Error Secuencia ({mse_lstm:.2f})'
+                votos, detalles = self._votar(sensor_id, value, self._CLAVES_SIMULACION, nivel)
 
                 # Consenso
-                if votos >= 3:
+                if votos >= self.quorum(nivel):
                     es_anomalia = True
                 
             except Exception as e:
                 logger.error(f"Error IA simulada: {e}")
-                es_anomalia = value > 100.0
+                detalles = {}
+                votos = self._voto_fisico(value, self._CLAVES_SIMULACION['fisico'], detalles)
+                es_anomalia = votos == 1
                 detalles['sistema'] = f'IA_ERROR'
+                nivel = NIVEL_FISICO
+        elif self.model_loaded:
+            votos = self._voto_fisico(value, self._CLAVES_SIMULACION['fisico'], detalles)
+            es_anomalia = votos == 1
+            detalles['sistema'] = 'DEGRADADO_REGLA_FISICA'
         else:
-            es_anomalia = value > 100.0
+            votos = self._voto_fisico(value, self._CLAVES_SIMULACION['fisico'], detalles)
+            es_anomalia = votos == 1
             detalles['sistema'] = 'IA_OFFLINE'
+            nivel = NIVEL_FISICO
 
         return {
             "sensor_id": sensor_id,
@@ -200,5 +371,6 @@ class AnomalyService:
             "votos_consenso": votos,
             "detalles": detalles,
             "procesado_por": self.hostname,
+            "nivel_degradacion": nivel,
             "status": "simulacion"
         }
\ No newline at end of file
@@ -0,0 +1,163 @@
+import logging
+import numpy as np
+from redis.commands.core import Script
+
+from app.core.config import settings
+
+logger = logging.getLogger("online_stats")
+
+# Campos del hash sensor:{id}:stats
+_FIELDS = ("n", "mean", "m2", "ewma", "ewvar")
+
+# Welford + EWMA en una sola operación atómica dentro de Redis. Todos los workers de gunicorn
+# (y todas las réplicas de la API) actualizan el mismo estado: ninguno ve solo una parte del flujo.
+# '%.17g' conserva el double completo (tostring de Lua lo recorta a 14 cifras).
+UPDATE_SCRIPT = """
+local s = redis.call('HMGET', KEYS[1], 'n', 'mean', 'm2', 'ewma', 'ewvar')
+local x, alpha = tonumber(ARGV[1]), tonumber(ARGV[2])
+local n = (tonumber(s[1]) or 0) + 1
+local mean, m2 = tonumber(s[2]) or 0, tonumber(s[3]) or 0
+local ewma, ewvar = tonumber(s[4]) or 0, tonumber(s[5]) or 0
+local delta = x - mean
+mean = mean + delta / n
+m2 = m2 + delta * (x - mean)
+if n == 1 then
+    ewma, ewvar = x, 0
+else
+    local d = x - ewma
+    ewma = ewma + alpha * d
+    ewvar = (1 - alpha) * (ewvar + alpha * d * d)
+end
+local function f(v) return string.format('%.17g', v) end
+redis.call('HSET', KEYS[1], 'n', f(n), 'mean', f(mean), 'm2', f(m2), 'ewma', f(ewma), 'ewvar', f(ewvar))
+return n
+"""
+
+
+def update_state(state, value: float, alpha: float):
+    """Mismo cálculo que UPDATE_SCRIPT en Python (referencia y emulación en el FakeRedis del benchmark)."""
+    n, mean, m2, ewma, ewvar = state
+    n += 1
+    delta = value - mean
+    mean += delta / n
+    m2 += delta * (value - mean)
+    if n == 1:
+        ewma, ewvar = value, 0.0
+    else:
+        ew_delta = value - ewma
+        ewma += alpha * ew_delta
+        ewvar = (1 - alpha) * (ewvar + alpha * ew_delta * ew_delta)
+    return n, mean, m2, ewma, ewvar
+
+
+class OnlineStatsStore:
+    """
+    Estadística en línea por sensor: media/varianza de Welford y EWMA.
+    El estado vive en un hash Redis (sensor:{id}:stats) compartido por todos los workers:
+    la lectura para votar es un HMGET y la actualización un script Lua atómico, de modo
+    que el veredicto no depende del worker que atienda la petición y un reinicio no pierde nada.
+    """
+
+    def __init__(self):
+        # El SHA se calcula una vez; cada llamada usa el cliente vigente (puede cambiar tras un failover)
+        self._update = Script(None, UPDATE_SCRIPT.encode("utf-8"))
+
+    @staticmethod
+    def _key(sensor_id: str) -> str:
+        return f"sensor:{sensor_id}:stats"
+
+    def state(self, sensor_id: str, redis_client):
+        """Fila (n, mean, m2, ewma, ewvar) del sensor; ceros si aún no hay muestras."""
+        saved = redis_client.hmget(self._key(sensor_id), _FIELDS)
+        return tuple(float(v) if v is not None else 0.0 for v in saved)
+
+    def score(self, sensor_id: str, value: float, redis_client):
+        """
+        Evalúa 'value' contra la estadística previa del sensor (sin modificarla).
+        Devuelve (es_outlier, z_score, desviación_ewma) o (False, None, None) en arranque en frío.
+        """
+        n, mean, m2, ewma, ewvar = self.state(sensor_id, redis_client)
+        if n < settings.ONLINE_MIN_SAMPLES:
+            return False, None, None
+
+        std = np.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+        z = abs(value - mean) / std if std > 0 else 0.0
+        ew_std = np.sqrt(ewvar)
+        ew_dev = abs(value - ewma) / ew_std if ew_std > 0 else 0.0
+        es_outlier = z > settings.ONLINE_Z_THRESHOLD or ew_dev > settings.ONLINE_EWMA_BAND_K
+        return es_outlier, float(z), float(ew_dev)
+
+    def update(self, sensor_id: str, value: float, redis_client) -> None:
+        """Incorpora una muestra (Welford + EWMA) de forma atómica en Redis."""
+        self._update(keys=[self._key(sensor_id)], args=[repr(float(value)), repr(settings.ONLINE_EWMA_ALPHA)],
+                     client=redis_client)
+
+
+def _linear_scan(u: np.ndarray, r: float, y0: float, block: int = 256) -> np.ndarray:
+    """y[t] = r * y[t-1] + u[t], vectorizado por bloques (r**-k no desborda dentro de un bloque)."""
+    out = np.empty_like(u)
+    k = np.arange(1, block + 1, dtype=np.float64)
+    for start in range(0, len(u), block):
+        seg = u[start:start + block]
+        pot = r ** k[:len(seg)]
+        out[start:start + len(seg)] = pot * (y0 + np.cumsum(seg / pot))
+        y0 = out[start + len(seg) - 1]
+    return out
+
+
+def score_series(values: np.ndarray, state=None):
+    """
+    Versión por lotes del votante online para re-puntuar historia (replay): equivale a llamar
+    score() y después update() muestra a muestra, pero con NumPy sobre toda la serie.
+    'state' es la fila (n, mean, m2, ewma, ewvar) previa. Devuelve (máscara_outlier, nuevo_estado).
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n0, mean0, m20, ewma0, ewvar0 = state if state is not None else (0.0, 0.0, 0.0, 0.0, 0.0)
+    if len(x) == 0:
+        return np.zeros(0, dtype=bool), (n0, mean0, m20, ewma0, ewvar0)
+    alpha = settings.ONLINE_EWMA_ALPHA
+
+    # Welford acumulado (fusión de Chan entre el estado previo y el prefijo del lote)
+    t = np.arange(1, len(x) + 1, dtype=np.float64)
+    ref = x[0]
+    cmean = np.cumsum(x - ref) / t + ref
+    cm2 = np.maximum(np.cumsum((x - ref) ** 2) - t * (cmean - ref) ** 2, 0.0)
+    n = n0 + t
+    delta = cmean - mean0
+    mean = mean0 + delta * t / n
+    m2 = m20 + cm2 + delta ** 2 * n0 * t / n
+
+    # EWMA y su varianza: recurrencias lineales (la primera muestra de un sensor las inicializa)
+    if n0 == 0:
+        ewma0, ewvar0 = x[0], 0.0
+        ew_x = x[1:]
+    else:
+        ew_x = x
+    ewma_post = _linear_scan(alpha * ew_x, 1 - alpha, ewma0)
+    ew_prev = np.concatenate([[ewma0], ewma_post[:-1]])
+    ew_delta = ew_x - ew_prev
+    ewvar_post = _linear_scan((1 - alpha) * alpha * ew_delta ** 2, 1 - alpha, ewvar0)
+    if n0 == 0:
+        ewma_post = np.concatenate([[x[0]], ewma_post])
+        ewvar_post = np.concatenate([[0.0], ewvar_post])
+
+    # Cada muestra se puntúa con el estado ANTERIOR a incorporarla (como score() antes de update())
+    n_prev = np.concatenate([[n0], n[:-1]])
+    mean_prev = np.concatenate([[mean0], mean[:-1]])
+    m2_prev = np.concatenate([[m20], m2[:-1]])
+    ewma_prev = np.concatenate([[ewma0 if n0 else 0.0], ewma_post[:-1]])
+    ewvar_prev = np.concatenate([[ewvar0 if n0 else 0.0], ewvar_post[:-1]])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = np.where(n_prev > 1, np.sqrt(m2_prev / np.maximum(n_prev - 1, 1)), 0.0)
+        z = np.where(std > 0, np.abs(x - mean_prev) / std, 0.0)
+        ew_std = np.sqrt(ewvar_prev)
+        ew_dev = np.where(ew_std > 0, np.abs(x - ewma_prev) / ew_std, 0.0)
+    outlier = (n_prev >= settings.ONLINE_MIN_SAMPLES) & (
+        (z > settings.ONLINE_Z_THRESHOLD) | (ew_dev > settings.ONLINE_EWMA_BAND_K)
+    )
+    return outlier, (float(n[-1]), float(mean[-1]), float(m2[-1]), float(ewma_post[-1]), float(ewvar_post[-1]))
+
+
+# Sin estado propio: solo guarda el script (el estado está en Redis)
+online_stats = OnlineStatsStore()
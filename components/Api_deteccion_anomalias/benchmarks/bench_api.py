@@ -0,0 +1,277 @@
+"""
+Benchmark reproducible de la Sentinel API.
+
+Levanta la app FastAPI en proceso (ASGI, sin red) contra un Redis en memoria con
+TimeSeries emulado y mide req/s y p50/p95/p99 por endpoint y por backend de modelos.
+
+Uso (desde components/Api_deteccion_anomalias):
+    python -m benchmarks.bench_api --requests 2000 --concurrency 1,8,32
+    python -m benchmarks.bench_api --backends fallback --compare benchmarks/results/anterior.json
+    python -m benchmarks.bench_api --backends full --no-degradation   # coste puro de inferencia
+
+Con concurrencia alta el control de admisión degrada a 'ligero'/'fisico': cada escenario
+registra el nivel de cada respuesta para no confundir esas cifras con las del ensemble completo.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.fake_redis import FakeRedis
+
+# Backends de modelos:
+#   full     -> ensemble completo (scaler + IF + Autoencoder + LSTM), requiere TensorFlow
+#   fallback -> modo degradado sin IA (regla física), como cuando los modelos no cargan
+BACKENDS = ("full", "fallback")
+
+DEFAULT_MIX = "nuevo=0.7,detectar=0.2,listar=0.1"
+
+# Orden de impresión de los niveles de degradación (503 por sobrecarga = 'rechazado')
+NIVELES = ("completo", "ligero", "fisico", "rechazado")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"nuevo", "detectar", "listar"}
+    if unknown:
+        raise SystemExit(f"Endpoints desconocidos en --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def percentile(sorted_values, q):
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies_ms, errors, elapsed):
+    values = sorted(latencies_ms)
+    if not values:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "req_per_s": len(values) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": values[-1],
+    }
+
+
+def setup_app(backend):
+    """Importa la app apuntando a un Redis en memoria y con el backend de modelos pedido."""
+    from app.infrastructure.database import redis_manager
+    from app.services.anomaly_service import AnomalyService
+    from app.main import app
+
+    # Redis en memoria: get_service(), /health y el feed lo usan sin tocar la red
+    redis_manager.master_connection = FakeRedis()
+
+    if not hasattr(AnomalyService, "_original_load_models"):
+        AnomalyService._original_load_models = AnomalyService._load_models
+    if backend == "fallback":
+        def _no_models(self):
+            self.model_loaded = False
+        AnomalyService._load_models = _no_models
+    else:
+        AnomalyService._load_models = AnomalyService._original_load_models
+        probe = AnomalyService.__new__(AnomalyService)
+        AnomalyService.__init__(probe, repo=None)
+        if not probe.model_loaded:
+            return None
+    return app
+
+
+def disable_degradation():
+    """Umbrales de admisión inalcanzables: todo se sirve con el ensemble completo."""
+    from app.core.config import settings
+
+    for name in ("ADMISSION_LIGHT_INFLIGHT", "ADMISSION_PHYSICAL_INFLIGHT", "ADMISSION_REJECT_INFLIGHT"):
+        setattr(settings, name, 10 ** 9)
+    for name in ("ADMISSION_LIGHT_DELAY_MS", "ADMISSION_PHYSICAL_DELAY_MS", "ADMISSION_REJECT_DELAY_MS"):
+        setattr(settings, name, float("inf"))
+
+
+def build_request(endpoint, sensors, anomaly_rate):
+    sensor_id = random.choice(sensors)
+    valor = random.gauss(50.0, 2.0)
+    if random.random() < anomaly_rate:
+        valor += random.uniform(30.0, 50.0)
+    if endpoint == "nuevo":
+        return "POST", "/api/v1/nuevo", {"json": {"sensor_id": sensor_id, "valor": valor}}
+    if endpoint == "detectar":
+        return "GET", "/api/v1/detectar", {"params": {"sensor_id": sensor_id, "valor": valor}}
+    return "GET", "/api/v1/listar", {"params": {"sensor_id": sensor_id}}
+
+
+async def run_scenario(app, mix, concurrency, total_requests, sensors, anomaly_rate):
+    endpoints = list(mix)
+    weights = [mix[e] for e in endpoints]
+    plan = random.choices(endpoints, weights=weights, k=total_requests)
+    latencies = {e: [] for e in endpoints}
+    errors = {e: 0 for e in endpoints}
+    niveles = {}
+    queue = asyncio.Queue()
+    for endpoint in plan:
+        queue.put_nowait(endpoint)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            while True:
+                try:
+                    endpoint = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                method, url, kwargs = build_request(endpoint, sensors, anomaly_rate)
+                t0 = time.perf_counter()
+                response = None
+                try:
+                    response = await client.request(method, url, **kwargs)
+                    ok = response.status_code < 400
+                except Exception:
+                    ok = False
+                elapsed_ms = (time.perf_counter() - t0) * 1000
+                if response is not None and endpoint != "listar":
+                    nivel = nivel_respuesta(response)
+                    if nivel:
+                        niveles[nivel] = niveles.get(nivel, 0) + 1
+                if ok:
+                    latencies[endpoint].append(elapsed_ms)
+                else:
+                    errors[endpoint] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    return {
+        "total": summarize(all_latencies, sum(errors.values()), elapsed),
+        "endpoints": {e: summarize(latencies[e], errors[e], elapsed) for e in endpoints},
+        "niveles": niveles,
+    }
+
+
+def nivel_respuesta(response):
+    """Nivel de degradación con el que se atendió una petición de inferencia."""
+    if response.status_code == 503:
+        return "rechazado"
+    if response.status_code >= 400:
+        return None
+    try:
+        return response.json().get("nivel_degradacion")
+    except ValueError:
+        return None
+
+
+def format_niveles(niveles):
+    total = sum(niveles.values())
+    if not total:
+        return "sin peticiones de inferencia"
+    orden = [n for n in NIVELES if n in niveles] + sorted(set(niveles) - set(NIVELES))
+    return "  ".join(f"{n} {niveles[n]} ({niveles[n] / total:.0%})" for n in orden)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline_path):
+    """Imprime la variación de req/s y p95 respecto a un resultado anterior."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nComparación con {baseline_path} (commit {baseline.get('commit')}):")
+    for key, scenario in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(key)
+        if not previous:
+            continue
+        for endpoint, now in scenario["endpoints"].items():
+            before = previous["endpoints"].get(endpoint)
+            if not before or not before.get("requests") or not now.get("requests"):
+                continue
+            d_rps = (now["req_per_s"] / before["req_per_s"] - 1) * 100
+            d_p95 = (now["p95_ms"] / before["p95_ms"] - 1) * 100
+            print(f"  {key:<22} {endpoint:<9} req/s {d_rps:+7.1f}%   p95 {d_p95:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la Sentinel API contra Redis en memoria.")
+    parser.add_argument("--requests", type=int, default=1000, help="Peticiones por escenario")
+    parser.add_argument("--concurrency", default="1,8,32", help="Niveles de concurrencia separados por comas")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Mezcla de endpoints (por defecto {DEFAULT_MIX})")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Backends de modelos a medir")
+    parser.add_argument("--sensors", type=int, default=10, help="Número de sensores distintos")
+    parser.add_argument("--anomaly-rate", type=float, default=0.05, help="Proporción de valores anómalos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-degradation", action="store_true",
+                        help="Sube los umbrales ADMISSION_* para medir solo el coste de inferencia")
+    parser.add_argument("--output", default=None, help="Fichero JSON de resultados")
+    parser.add_argument("--compare", default=None, help="Resultado JSON anterior con el que comparar")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if args.no_degradation:
+        disable_degradation()
+    mix = parse_mix(args.mix)
+    sensors = [f"bench-{i:03d}" for i in range(args.sensors)]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    results = {
+        "commit": git_commit(),
+        "fecha": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "params": vars(args),
+        "scenarios": {},
+    }
+
+    for backend in args.backends.split(","):
+        app = setup_app(backend)
+        if app is None:
+            print(f"⚠️ Backend '{backend}' no disponible (modelos/TensorFlow no cargan). Se omite.")
+            continue
+        for concurrency in levels:
+            key = f"{backend}/c{concurrency}"
+            print(f"▶ {key}: {args.requests} peticiones...")
+            scenario = asyncio.run(run_scenario(app, mix, concurrency, args.requests, sensors, args.anomaly_rate))
+            results["scenarios"][key] = scenario
+            total = scenario["total"]
+            if total.get("requests"):
+                print(f"   {'TOTAL':<9} {total['req_per_s']:8.1f} req/s  p50 {total['p50_ms']:7.2f}  "
+                      f"p95 {total['p95_ms']:7.2f}  p99 {total['p99_ms']:7.2f} ms  errores {total['errors']}")
+            print(f"   {'niveles':<9} {format_niveles(scenario['niveles'])}")
+            for endpoint, row in scenario["endpoints"].items():
+                if row.get("requests"):
+                    print(f"   {endpoint:<9} {row['req_per_s']:8.1f} req/s  p50 {row['p50_ms']:7.2f}  "
+                          f"p95 {row['p95_ms']:7.2f}  p99 {row['p99_ms']:7.2f} ms  errores {row['errors']}")
+                else:
+                    print(f"   {endpoint:<9} sin respuestas válidas (errores {row['errors']})")
+
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import bisect
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from redis.exceptions import ResponseError
+
+# Mismos mensajes que RedisTimeSeries para que el código bajo prueba recorra sus ramas de error reales
+_ERR_DUPLICATE = "TSDB: Error at upsert, update is not supported when DUPLICATE_POLICY is set to BLOCK mode"
+_ERR_NO_KEY = "TSDB: the key does not exist"
+
+
+class _Series:
+    __slots__ = ("timestamps", "values", "labels", "retention")
+
+    def __init__(self, labels=None, retention=0):
+        self.timestamps = []
+        self.values = []
+        self.labels = dict(labels or {})
+        self.retention = retention or 0
+
+
+class FakeTimeSeries:
+    """Emulación en memoria del subconjunto de RedisTimeSeries que usa el repositorio."""
+
+    def __init__(self, redis: "FakeRedis"):
+        self._r = redis
+
+    def create(self, key, retention_msecs=None, labels=None, **kwargs):
+        with self._r._lock:
+            self._r._series.setdefault(key, _Series(labels, retention_msecs))
+        return True
+
+    def alter(self, key, labels=None, retention_msecs=None, **kwargs):
+        with self._r._lock:
+            series = self._r._series[key]
+            if labels is not None:
+                series.labels = dict(labels)
+            if retention_msecs is not None:
+                series.retention = retention_msecs
+        return True
+
+    def add(self, key, timestamp, value, retention_msecs=None, labels=None, duplicate_policy=None, **kwargs):
+        with self._r._lock:
+            series = self._r._series.get(key)
+            if series is None:
+                series = self._r._series[key] = _Series(labels, retention_msecs)
+            ts = int(time.time() * 1000) if timestamp == "*" else int(timestamp)
+            if series.timestamps and ts <= series.timestamps[-1]:
+                i = bisect.bisect_left(series.timestamps, ts)
+                if i < len(series.timestamps) and series.timestamps[i] == ts:
+                    # Política por defecto BLOCK: Redis rechaza el mismo milisegundo salvo ON_DUPLICATE
+                    if (duplicate_policy or "block").lower() != "last":
+                        raise ResponseError(_ERR_DUPLICATE)
+                    series.values[i] = float(value)
+                    return ts
+                series.timestamps.insert(i, ts)
+                series.values.insert(i, float(value))
+            else:
+                series.timestamps.append(ts)
+                series.values.append(float(value))
+            if series.retention:
+                cut = bisect.bisect_left(series.timestamps, series.timestamps[-1] - series.retention)
+                if cut:
+                    del series.timestamps[:cut]
+                    del series.values[:cut]
+            return ts
+
+    @staticmethod
+    def _bounds(from_time, to_time):
+        lo = 0 if from_time == "-" else int(from_time)
+        hi = float("inf") if to_time == "+" else int(to_time)
+        return lo, hi
+
+    def _slice(self, series, from_time, to_time):
+        lo, hi = self._bounds(from_time, to_time)
+        i = bisect.bisect_left(series.timestamps, lo)
+        j = bisect.bisect_right(series.timestamps, hi)
+        return [[t, v] for t, v in zip(series.timestamps[i:j], series.values[i:j])]
+
+    def range(self, key, from_time, to_time, count=None, **kwargs):
+        with self._r._lock:
+            series = self._r._series.get(key)
+            if series is None:
+                raise ResponseError(_ERR_NO_KEY)
+            samples = self._slice(series, from_time, to_time)
+        return samples[:count] if count else samples
+
+    def get(self, key):
+        with self._r._lock:
+            series = self._r._series.get(key)
+            if series is None:
+                raise ResponseError(_ERR_NO_KEY)
+            return [series.timestamps[-1], series.values[-1]] if series.timestamps else []
+
+    def _match(self, filters):
+        selected = []
+        for key, series in self._r._series.items():
+            ok = True
+            for f in filters:
+                name, _, expected = f.partition("=")
+                if expected.startswith("(") and expected.endswith(")"):
+                    ok = series.labels.get(name) in expected[1:-1].split(",")
+                else:
+                    ok = series.labels.get(name) == expected
+                if not ok:
+                    break
+            if ok:
+                selected.append((key, series))
+        return selected
+
+    def mrange(self, from_time, to_time, filters, with_labels=False, **kwargs):
+        # Agregación y GROUPBY/REDUCE no se emulan: se devuelven las muestras crudas
+        with self._r._lock:
+            return [
+                {key: [dict(series.labels) if with_labels else {}, self._slice(series, from_time, to_time)]}
+                for key, series in self._match(filters)
+            ]
+
+    def mget(self, filters, with_labels=False, **kwargs):
+        with self._r._lock:
+            result = []
+            for key, series in self._match(filters):
+                last_ts = series.timestamps[-1] if series.timestamps else None
+                last_val = series.values[-1] if series.values else None
+                result.append({key: [dict(series.labels) if with_labels else {}, last_ts, last_val]})
+            return result
+
+
+class FakePipeline:
+    """Pipeline que ejecuta en diferido contra el FakeRedis (sin atomicidad real)."""
+
+    def __init__(self, redis: "FakeRedis"):
+        self._r = redis
+        self._calls = []
+
+    def ts(self):
+        pipeline = self
+
+        class _Deferred:
+            def __getattr__(self, name):
+                return lambda *a, **kw: pipeline._calls.append((lambda: getattr(pipeline._r.ts(), name)(*a, **kw)))
+        return _Deferred()
+
+    def __getattr__(self, name):
+        return lambda *a, **kw: self._calls.append((lambda: getattr(self._r, name)(*a, **kw)))
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        return [call() for call in calls]
+
+
+class FakePubSub:
+    def subscribe(self, *channels):
+        pass
+
+    def get_message(self, timeout=0.0):
+        time.sleep(timeout)
+        return None
+
+    def close(self):
+        pass
+
+
+class FakeRedis:
+    """
+    Sustituto en memoria de Redis (con TimeSeries emulado) para benchmarks locales.
+    Solo implementa los comandos que usan MeasurementRepository, LiveFeed y OnlineStatsStore.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._series = {}
+        self._zsets = defaultdict(dict)
+        self._hashes = defaultdict(dict)
+
+    def ping(self):
+        return True
+
+    def ts(self):
+        return FakeTimeSeries(self)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pubsub(self, **kwargs):
+        return FakePubSub()
+
+    def publish(self, channel, message):
+        return 0
+
+    # --- Hashes ---
+    def hset(self, key, mapping=None, **kwargs):
+        with self._lock:
+            self._hashes[key].update({k: str(v) for k, v in (mapping or {}).items()})
+        return len(mapping or {})
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._hashes.get(key, {}))
+
+    def hmget(self, key, fields):
+        with self._lock:
+            saved = self._hashes.get(key, {})
+            return [saved.get(f) for f in fields]
+
+    # --- Scripts (solo el de la estadística online, emulado con su equivalente en Python) ---
+    def evalsha(self, sha, numkeys, *args):
+        from app.services import online_stats
+        if sha != hashlib.sha1(online_stats.UPDATE_SCRIPT.encode("utf-8")).hexdigest():
+            raise NotImplementedError(f"Script no emulado: {sha}")
+        key, value, alpha = args[0], float(args[1]), float(args[2])
+        with self._lock:
+            saved = self._hashes[key]
+            state = online_stats.update_state(
+                tuple(float(saved.get(f, 0.0)) for f in online_stats._FIELDS), value, alpha
+            )
+            saved.update({f: repr(float(v)) for f, v in zip(online_stats._FIELDS, state)})
+            return int(state[0])
+
+    def script_load(self, script):
+        return hashlib.sha1(script if isinstance(script, bytes) else script.encode("utf-8")).hexdigest()
+
+    # --- Sorted sets ---
+    @staticmethod
+    def _score_bound(bound):
+        """Devuelve (valor, exclusivo) para límites tipo 10, "-inf" o "(10"."""
+        if isinstance(bound, str) and bound.startswith("("):
+            return float(bound[1:]), True
+        return float(bound), False
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            self._zsets[key].update(mapping)
+        return len(mapping)
+
+    def _zrange(self, key, lo, hi):
+        (lo, lo_excl), (hi, hi_excl) = self._score_bound(lo), self._score_bound(hi)
+        items = [
+            (s, m) for m, s in self._zsets.get(key, {}).items()
+            if (s > lo if lo_excl else s >= lo) and (s < hi if hi_excl else s <= hi)
+        ]
+        return [m for s, m in sorted(items)]
+
+    def zcount(self, key, lo, hi):
+        with self._lock:
+            return len(self._zrange(key, lo, hi))
+
+    def zrangebyscore(self, key, lo, hi, start=None, num=None):
+        with self._lock:
+            members = self._zrange(key, lo, hi)
+        if start is not None and num is not None:
+            return members[start:start + num]
+        return members
+
+    def zremrangebyscore(self, key, lo, hi):
+        with self._lock:
+            doomed = self._zrange(key, lo, hi)
+            for m in doomed:
+                del self._zsets[key][m]
+        return len(doomed)
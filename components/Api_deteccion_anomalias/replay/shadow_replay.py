@@ -0,0 +1,330 @@
+"""
+Shadow replay: re-puntúa la historia guardada con el ensemble actual y con uno o varios juegos
+de modelos candidatos, sin pasar por la API en vivo.
+
+Lee las series sensor:*:ts de un Redis restaurado a partir de un dump (redis-stack con el
+módulo TimeSeries; solo se ejecutan comandos de lectura), reparte el trabajo en un pool de
+procesos por sensor y ventana temporal y puntúa en bloques vectorizados. El informe recoge el
+desacuerdo de votos y de veredictos, la tasa de voto y de acierto de cada modelo y el throughput.
+
+Uso (desde components/Api_deteccion_anomalias):
+    docker run -d -p 6380:6379 -v $PWD/dump:/data redis/redis-stack-server
+    python -m replay.shadow_replay --redis-url redis://localhost:6380 --candidato modelos/v2
+    python -m replay.shadow_replay --redis-url redis://localhost:6380 --candidato modelos/v2 \\
+        --candidato modelos/v3 --desde 2026-10-01 --hasta 2026-10-08 --workers 8 --shard-horas 6
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+import redis
+
+from app.core.config import settings
+from app.services.anomaly_service import MODELS_DIR, AnomalyService, load_artifacts
+from app.services.online_stats import score_series
+
+logger = logging.getLogger("replay")
+
+ACTUAL = "actual"
+# Votantes que dependen del juego de modelos (la regla física y la estadística online son comunes)
+VOTANTES_MODELO = ("iso", "ae", "lstm")
+VOTANTES = ("fisico",) + VOTANTES_MODELO + ("online",)
+
+# Estado de cada proceso del pool (se rellena una vez en el initializer)
+_WORKER = {}
+
+
+def parse_instante(text: str):
+    """'-'/'+', epoch en milisegundos o fecha ISO (UTC si no lleva zona) -> argumento de TS.RANGE."""
+    if text in ("-", "+"):
+        return text
+    if text.isdigit():
+        return int(text)
+    fecha = datetime.fromisoformat(text)
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return int(fecha.timestamp() * 1000)
+
+
+def sensor_de_clave(key: str) -> str:
+    return key[len("sensor:"):-len(":ts")]
+
+
+def planificar_shards(cliente, sensores, desde, hasta, shard_ms: int):
+    """Divide cada serie en ventanas [inicio, fin] de shard_ms dentro del rango pedido."""
+    shards = []
+    for key in sorted(cliente.scan_iter(match="sensor:*:ts", count=500)):
+        if sensores and sensor_de_clave(key) not in sensores:
+            continue
+        primera = cliente.ts().range(key, desde, hasta, count=1)
+        ultima = cliente.ts().revrange(key, desde, hasta, count=1)
+        if not primera:
+            continue
+        inicio, fin = int(primera[0][0]), int(ultima[0][0])
+        while inicio <= fin:
+            shards.append((key, inicio, min(inicio + shard_ms - 1, fin)))
+            inicio += shard_ms
+    return shards
+
+
+def _init_worker(redis_url: str, juegos: dict, chunk: int, online: bool, calentamiento: int, ejemplos: int):
+    logging.basicConfig(level=logging.WARNING)
+    _WORKER["cliente"] = redis.Redis.from_url(redis_url, decode_responses=True)
+    # Cada proceso carga sus modelos una sola vez (TensorFlow no se comparte entre procesos)
+    _WORKER["juegos"] = {nombre: load_artifacts(ruta) for nombre, ruta in juegos.items()}
+    _WORKER["chunk"] = chunk
+    _WORKER["online"] = online
+    _WORKER["calentamiento"] = calentamiento
+    _WORKER["ejemplos"] = ejemplos
+
+
+def votar_lote(artefactos, valores: np.ndarray) -> dict:
+    """Misma votación que AnomalyService._votar (nivel completo), pero sobre un bloque de N valores."""
+    scaler, isolation_model, autoencoder, lstm_model = artefactos
+    scaled = scaler.transform(valores.reshape(-1, 1))
+    votos = {"iso": isolation_model.predict(scaled) == -1}
+
+    reconstruccion = autoencoder.predict(scaled, batch_size=len(scaled), verbose=0)
+    votos["ae"] = np.mean(np.power(scaled - reconstruccion, 2), axis=1) > AnomalyService.AE_THRESHOLD
+
+    pred_lstm = lstm_model.predict(scaled.reshape((-1, 1, 1)), batch_size=len(scaled), verbose=0)
+    votos["lstm"] = np.mean(np.power(scaled - pred_lstm.reshape(len(scaled), -1), 2), axis=1) \
+        > AnomalyService.LSTM_THRESHOLD
+    return votos
+
+
+def _leer_bloques(cliente, key: str, desde: int, hasta: int, chunk: int):
+    """Recorre la ventana con TS.RANGE ... COUNT chunk, sin cargar la serie entera en memoria."""
+    while desde <= hasta:
+        muestras = cliente.ts().range(key, desde, hasta, count=chunk)
+        if not muestras:
+            return
+        yield np.array([m[0] for m in muestras], dtype=np.int64), np.array([m[1] for m in muestras], dtype=np.float64)
+        if len(muestras) < chunk:
+            return
+        desde = int(muestras[-1][0]) + 1
+
+
+def _estado_online(cliente, key: str, inicio: int, calentamiento: int):
+    """La estadística online depende del pasado: se calienta con las muestras previas al shard."""
+    if calentamiento <= 0:
+        return None
+    previas = cliente.ts().revrange(key, "-", inicio - 1, count=calentamiento) if inicio > 0 else []
+    if not previas:
+        return None
+    _, estado = score_series(np.array([m[1] for m in reversed(previas)], dtype=np.float64))
+    return estado
+
+
+def procesar_shard(shard) -> dict:
+    key, inicio, fin = shard
+    cliente, juegos = _WORKER["cliente"], _WORKER["juegos"]
+    candidatos = [nombre for nombre in juegos if nombre != ACTUAL]
+    quorum = AnomalyService.quorum()
+    t_shard = time.perf_counter()
+
+    res = {
+        "sensor": sensor_de_clave(key), "muestras": 0, "segundos_lectura": 0.0, "segundos_puntuacion": 0.0,
+        "votos": {j: dict.fromkeys(VOTANTES, 0) for j in juegos},
+        "aciertos": {j: dict.fromkeys(VOTANTES, 0) for j in juegos},
+        "anomalias": dict.fromkeys(juegos, 0),
+        "desacuerdo_votos": {c: dict.fromkeys(VOTANTES_MODELO, 0) for c in candidatos},
+        "veredicto": {c: {"ambos": 0, "solo_actual": 0, "solo_candidato": 0} for c in candidatos},
+        "ejemplos": {c: [] for c in candidatos},
+    }
+
+    t = time.perf_counter()
+    estado = _estado_online(cliente, key, inicio, _WORKER["calentamiento"]) if _WORKER["online"] else None
+    bloques = _leer_bloques(cliente, key, inicio, fin, _WORKER["chunk"])
+    for ts, valores in bloques:
+        res["segundos_lectura"] += time.perf_counter() - t
+        t = time.perf_counter()
+        res["muestras"] += len(valores)
+
+        comunes = {"fisico": valores > 100.0}
+        if _WORKER["online"]:
+            comunes["online"], estado = score_series(valores, estado)
+
+        votos, veredictos = {}, {}
+        for nombre, artefactos in juegos.items():
+            votos[nombre] = {**comunes, **votar_lote(artefactos, valores)}
+            total = sum(v.astype(np.int64) for v in votos[nombre].values())
+            veredictos[nombre] = total >= quorum
+            res["anomalias"][nombre] += int(veredictos[nombre].sum())
+            for votante, v in votos[nombre].items():
+                res["votos"][nombre][votante] += int(v.sum())
+                res["aciertos"][nombre][votante] += int((v & veredictos[nombre]).sum())
+
+        actual = veredictos[ACTUAL]
+        for c in candidatos:
+            for votante in VOTANTES_MODELO:
+                res["desacuerdo_votos"][c][votante] += int((votos[ACTUAL][votante] != votos[c][votante]).sum())
+            cand = veredictos[c]
+            res["veredicto"][c]["ambos"] += int((actual & cand).sum())
+            res["veredicto"][c]["solo_actual"] += int((actual & ~cand).sum())
+            res["veredicto"][c]["solo_candidato"] += int((~actual & cand).sum())
+            hueco = _WORKER["ejemplos"] - len(res["ejemplos"][c])
+            for i in np.flatnonzero(actual != cand)[:max(hueco, 0)]:
+                res["ejemplos"][c].append({
+                    "sensor": res["sensor"], "timestamp": int(ts[i]), "valor": float(valores[i]),
+                    ACTUAL: [v for v, m in votos[ACTUAL].items() if m[i]],
+                    c: [v for v, m in votos[c].items() if m[i]],
+                })
+        res["segundos_puntuacion"] += time.perf_counter() - t
+        t = time.perf_counter()
+
+    res["segundos_worker"] = time.perf_counter() - t_shard
+    return res
+
+
+def combinar(total: dict, parcial: dict) -> dict:
+    """Suma recursiva de los contadores de un shard sobre el acumulado."""
+    for clave, valor in parcial.items():
+        if isinstance(valor, dict):
+            combinar(total.setdefault(clave, {}), valor)
+        elif isinstance(valor, list):
+            total.setdefault(clave, []).extend(valor)
+        elif isinstance(valor, (int, float)):
+            total[clave] = total.get(clave, 0) + valor
+    return total
+
+
+def informe(total: dict, por_sensor: dict, segundos: float, max_ejemplos: int) -> dict:
+    muestras = total.get("muestras", 0)
+    tasa = (lambda x, n: round(x / n, 6) if n else 0.0)
+    modelos = {}
+    for juego, votos in total.get("votos", {}).items():
+        modelos[juego] = {
+            "tasa_anomalia": tasa(total["anomalias"][juego], muestras),
+            # tasa_voto: votos / muestras; acierto: votos que acabaron en veredicto de anomalía
+            "votantes": {v: {"tasa_voto": tasa(n, muestras), "acierto": tasa(total["aciertos"][juego][v], n)}
+                         for v, n in votos.items()},
+        }
+    comparacion = {}
+    for c, veredicto in total.get("veredicto", {}).items():
+        discrepancias = veredicto["solo_actual"] + veredicto["solo_candidato"]
+        comparacion[c] = {
+            "desacuerdo_veredicto": tasa(discrepancias, muestras),
+            "veredicto": veredicto,
+            "desacuerdo_votos": {v: tasa(n, muestras) for v, n in total["desacuerdo_votos"][c].items()},
+            "ejemplos": total["ejemplos"][c][:max_ejemplos],
+        }
+    return {
+        "muestras": muestras,
+        "segundos": round(segundos, 3),
+        "muestras_por_s": round(muestras / segundos, 1) if segundos > 0 else 0.0,
+        "segundos_lectura": round(total.get("segundos_lectura", 0.0), 3),
+        "segundos_puntuacion": round(total.get("segundos_puntuacion", 0.0), 3),
+        "modelos": modelos,
+        "comparacion": comparacion,
+        "por_sensor": por_sensor,
+    }
+
+
+def imprimir(resultado: dict):
+    print(f"\n📊 {resultado['muestras']} muestras en {resultado['segundos']:.1f}s "
+          f"({resultado['muestras_por_s']:.0f} muestras/s)")
+    for juego, datos in resultado["modelos"].items():
+        votantes = "  ".join(f"{v} {d['tasa_voto']:.2%}/{d['acierto']:.0%}" for v, d in datos["votantes"].items())
+        print(f"   {juego:<14} anomalías {datos['tasa_anomalia']:.3%}   voto/acierto: {votantes}")
+    for c, datos in resultado["comparacion"].items():
+        v = datos["veredicto"]
+        votos = "  ".join(f"{k} {d:.3%}" for k, d in datos["desacuerdo_votos"].items())
+        print(f"   {ACTUAL} vs {c}: desacuerdo de veredicto {datos['desacuerdo_veredicto']:.3%} "
+              f"(ambos {v['ambos']}, solo actual {v['solo_actual']}, solo candidato {v['solo_candidato']})  "
+              f"votos: {votos}")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-puntuación en sombra de la historia con modelos candidatos.")
+    parser.add_argument("--redis-url", required=True, help="Redis restaurado desde un dump (nunca el de producción)")
+    parser.add_argument("--actual", default=MODELS_DIR, help="Directorio del juego de modelos en producción")
+    parser.add_argument("--candidato", action="append", required=True, help="Directorio de un juego candidato (repetible)")
+    parser.add_argument("--sensores", default="", help="IDs separados por comas (por defecto, todos)")
+    parser.add_argument("--desde", default="-", help="Inicio: '-', epoch ms o fecha ISO")
+    parser.add_argument("--hasta", default="+", help="Fin: '+', epoch ms o fecha ISO")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-horas", type=float, default=24.0, help="Ancho de cada shard temporal")
+    parser.add_argument("--chunk", type=int, default=4096, help="Muestras por bloque vectorizado")
+    parser.add_argument("--calentamiento", type=int, default=settings.ONLINE_MIN_SAMPLES * 10,
+                        help="Muestras previas para calentar la estadística online de cada shard")
+    parser.add_argument("--sin-online", action="store_true", help="Excluir el votante de estadística online")
+    parser.add_argument("--ejemplos", type=int, default=20, help="Discrepancias de ejemplo por candidato")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    juegos = {ACTUAL: args.actual}
+    for ruta in args.candidato:
+        nombre = os.path.basename(os.path.normpath(ruta))
+        if nombre in juegos:
+            nombre = ruta
+        juegos[nombre] = ruta
+    online = settings.ONLINE_VOTER_ENABLED and not args.sin_online
+    sensores = {s.strip() for s in args.sensores.split(",") if s.strip()}
+
+    cliente = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    shards = planificar_shards(cliente, sensores, parse_instante(args.desde), parse_instante(args.hasta),
+                               int(args.shard_horas * 3600 * 1000))
+    if not shards:
+        raise SystemExit("No hay muestras en el rango indicado.")
+    logger.info(f"🗂️  {len(shards)} shards sobre {len({k for k, _, _ in shards})} series, "
+                f"{args.workers} procesos, juegos: {', '.join(juegos)}")
+
+    total, por_sensor = {}, {}
+    t_inicio = time.perf_counter()
+    # 'spawn': TensorFlow no tolera fork tras inicializarse
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(args.redis_url, juegos, args.chunk, online, args.calentamiento,
+                                       args.ejemplos)) as pool:
+        futuros = [pool.submit(procesar_shard, shard) for shard in shards]
+        for hecho, futuro in enumerate(as_completed(futuros), start=1):
+            parcial = futuro.result()
+            for c, ejemplos in parcial["ejemplos"].items():
+                del ejemplos[max(args.ejemplos - len(total.get("ejemplos", {}).get(c, [])), 0):]
+            combinar(total, parcial)
+            sensor = por_sensor.setdefault(parcial["sensor"], {"muestras": 0, "discrepancias": 0})
+            sensor["muestras"] += parcial["muestras"]
+            sensor["discrepancias"] += sum(v["solo_actual"] + v["solo_candidato"] for v in parcial["veredicto"].values())
+            if hecho % max(1, len(shards) // 10) == 0:
+                logger.info(f"   {hecho}/{len(shards)} shards ({total.get('muestras', 0)} muestras)")
+    segundos = time.perf_counter() - t_inicio
+
+    resultado = {
+        "commit": git_commit(),
+        "fecha": datetime.now(timezone.utc).isoformat(),
+        "parametros": {
+            "juegos": juegos, "desde": args.desde, "hasta": args.hasta, "sensores": sorted(sensores),
+            "workers": args.workers, "shard_horas": args.shard_horas, "chunk": args.chunk,
+            "online": online, "calentamiento": args.calentamiento, "quorum": AnomalyService.quorum(),
+        },
+        **informe(total, por_sensor, segundos, args.ejemplos),
+    }
+    imprimir(resultado)
+
+    output = args.output or os.path.join(
+        "replay", "results", f"shadow-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{resultado['commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2)
+    print(f"\n💾 Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import pytest
+
+from app.core import admission as admission_module
+from app.core.admission import (
+    NIVEL_COMPLETO, NIVEL_FISICO, NIVEL_LIGERO, AdmissionController, Overloaded
+)
+from app.core.config import settings
+
+
+@pytest.fixture
+def umbrales(monkeypatch):
+    for name, value in {
+        "ADMISSION_LIGHT_INFLIGHT": 2, "ADMISSION_LIGHT_DELAY_MS": 100.0,
+        "ADMISSION_PHYSICAL_INFLIGHT": 4, "ADMISSION_PHYSICAL_DELAY_MS": 500.0,
+        "ADMISSION_REJECT_INFLIGHT": 6, "ADMISSION_REJECT_DELAY_MS": 1000.0,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+
+
+@pytest.mark.parametrize("inflight, delay_ms, esperado", [
+    (1, 0.0, NIVEL_COMPLETO),
+    (2, 100.0, NIVEL_COMPLETO),     # Los umbrales son estrictos (>)
+    (3, 0.0, NIVEL_LIGERO),
+    (1, 101.0, NIVEL_LIGERO),
+    (5, 0.0, NIVEL_FISICO),
+    (1, 501.0, NIVEL_FISICO),
+    (7, 0.0, None),
+    (1, 1001.0, None),
+    (3, 600.0, NIVEL_FISICO),       # Manda la peor de las dos señales
+])
+def test_nivel_por_umbrales(umbrales, inflight, delay_ms, esperado):
+    assert AdmissionController()._nivel(inflight, delay_ms) == esperado
+
+
+def test_admit_cuenta_en_vuelo_y_degrada(umbrales):
+    controller = AdmissionController()
+    with controller.admit() as n1, controller.admit() as n2, controller.admit() as n3:
+        assert (n1, n2, n3) == (NIVEL_COMPLETO, NIVEL_COMPLETO, NIVEL_LIGERO)
+        assert controller.inflight == 3
+    assert controller.inflight == 0
+
+
+def test_admit_rechaza_sin_reservar_hueco(umbrales, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_REJECT_INFLIGHT", 0)
+    controller = AdmissionController()
+    with pytest.raises(Overloaded) as info:
+        with controller.admit():
+            pass
+    assert info.value.retry_after == settings.ADMISSION_RETRY_AFTER_SECONDS
+    assert controller.inflight == 0
+
+
+def test_avisos_limitados_por_nivel(monkeypatch):
+    reloj = [100.0]
+    monkeypatch.setattr(admission_module.time, "monotonic", lambda: reloj[0])
+    monkeypatch.setattr(settings, "ADMISSION_LOG_INTERVAL_SECONDS", 10.0)
+    controller = AdmissionController()
+
+    assert controller._aviso_pendiente(NIVEL_FISICO) == 1
+    assert [controller._aviso_pendiente(NIVEL_FISICO) for _ in range(5)] == [0] * 5
+    # Cada nivel tiene su propia ventana
+    assert controller._aviso_pendiente(NIVEL_LIGERO) == 1
+    reloj[0] += 10.0
+    # Pasada la ventana, el aviso resume las peticiones calladas más la actual
+    assert controller._aviso_pendiente(NIVEL_FISICO) == 6
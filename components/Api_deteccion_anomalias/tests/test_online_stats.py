@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.online_stats import OnlineStatsStore, _FIELDS, score_series, update_state
+
+
+class _HashStore:
+    """Doble mínimo de Redis para score(): solo HMGET sobre un dict en memoria."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hmget(self, key, fields):
+        row = self.hashes.get(key, {})
+        return [row.get(f) for f in fields]
+
+    def put(self, key, state):
+        self.hashes[key] = dict(zip(_FIELDS, (repr(float(v)) for v in state)))
+
+
+def _serie(n=400, seed=7):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(50.0, 2.0, n)
+    x[[120, 250, 333]] = [90.0, 5.0, 120.0]  # Picos que deben salir como outliers
+    return x
+
+
+def _secuencial(values, state=(0.0, 0.0, 0.0, 0.0, 0.0)):
+    """Referencia: score() con el estado previo y luego update(), muestra a muestra."""
+    store, redis = OnlineStatsStore(), _HashStore()
+    mask = []
+    for v in values:
+        redis.put("sensor:s:stats", state)
+        mask.append(store.score("s", v, redis)[0])
+        state = update_state(state, v, settings.ONLINE_EWMA_ALPHA)
+    return np.array(mask, dtype=bool), state
+
+
+def test_update_state_es_welford():
+    x = _serie()
+    state = (0.0, 0.0, 0.0, 0.0, 0.0)
+    for v in x:
+        state = update_state(state, v, settings.ONLINE_EWMA_ALPHA)
+    n, mean, m2, _, _ = state
+    assert n == len(x)
+    assert mean == pytest.approx(x.mean(), rel=1e-12)
+    assert m2 / (n - 1) == pytest.approx(x.var(ddof=1), rel=1e-9)
+
+
+def test_score_series_equivale_a_actualizar_muestra_a_muestra():
+    x = _serie()
+    mask_ref, state_ref = _secuencial(x)
+    mask, state = score_series(x)
+    assert np.array_equal(mask, mask_ref)
+    assert mask[[120, 250, 333]].all()
+    assert state == pytest.approx(state_ref, rel=1e-9)
+
+
+def test_score_series_continua_desde_un_estado_previo():
+    x = _serie()
+    # Dos lotes encadenados dan lo mismo que la serie completa (shards del replay)
+    mask_a, state_a = score_series(x[:150])
+    mask_b, state_b = score_series(x[150:], state_a)
+    mask_ref, state_ref = _secuencial(x)
+    assert np.array_equal(np.concatenate([mask_a, mask_b]), mask_ref)
+    assert state_b == pytest.approx(state_ref, rel=1e-9)
+
+
+def test_arranque_en_frio_no_vota():
+    x = _serie()[:settings.ONLINE_MIN_SAMPLES]
+    mask, state = score_series(x)
+    assert not mask.any()
+    assert state[0] == len(x)
+
+
+def test_serie_vacia_conserva_el_estado():
+    state = (3.0, 1.0, 0.5, 1.0, 0.1)
+    mask, nuevo = score_series(np.array([]), state)
+    assert len(mask) == 0 and nuevo == state
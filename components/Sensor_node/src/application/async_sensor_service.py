@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from src.application.sensor_service import take_measurement
+from src.domain.models import ConfiguracionCluster
+from src.domain.ports import IAsyncZooKeeperAdapter, IAsyncHttpApiAdapter
+from src.infrastructure.metrics import ROUND_SECONDS, FOLLOWER_RESPONSE_SECONDS, ROUND_MEASUREMENTS, ROUNDS_TOTAL
+from src.infrastructure.tracing import tracer, new_round_id
+
+
+class AsyncSensorService:
+    """
+    Capa de aplicación del runtime asyncio: misma lógica de ronda que SensorService,
+    pero como corrutinas, para alojar muchos sensores lógicos en un solo bucle de eventos.
+    """
+    _LEADER_ROUND_INTERVAL_SECONDS = 15
+    _LEADER_TIMEBOX_SECONDS = 5
+
+    def __init__(
+        self,
+        sensor_id: str,
+        zk_adapter: IAsyncZooKeeperAdapter,
+        http_adapter: IAsyncHttpApiAdapter,
+        round_interval: Optional[float] = None,
+        timebox: Optional[float] = None,
+        config: Optional[ConfiguracionCluster] = None
+    ):
+        self.sensor_id = sensor_id
+        self.zk_adapter = zk_adapter
+        self.http_adapter = http_adapter
+        self._stop_event = asyncio.Event()
+        if round_interval is not None:
+            self._LEADER_ROUND_INTERVAL_SECONDS = round_interval
+        if timebox is not None:
+            self._LEADER_TIMEBOX_SECONDS = timebox
+        if config is not None:
+            self._apply_config(config)
+
+    async def start(self):
+        logging.info(f"Iniciando servicio para sensor '{self.sensor_id}'.")
+        await self.zk_adapter.watch_config(self._apply_config)
+        await self.zk_adapter.watch_measurement_round(self._follower_measure_and_publish)
+        await self.zk_adapter.run_for_leader(self._leader_main_loop)
+        logging.info(f"Sensor '{self.sensor_id}' funcionando en modo seguidor. Esperando para ser líder o recibir triggers.")
+
+    async def _wait(self, seconds: float) -> None:
+        """Espera interrumpible por stop()."""
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _leader_main_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                round_id = new_round_id()
+                logging.info(f"--- [LÍDER] Iniciando nueva ronda de monitorización ({round_id}) ---")
+                with tracer.span("lider.ronda", round_id, sensor_id=self.sensor_id):
+                    await self._run_round(round_id)
+
+                logging.info(f"--- [LÍDER] Ronda finalizada. Próxima ronda en {self._LEADER_ROUND_INTERVAL_SECONDS}s. ---")
+                await self._wait(self._LEADER_ROUND_INTERVAL_SECONDS)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"[LÍDER] Error inesperado en el bucle principal: {e}", exc_info=True)
+                await self._wait(5)
+
+        logging.info(f"[LÍDER] Bucle principal detenido para el sensor {self.sensor_id}.")
+
+    async def _run_round(self, round_id: str):
+        t_ronda = time.perf_counter()
+        await self.zk_adapter.clear_measurements()
+        own_measurement = take_measurement(self.sensor_id)
+        await self.zk_adapter.publish_measurement(own_measurement, round_id=round_id)
+        logging.info(f"[LÍDER] Medición propia publicada: {own_measurement:.2f}")
+
+        with tracer.span("lider.recoleccion", round_id, sensor_id=self.sensor_id) as span_attrs:
+            t_trigger = await self.zk_adapter.trigger_measurement_round(round_id=round_id)
+            logging.info(f"[LÍDER] Esperando {self._LEADER_TIMEBOX_SECONDS}s a que los seguidores midan...")
+            await asyncio.sleep(self._LEADER_TIMEBOX_SECONDS)
+
+            all_measurements = await self.zk_adapter.get_all_measurements()
+            all_measurements = [m for m in all_measurements if m.round_id in (None, round_id)]
+            span_attrs["mediciones"] = len(all_measurements)
+
+        ROUND_MEASUREMENTS.observe(len(all_measurements))
+        if t_trigger is not None:
+            for m in all_measurements:
+                if m.sensor_id != self.sensor_id:
+                    FOLLOWER_RESPONSE_SECONDS.observe(max(0.0, m.timestamp.timestamp() - t_trigger))
+        if not all_measurements:
+            logging.warning("[LÍDER] No se recibieron mediciones en esta ronda.")
+            ROUNDS_TOTAL.labels(resultado="vacia").inc()
+            return
+
+        average = sum(m.valor for m in all_measurements) / len(all_measurements)
+        logging.info(f"[LÍDER] Media calculada: {average:.2f} (de {len(all_measurements)} mediciones).")
+
+        with tracer.span("lider.envio_http", round_id, sensor_id=self.sensor_id) as span_attrs:
+            enviado = await self.http_adapter.send_average(average, round_id=round_id)
+            span_attrs["ok"] = enviado
+        ROUND_SECONDS.observe(time.perf_counter() - t_ronda)
+        ROUNDS_TOTAL.labels(resultado="ok" if enviado else "error_envio").inc()
+
+        # Sin confirmación, un líder síncrono que tome el relevo reenviaría esta ronda
+        if enviado:
+            await self.zk_adapter.commit_round(round_id)
+
+    async def _follower_measure_and_publish(self, round_id: Optional[str] = None, trigger_ts: Optional[float] = None):
+        if not self.zk_adapter.am_i_leader():
+            # La fase arranca en el trigger (mtime en ZooKeeper): incluye la entrega del watch
+            with tracer.span("seguidor.publicacion", round_id, start=trigger_ts, sensor_id=self.sensor_id):
+                logging.info(f"[SEGUIDOR] {self.sensor_id} recibió trigger. Tomando medición.")
+                measurement = take_measurement(self.sensor_id)
+                await self.zk_adapter.publish_measurement(measurement, round_id=round_id)
+
+    def _apply_config(self, config: ConfiguracionCluster):
+        """Misma aplicación que SensorService: los nuevos tiempos rigen desde la siguiente ronda."""
+        if config.sampling_period is not None:
+            self._LEADER_ROUND_INTERVAL_SECONDS = float(config.sampling_period)
+        if config.timebox is not None:
+            self._LEADER_TIMEBOX_SECONDS = float(config.timebox)
+        if config.api_url:
+            self.http_adapter.set_api_url(config.api_url)
+
+    async def stop(self):
+        if not self._stop_event.is_set():
+            logging.info(f"Deteniendo servicio del sensor {self.sensor_id}...")
+            self._stop_event.set()
+            await self.zk_adapter.stop()
+            logging.info("Servicio detenido.")
@@ -0,0 +1,152 @@
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.domain.models import Medicion
+
+# Factor que convierte la MAD en una estimación de la desviación típica (normal)
+_MAD_TO_STD = 1.4826
+
+
+@dataclass
+class EvaluacionRonda:
+    """Resultado del pre-scoring de una ronda en el líder."""
+    sospechosas: List[Tuple[Medicion, str]]
+    agregado: Optional[float]     # Media de las lecturas normales (o mediana si no hay)
+    mediana: Optional[float]
+    mad: Optional[float]
+    n: int
+
+
+@dataclass
+class ResumenPeriodico:
+    """Resumen compacto de varias rondas normales que se envía como un único punto."""
+    rondas: int
+    media: float
+    minimo: float
+    maximo: float
+    round_ids: List[str] = field(default_factory=list)
+
+
+class EdgeScorer:
+    """
+    Pre-scoring ligero en el líder, antes de hablar con la API:
+      - Por ronda: mediana/MAD entre las lecturas de los sensores (z robusto).
+      - Por sensor: banda móvil (mediana/MAD) sobre un buffer circular NumPy de sus últimas lecturas.
+    Las lecturas sospechosas se reenvían al momento con el id de su sensor; el agregado de la
+    ronda excluye los outliers (un sensor averiado no diluye ni contamina la media) y las rondas
+    normales se acumulan en un resumen periódico. La ventana solo se vacía con confirm(), tras
+    un envío correcto: si falla, el resumen se reintenta con la siguiente ronda.
+    """
+
+    _MIN_RONDA = 3         # Con menos lecturas la MAD entre sensores no es significativa
+    _MIN_HISTORIA = 10     # Muestras mínimas para usar la banda del propio sensor
+
+    def __init__(self, z_threshold: float = 3.5, band_k: float = 4.0, window: int = 60,
+                 summary_every: int = 4, capacity: int = 16):
+        self.z_threshold = z_threshold
+        self.band_k = band_k
+        self.window = window
+        self.summary_every = max(1, summary_every)
+        self._index = {}
+        self._history = np.full((capacity, window), np.nan, dtype=np.float64)
+        self._pos = np.zeros(capacity, dtype=np.int64)
+        self._pendientes: List[Tuple[str, float]] = []
+
+    def _slots(self, sensor_ids: List[str]) -> np.ndarray:
+        for sensor_id in sensor_ids:
+            if sensor_id not in self._index:
+                slot = len(self._index)
+                if slot >= len(self._history):
+                    # Crecimiento amortizado: duplicamos la tabla
+                    self._history = np.vstack([self._history, np.full_like(self._history, np.nan)])
+                    self._pos = np.concatenate([self._pos, np.zeros_like(self._pos)])
+                self._index[sensor_id] = slot
+        return np.array([self._index[s] for s in sensor_ids], dtype=np.int64)
+
+    @staticmethod
+    def _robust_scale(values: np.ndarray, center) -> np.ndarray:
+        """MAD escalada; si es 0 (lecturas casi idénticas) se recurre a la desviación media absoluta."""
+        dev = np.abs(values - np.expand_dims(center, -1))
+        scale = _MAD_TO_STD * np.nanmedian(dev, axis=-1)
+        fallback = 1.2533 * np.nanmean(dev, axis=-1)
+        return np.where(scale > 0, scale, fallback)
+
+    def score(self, measurements: List[Medicion]) -> EvaluacionRonda:
+        if not measurements:
+            return EvaluacionRonda(sospechosas=[], agregado=None, mediana=None, mad=None, n=0)
+
+        valores = np.array([m.valor for m in measurements], dtype=np.float64)
+        sospechosa = np.zeros(len(valores), dtype=bool)
+        motivos = [""] * len(valores)
+
+        # Banda histórica de cada sensor (vectorizado sobre los sensores de la ronda)
+        slots = self._slots([m.sensor_id for m in measurements])
+        historia = self._history[slots]
+        suficientes = np.sum(~np.isnan(historia), axis=1) >= self._MIN_HISTORIA
+        if suficientes.any():
+            base = np.where(suficientes[:, None], historia, 0.0)
+            centro = np.nanmedian(base, axis=1)
+            escala = self._robust_scale(base, centro)
+        else:
+            centro = escala = np.zeros(len(valores))
+
+        # 1. Entre sensores de la misma ronda. Con pocos sensores la MAD de una ronda es muy
+        # inestable: se acota por abajo con la dispersión típica de los propios sensores.
+        mediana = float(np.median(valores))
+        mad = float(self._robust_scale(valores, mediana))
+        if suficientes.any():
+            mad = max(mad, float(np.median(escala[suficientes])))
+        if len(valores) >= self._MIN_RONDA and mad > 0:
+            z = np.abs(valores - mediana) / mad
+            for i in np.flatnonzero(z > self.z_threshold):
+                sospechosa[i] = True
+                motivos[i] = f"z_ronda={z[i]:.1f}"
+
+        # 2. Contra la banda del propio sensor
+        if suficientes.any():
+            desvio = np.where(escala > 0, np.abs(valores - centro) / np.where(escala > 0, escala, 1.0), 0.0)
+            for i in np.flatnonzero(suficientes & (desvio > self.band_k)):
+                sospechosa[i] = True
+                motivos[i] = ", ".join(filter(None, [motivos[i], f"banda={desvio[i]:.1f}"]))
+
+        # Buffer circular: la lectura entra en la historia de su sensor (la mediana es robusta a outliers)
+        self._history[slots, self._pos[slots] % self.window] = valores
+        self._pos[slots] += 1
+
+        normales = valores[~sospechosa]
+        agregado = float(normales.mean()) if len(normales) else mediana
+        return EvaluacionRonda(
+            sospechosas=[(measurements[i], motivos[i]) for i in np.flatnonzero(sospechosa)],
+            agregado=agregado, mediana=mediana, mad=mad, n=len(valores)
+        )
+
+    def accumulate(self, round_id: str, evaluacion: EvaluacionRonda) -> Optional[ResumenPeriodico]:
+        """Acumula el agregado de la ronda; devuelve el resumen cuando la ventana se completa."""
+        if evaluacion.agregado is None:
+            return None
+        self._pendientes.append((round_id, evaluacion.agregado))
+        if len(self._pendientes) < self.summary_every:
+            return None
+        return self.flush()
+
+    def flush(self) -> Optional[ResumenPeriodico]:
+        """Resumen de todas las rondas pendientes, sin descartarlas (ver confirm)."""
+        if not self._pendientes:
+            return None
+        pendientes = list(self._pendientes)
+        valores = np.array([v for _, v in pendientes])
+        resumen = ResumenPeriodico(
+            rondas=len(pendientes), media=float(valores.mean()),
+            minimo=float(valores.min()), maximo=float(valores.max()),
+            round_ids=[r for r, _ in pendientes]
+        )
+        logging.info(f"[EDGE] Resumen de {resumen.rondas} rondas: media {resumen.media:.2f} "
+                     f"(min {resumen.minimo:.2f}, max {resumen.maximo:.2f}).")
+        return resumen
+
+    def confirm(self, resumen: ResumenPeriodico) -> None:
+        """Descarta las rondas cubiertas por un resumen ya enviado."""
+        del self._pendientes[:resumen.rondas]
@@ -2,12 +2,40 @@ import logging
 import random
 import time
 import threading
+from typing import List, Optional
 import numpy as np
 
+from src.application.edge_scorer import EdgeScorer, ResumenPeriodico
+from src.domain.models import ConfiguracionCluster, EstadoRonda, Medicion
 from src.domain.ports import IZooKeeperAdapter, IHttpApiAdapter
+from src.infrastructure.metrics import (
+    ROUND_SECONDS, FOLLOWER_RESPONSE_SECONDS, ROUND_MEASUREMENTS, ROUNDS_TOTAL,
+    FAILOVER_SECONDS, MONITORING_GAP_SECONDS, EDGE_READINGS_TOTAL, EDGE_SENDS_TOTAL
+)
+from src.infrastructure.tracing import tracer, new_round_id
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s')
 
+
+def take_measurement(sensor_id: str) -> float:
+    """
+    Genera una medición siguiendo una distribución normal para evitar
+    falsos positivos constantes en los modelos de IA.
+    Compartida por los runtimes síncrono y asyncio.
+    """
+    # Cambia loc (media) y scale (desviación) para ajustar a tu dataset de entrenamiento
+    # Si tu dataset rondaba los 50.0, estos valores son ideales.
+    val = np.random.normal(loc=50.0, scale=2.0)
+
+    # Inyectamos una anomalía real de vez en cuando (5% de probabilidad)
+    # para probar el sistema de votación de la API.
+    if random.random() < 0.05:
+        val += random.uniform(30.0, 50.0)
+        logging.warning(f"¡Anomalía simulada generada en nodo {sensor_id}!")
+
+    return round(float(val), 2)
+
+
 class SensorService:
     """
     Capa de aplicación: orquesta la lógica del nodo sensor.
@@ -20,18 +48,43 @@ class SensorService:
         self, 
         sensor_id: str, 
         zk_adapter: IZooKeeperAdapter, 
-        http_adapter: IHttpApiAdapter
+        http_adapter: IHttpApiAdapter,
+        round_interval: Optional[float] = None,
+        timebox: Optional[float] = None,
+        scorer: Optional[EdgeScorer] = None,
+        config: Optional[ConfiguracionCluster] = None
     ):
         self.sensor_id = sensor_id
         self.zk_adapter = zk_adapter
         self.http_adapter = http_adapter
+        # Pre-scoring opcional en el líder (None = enviar la media de cada ronda, como siempre)
+        self.scorer = scorer
+        # Serializa los envíos del pre-scoring con el resumen final de stop()
+        self._envio_lock = threading.Lock()
         self._stop_event = threading.Event()
+        self._standby = False
+        # Relevo en curso: (modo, instante de referencia, mtime de la última ronda confirmada)
+        self._relevo: Optional[tuple] = None
+        # Permite acortar los tiempos en simulaciones/benchmarks sin tocar la producción
+        if round_interval is not None:
+            self._LEADER_ROUND_INTERVAL_SECONDS = round_interval
+        if timebox is not None:
+            self._LEADER_TIMEBOX_SECONDS = timebox
+        # Última configuración conocida (caché local): se arranca con ella sin esperar a ZooKeeper
+        if config is not None:
+            self._apply_config(config)
 
-    def run(self):
+    def start(self):
+        """Se une a la elección y a los triggers sin bloquear (útil para alojar varios sensores)."""
         logging.info(f"Iniciando servicio para sensor '{self.sensor_id}'.")
+        self.zk_adapter.watch_config(self._apply_config)
+        self.zk_adapter.watch_standby(self._on_standby_change)
         self.zk_adapter.run_for_leader(self._leader_main_loop)
         self.zk_adapter.watch_measurement_round(self._follower_measure_and_publish)
         logging.info(f"Sensor '{self.sensor_id}' funcionando en modo seguidor. Esperando para ser líder o recibir triggers.")
+
+    def run(self):
+        self.start()
         
         try:
             self._stop_event.wait()
@@ -41,66 +94,234 @@ class SensorService:
             self.stop()
 
     def _leader_main_loop(self):
+        espera = self._take_over()
         while not self._stop_event.is_set():
+            # wait() en lugar de sleep(): una parada no espera al final del intervalo
+            if espera > 0 and self._stop_event.wait(espera):
+                break
             try:
-                logging.info("--- [LÍDER] Iniciando nueva ronda de monitorización ---")
-                self.zk_adapter.clear_measurements()
-                own_measurement = self._take_measurement()
-                self.zk_adapter.publish_measurement(own_measurement)
-                logging.info(f"[LÍDER] Medición propia publicada: {own_measurement:.2f}")
-
-                self.zk_adapter.trigger_measurement_round()
-                logging.info(f"[LÍDER] Esperando {self._LEADER_TIMEBOX_SECONDS}s a que los seguidores midan...")
-                time.sleep(self._LEADER_TIMEBOX_SECONDS)
-
-                all_measurements = self.zk_adapter.get_all_measurements()
-                if not all_measurements:
-                    logging.warning("[LÍDER] No se recibieron mediciones en esta ronda.")
-                    time.sleep(self._LEADER_ROUND_INTERVAL_SECONDS)
-                    continue
-
-                average = sum(m.valor for m in all_measurements) / len(all_measurements)
-                logging.info(f"[LÍDER] Media calculada: {average:.2f} (de {len(all_measurements)} mediciones).")
-
-                # Envío de la media agregada a la API de IA
-                self.http_adapter.send_average(average)
+                round_id = new_round_id()
+                logging.info(f"--- [LÍDER] Iniciando nueva ronda de monitorización ({round_id}) ---")
+                with tracer.span("lider.ronda", round_id, sensor_id=self.sensor_id):
+                    self._run_round(round_id)
                 
                 logging.info(f"--- [LÍDER] Ronda finalizada. Próxima ronda en {self._LEADER_ROUND_INTERVAL_SECONDS}s. ---")
-                time.sleep(self._LEADER_ROUND_INTERVAL_SECONDS)
+                espera = self._LEADER_ROUND_INTERVAL_SECONDS
 
             except Exception as e:
                 logging.error(f"[LÍDER] Error inesperado en el bucle principal: {e}", exc_info=True)
-                time.sleep(5)
-        
+                espera = 5
+
+        self._flush_pending()
         logging.info(f"[LÍDER] Bucle principal detenido para el sensor {self.sensor_id}.")
 
-    def _follower_measure_and_publish(self):
+    def _take_over(self) -> float:
+        """
+        Relevo del liderazgo. Si la última ronda se disparó pero no llegó a confirmarse,
+        se reanuda sin limpiar ni redisparar (los seguidores ya publicaron para ella).
+        Devuelve la espera hasta la siguiente ronda para mantener la cadencia del líder anterior.
+        """
+        t_elegido = time.perf_counter()
+        try:
+            estado = self.zk_adapter.get_round_state()
+        except Exception as e:
+            logging.error(f"[LÍDER] No se pudo leer el estado de la ronda: {e}")
+            return 0.0
+        modo = "caliente" if estado.caliente else "frio"
+        transcurrido = time.monotonic() - estado.observada if estado.observada is not None else None
+
+        # Sin un trigger visto en vivo, o con la ronda ya vencida, se empieza una ronda nueva ya
+        if transcurrido is None or transcurrido >= self._LEADER_ROUND_INTERVAL_SECONDS:
+            self._relevo = (modo, t_elegido, estado.confirmada_ts)
+            return 0.0
+
+        if estado.pendiente:
+            self._relevo = (modo, t_elegido, estado.confirmada_ts)
+            logging.warning(f"[LÍDER] Relevo {modo}: reanudando la ronda {estado.round_id} "
+                            f"({estado.participantes} participantes en la elección).")
+            try:
+                with tracer.span("lider.ronda", estado.round_id, sensor_id=self.sensor_id, reanudada=True):
+                    self._run_round(estado.round_id, reanudada=estado)
+            except Exception as e:
+                logging.error(f"[LÍDER] Error al reanudar la ronda {estado.round_id}: {e}", exc_info=True)
+        else:
+            # La espera hasta la siguiente ronda es cadencia normal, no tiempo de relevo
+            self._relevo = (modo, t_elegido + self._LEADER_ROUND_INTERVAL_SECONDS - transcurrido, estado.confirmada_ts)
+        return max(0.0, self._LEADER_ROUND_INTERVAL_SECONDS - (time.monotonic() - estado.observada))
+
+    def _run_round(self, round_id: str, reanudada: Optional[EstadoRonda] = None):
+        """
+        Una ronda del líder: trigger -> recolección -> envío -> confirmación.
+        El round_id viaja en cada fase. Con 'reanudada' se continúa la ronda de un líder caído.
+        """
+        t_ronda = time.perf_counter()
+        if reanudada is None:
+            self.zk_adapter.clear_measurements()
+            own_measurement = self._take_measurement()
+            self.zk_adapter.publish_measurement(own_measurement, round_id=round_id)
+            logging.info(f"[LÍDER] Medición propia publicada: {own_measurement:.2f}")
+
+        with tracer.span("lider.recoleccion", round_id, sensor_id=self.sensor_id) as span_attrs:
+            if reanudada is None:
+                t_trigger = self.zk_adapter.trigger_measurement_round(round_id=round_id)
+                timebox = self._LEADER_TIMEBOX_SECONDS
+            else:
+                # Solo resta lo que quedaba de la ventana de la ronda original
+                t_trigger = reanudada.trigger_ts
+                timebox = max(0.0, self._LEADER_TIMEBOX_SECONDS - (time.monotonic() - reanudada.observada))
+            logging.info(f"[LÍDER] Esperando {timebox:.2f}s a que los seguidores midan...")
+            time.sleep(timebox)
+
+            all_measurements = self.zk_adapter.get_all_measurements()
+            # Solo cuentan las mediciones de ESTA ronda (las antiguas sin round_id se aceptan)
+            all_measurements = [m for m in all_measurements if m.round_id in (None, round_id)]
+            span_attrs["mediciones"] = len(all_measurements)
+
+        ROUND_MEASUREMENTS.observe(len(all_measurements))
+        if t_trigger is not None:
+            for m in all_measurements:
+                if m.sensor_id != self.sensor_id:
+                    FOLLOWER_RESPONSE_SECONDS.observe(max(0.0, m.timestamp.timestamp() - t_trigger))
+        if not all_measurements:
+            logging.warning("[LÍDER] No se recibieron mediciones en esta ronda.")
+            ROUNDS_TOTAL.labels(resultado="vacia").inc()
+            return
+
+        if self.scorer is not None:
+            # Tras un relevo el resumen sale ya: confirma la ronda y cierra la medida del relevo
+            enviado = self._send_scored(round_id, all_measurements, forzar=self._relevo is not None)
+        else:
+            average = sum(m.valor for m in all_measurements) / len(all_measurements)
+            logging.info(f"[LÍDER] Media calculada: {average:.2f} (de {len(all_measurements)} mediciones).")
+
+            # Envío de la media agregada a la API de IA
+            with tracer.span("lider.envio_http", round_id, sensor_id=self.sensor_id) as span_attrs:
+                enviado = self.http_adapter.send_average(average, round_id=round_id)
+                span_attrs["ok"] = enviado
+        ROUND_SECONDS.observe(time.perf_counter() - t_ronda)
+        # None = ronda normal acumulada en el resumen periódico (no hubo envío)
+        ROUNDS_TOTAL.labels(resultado="resumida" if enviado is None else "ok" if enviado else "error_envio").inc()
+
+        # Solo se confirma lo que ya está en la API: una ronda acumulada espera al resumen que la cubre
+        if enviado:
+            t_confirmada = self.zk_adapter.commit_round(round_id)
+            if self._relevo is not None:
+                self._report_failover(t_confirmada)
+
+    def _send_scored(self, round_id: str, measurements: List[Medicion], forzar: bool = False) -> Optional[bool]:
+        """
+        Envío con pre-scoring: las lecturas sospechosas salen ya, con el id de su sensor;
+        el agregado sin outliers se acumula y solo se envía el resumen al completar la ventana.
+        Devuelve None si la ronda quedó acumulada y False si falló algún envío.
+        """
+        with self._envio_lock:
+            evaluacion = self.scorer.score(measurements)
+            EDGE_READINGS_TOTAL.labels(resultado="normal").inc(evaluacion.n - len(evaluacion.sospechosas))
+            sospechosas_ok = True
+            for m, motivo in evaluacion.sospechosas:
+                EDGE_READINGS_TOTAL.labels(resultado="sospechosa").inc()
+                logging.warning(f"[LÍDER] Lectura sospechosa de {m.sensor_id}: {m.valor:.2f} ({motivo}). Reenviando a la API.")
+                with tracer.span("lider.envio_sospechosa", round_id, sensor_id=self.sensor_id, origen=m.sensor_id) as span_attrs:
+                    span_attrs["ok"] = self.http_adapter.send_measurement(m.sensor_id, m.valor, round_id=round_id)
+                sospechosas_ok = sospechosas_ok and span_attrs["ok"]
+                EDGE_SENDS_TOTAL.labels(tipo="lectura").inc()
+
+            logging.info(f"[LÍDER] Agregado sin outliers: {evaluacion.agregado:.2f} "
+                         f"(mediana {evaluacion.mediana:.2f}, {evaluacion.n} mediciones).")
+            resumen = self.scorer.accumulate(round_id, evaluacion)
+            if resumen is None and forzar:
+                resumen = self.scorer.flush()
+            if resumen is None:
+                return None if sospechosas_ok else False
+            return self._send_summary(resumen) and sospechosas_ok
+
+    def _send_summary(self, resumen: ResumenPeriodico) -> bool:
+        """Envía un resumen y, solo si llega a la API, descarta sus rondas de la ventana."""
+        round_id = resumen.round_ids[-1]
+        with tracer.span("lider.envio_http", round_id, sensor_id=self.sensor_id, rondas=resumen.rondas) as span_attrs:
+            enviado = self.http_adapter.send_average(resumen.media, round_id=round_id)
+            span_attrs["ok"] = enviado
+        EDGE_SENDS_TOTAL.labels(tipo="resumen").inc()
+        if enviado:
+            self.scorer.confirm(resumen)
+        else:
+            logging.warning(f"[LÍDER] Resumen de {resumen.rondas} rondas no enviado: se reintentará en la próxima ronda.")
+        return enviado
+
+    def _flush_pending(self):
+        """Al dejar el liderazgo o parar, envía y confirma las rondas aún acumuladas."""
+        if self.scorer is None:
+            return
+        with self._envio_lock:
+            resumen = self.scorer.flush()
+            if resumen is None:
+                return
+            logging.info(f"[LÍDER] Enviando el resumen pendiente de {resumen.rondas} rondas antes de ceder el liderazgo.")
+            if self._send_summary(resumen):
+                self.zk_adapter.commit_round(resumen.round_ids[-1])
+
+    def _report_failover(self, t_confirmada: Optional[float]):
+        modo, t_referencia, t_anterior = self._relevo
+        self._relevo = None
+        toma = max(0.0, time.perf_counter() - t_referencia)
+        FAILOVER_SECONDS.labels(modo=modo).observe(toma)
+        if t_confirmada is None or t_anterior is None:
+            logging.warning(f"[LÍDER] Relevo {modo} completado en {toma:.2f}s.")
+            return
+        hueco = t_confirmada - t_anterior
+        MONITORING_GAP_SECONDS.observe(hueco)
+        perdidas = max(0, round(hueco / self._LEADER_ROUND_INTERVAL_SECONDS) - 1)
+        logging.warning(f"[LÍDER] Relevo {modo} completado en {toma:.2f}s. "
+                        f"Hueco de monitorización {hueco:.2f}s ({perdidas} rondas perdidas).")
+
+    def _follower_measure_and_publish(self, round_id: Optional[str] = None, trigger_ts: Optional[float] = None):
         if not self.zk_adapter.am_i_leader():
-            logging.info(f"[SEGUIDOR] {self.sensor_id} recibió trigger. Tomando medición.")
-            measurement = self._take_measurement()
-            self.zk_adapter.publish_measurement(measurement)
+            # La fase arranca en el trigger (mtime en ZooKeeper): incluye la entrega del watch
+            with tracer.span("seguidor.publicacion", round_id, start=trigger_ts, sensor_id=self.sensor_id):
+                logging.info(f"[SEGUIDOR] {self.sensor_id} recibió trigger. Tomando medición.")
+                measurement = self._take_measurement()
+                self.zk_adapter.publish_measurement(measurement, round_id=round_id)
+            # El keep-alive del servidor caduca entre rondas: el suplente lo renueva en cada una
+            if self._standby:
+                self._warm_up()
 
-    def _take_measurement(self) -> float:
+    def _on_standby_change(self, standby: bool):
+        self._standby = standby
+        if standby and not self.zk_adapter.am_i_leader():
+            logging.info(f"[SUPLENTE] {self.sensor_id} en espera activa: estado de ronda en memoria y conexión con la API abierta.")
+            self._warm_up()
+
+    def _warm_up(self):
+        # GET /health bloqueante (hasta 2s): fuera del hilo de eventos de Kazoo, que comparten
+        # todos los watches (triggers, confirmaciones, elección) y no debe esperar a la API
+        threading.Thread(target=self.http_adapter.warm_up, daemon=True, name="ApiWarmUp").start()
+
+    def _apply_config(self, config: ConfiguracionCluster):
         """
-        Genera una medición siguiendo una distribución normal para evitar 
-        falsos positivos constantes en los modelos de IA.
+        Aplica una versión de la configuración del clúster de una sola vez.
+        El líder toma los nuevos tiempos en la siguiente ronda (la ronda en curso no se altera).
         """
-        # Cambia loc (media) y scale (desviación) para ajustar a tu dataset de entrenamiento
-        # Si tu dataset rondaba los 50.0, estos valores son ideales.
-        val = np.random.normal(loc=50.0, scale=2.0)
-        
-        # Inyectamos una anomalía real de vez en cuando (5% de probabilidad) 
-        # para probar el sistema de votación de la API.
-        if random.random() < 0.05:
-            val += random.uniform(30.0, 50.0)
-            logging.warning(f"¡Anomalía simulada generada en nodo {self.sensor_id}!")
+        if config.sampling_period is not None:
+            self._LEADER_ROUND_INTERVAL_SECONDS = float(config.sampling_period)
+        if config.timebox is not None:
+            self._LEADER_TIMEBOX_SECONDS = float(config.timebox)
+        if config.api_url:
+            self.http_adapter.set_api_url(config.api_url)
+        if config.summary_every is not None and self.scorer is not None:
+            self.scorer.summary_every = max(1, int(config.summary_every))
+        logging.info(f"[CONFIG] {self.sensor_id} aplica la versión {config.version}: "
+                     f"ronda cada {self._LEADER_ROUND_INTERVAL_SECONDS}s, timebox {self._LEADER_TIMEBOX_SECONDS}s.")
 
-        return round(float(val), 2)
+    def _take_measurement(self) -> float:
+        return take_measurement(self.sensor_id)
 
     def stop(self):
         if not self._stop_event.is_set():
             logging.info(f"Deteniendo servicio del sensor {self.sensor_id}...")
             self._stop_event.set()
+            # Las rondas acumuladas se envían antes de cerrar la sesión (el commit necesita ZooKeeper)
+            if self.zk_adapter and self.zk_adapter.am_i_leader():
+                self._flush_pending()
             if self.zk_adapter:
                 self.zk_adapter.stop()
             logging.info("Servicio detenido.")
\ No newline at end of file
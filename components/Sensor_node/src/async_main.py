@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+
+from src.application.async_sensor_service import AsyncSensorService
+from src.infrastructure.async_http_api_adapter import AsyncHttpApiAdapter
+from src.infrastructure.async_zookeeper_adapter import AsyncZooKeeperAdapter, SharedZooKeeperSession
+from src.infrastructure.cluster_config import ConfigCache
+from src.infrastructure.metrics import start_metrics_server
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+async def run(sensor_ids, zoo_hosts: str, api_url: str, session_timeout: float = 10.0,
+              config_cache: ConfigCache = None, config=None):
+    """
+    Runtime asyncio: todos los sensores lógicos comparten un bucle de eventos,
+    una sesión de ZooKeeper y un cliente HTTP.
+    """
+    session = SharedZooKeeperSession(hosts=zoo_hosts, session_timeout=session_timeout, config_cache=config_cache)
+    await session.start()
+    http_adapter = AsyncHttpApiAdapter(api_url=api_url)
+
+    services = [
+        AsyncSensorService(
+            sensor_id=sensor_id,
+            zk_adapter=AsyncZooKeeperAdapter(session, sensor_id),
+            http_adapter=http_adapter,
+            config=config
+        )
+        for sensor_id in sensor_ids
+    ]
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        for service in services:
+            await service.start()
+        logging.info(f"{len(services)} sensores lógicos en marcha sobre una única sesión de ZooKeeper.")
+        await stop.wait()
+        logging.warning("Señal de parada recibida. Iniciando apagado ordenado...")
+    finally:
+        await asyncio.gather(*(service.stop() for service in services), return_exceptions=True)
+        await http_adapter.aclose()
+        await session.close()
+
+
+def main():
+    """
+    Punto de entrada del runtime asyncio (pasarelas con decenas de sondas).
+    Uso:
+        python src/async_main.py sensor-1 sensor-2 sensor-3
+        python src/async_main.py --count 40 --prefix gw1-sonda-
+    """
+    parser = argparse.ArgumentParser(description="Varios sensores lógicos en un solo proceso (asyncio).")
+    parser.add_argument("sensor_ids", nargs="*", help="IDs de los sensores lógicos")
+    parser.add_argument("--count", type=int, default=0, help="Generar N IDs con --prefix")
+    parser.add_argument("--prefix", default="sensor-", help="Prefijo de los IDs generados")
+    args = parser.parse_args()
+
+    sensor_ids = list(args.sensor_ids) + [f"{args.prefix}{i}" for i in range(1, args.count + 1)]
+    if not sensor_ids:
+        sys.exit("Uso: python async_main.py <sensor-id> [<sensor-id> ...] | --count N [--prefix P]")
+    if len(set(sensor_ids)) != len(sensor_ids):
+        sys.exit("Error: IDs de sensor duplicados.")
+
+    zoo_hosts = os.getenv("ZOO_HOSTS")
+    if not zoo_hosts:
+        logging.error("Error: La variable de entorno ZOO_HOSTS no está definida.")
+        sys.exit("Error: ZOO_HOSTS no definida.")
+
+    # Última configuración del clúster conocida: arranque inmediato aunque ZooKeeper tarde
+    config_cache = ConfigCache(os.getenv("CONFIG_CACHE_FILE", "/tmp/sensor-gateway-config.json"))
+    config = config_cache.load()
+
+    api_url = os.getenv("API_URL") or (config.api_url if config else None)
+    if not api_url:
+        logging.error("Error: La variable de entorno API_URL no está definida.")
+        sys.exit("Error: API_URL no definida.")
+
+    session_timeout = float(os.getenv("ZOO_SESSION_TIMEOUT", "10"))
+
+    logging.info("--- Configuración de la Pasarela de Sensores ---")
+    logging.info(f"Sensores lógicos: {len(sensor_ids)}")
+    logging.info(f"ZooKeeper Hosts:  {zoo_hosts}")
+    logging.info(f"Timeout sesión:   {session_timeout}s")
+    logging.info(f"URL de la API:      {api_url}")
+    if config:
+        logging.info(f"Config. en caché: versión {config.version} ({config_cache.path})")
+
+    metrics_port = os.getenv("METRICS_PORT")
+    if metrics_port:
+        logging.info(f"Puerto métricas:  {metrics_port}")
+        start_metrics_server(int(metrics_port))
+    logging.info("------------------------------------")
+
+    try:
+        asyncio.run(run(sensor_ids, zoo_hosts, api_url, session_timeout, config_cache, config))
+    except Exception as e:
+        logging.critical(f"Error fatal durante la inicialización o ejecución: {e}", exc_info=True)
+    finally:
+        logging.info("El programa principal ha finalizado.")
+
+
+if __name__ == "__main__":
+    main()
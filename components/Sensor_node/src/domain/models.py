@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional
 
 @dataclass
 class Medicion:
@@ -10,3 +11,39 @@ class Medicion:
     sensor_id: str
     valor: float
     timestamp: datetime
+    round_id: Optional[str] = None
+
+
+@dataclass
+class EstadoRonda:
+    """
+    Última ronda conocida por un sensor (lo que necesita un suplente para tomar el relevo).
+    Los instantes *_ts son mtime de ZooKeeper (segundos); 'observada' es el reloj
+    monotónico local del momento en que se vio el trigger (None si no se vio en vivo).
+    """
+    round_id: Optional[str] = None
+    trigger_ts: Optional[float] = None
+    observada: Optional[float] = None
+    confirmada_id: Optional[str] = None
+    confirmada_ts: Optional[float] = None
+    participantes: int = 0
+    caliente: bool = False  # True si el nodo lo mantuvo en memoria como suplente
+
+    @property
+    def pendiente(self) -> bool:
+        """Hay una ronda disparada que ningún líder llegó a confirmar."""
+        return self.round_id is not None and self.round_id != self.confirmada_id
+
+
+@dataclass
+class ConfiguracionCluster:
+    """
+    Configuración del clúster: un único documento versionado en ZooKeeper.
+    Un sensor solo aplica una versión mayor que la vigente (o la de un znode recreado); los campos a None
+    no modifican el valor local (el de arranque o el de una versión anterior).
+    """
+    version: int = 0
+    sampling_period: Optional[float] = None  # Intervalo entre rondas del líder (s)
+    timebox: Optional[float] = None          # Ventana de recolección de cada ronda (s)
+    api_url: Optional[str] = None
+    summary_every: Optional[int] = None      # Envío por lotes: rondas por resumen del pre-scoring
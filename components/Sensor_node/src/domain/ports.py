@@ -1,9 +1,9 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import List, Callable, TYPE_CHECKING
+from typing import Awaitable, List, Callable, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from .models import Medicion
+    from .models import ConfiguracionCluster, EstadoRonda, Medicion
 
 class IZooKeeperAdapter(ABC):
     """
@@ -31,23 +31,31 @@ class IZooKeeperAdapter(ABC):
         pass
 
     @abstractmethod
-    def trigger_measurement_round(self) -> None:
+    def trigger_measurement_round(self, round_id: Optional[str] = None) -> Optional[float]:
         """
         (Solo Líder) Publica un evento para que los seguidores inicien una medición.
+        El round_id (traza de la ronda) viaja en el propio znode del trigger.
+
+        Returns:
+            Marca temporal del trigger (epoch en segundos, reloj de ZooKeeper)
+            o None si no se pudo publicar.
         """
         pass
 
     @abstractmethod
-    def watch_measurement_round(self, on_trigger_callback: Callable[[], None]) -> None:
+    def watch_measurement_round(self, on_trigger_callback: Callable[[Optional[str], Optional[float]], None]) -> None:
         """
-        (Solo Seguidores) Observa el evento de inicio de ronda y ejecuta un callback.
+        (Solo Seguidores) Observa el evento de inicio de ronda y ejecuta un callback
+        que recibe el round_id de la ronda (None si el líder no lo publicó) y el mtime
+        del trigger (segundos, reloj de ZooKeeper; None si no se vio en vivo).
         """
         pass
 
     @abstractmethod
-    def publish_measurement(self, valor: float) -> None:
+    def publish_measurement(self, valor: float, round_id: Optional[str] = None) -> None:
         """
-        Publica la medición del sensor en un nodo efímero en ZooKeeper.
+        Publica la medición del sensor en un nodo efímero en ZooKeeper,
+        etiquetada con el round_id de la ronda a la que responde.
         """
         pass
 
@@ -55,6 +63,7 @@ class IZooKeeperAdapter(ABC):
     def get_all_measurements(self) -> List[Medicion]:
         """
         (Solo Líder) Obtiene todas las mediciones publicadas por los seguidores.
+        El timestamp de cada medición es el de su publicación (reloj de ZooKeeper).
         """
         pass
     
@@ -65,6 +74,41 @@ class IZooKeeperAdapter(ABC):
         """
         pass
 
+    @abstractmethod
+    def commit_round(self, round_id: str) -> Optional[float]:
+        """
+        (Solo Líder) Confirma que la ronda se envió a la API.
+        Un líder que tome el relevo reanuda desde la última ronda no confirmada.
+
+        Returns:
+            mtime de la confirmación (segundos, reloj de ZooKeeper) o None si falló.
+        """
+        pass
+
+    @abstractmethod
+    def get_round_state(self) -> EstadoRonda:
+        """
+        Estado de la última ronda. Un suplente lo mantiene en memoria (watches);
+        el resto de nodos lo leen de ZooKeeper al asumir el liderazgo.
+        """
+        pass
+
+    @abstractmethod
+    def watch_standby(self, on_standby_change: Callable[[bool], None]) -> None:
+        """
+        Notifica cuando el nodo pasa a ser (o deja de ser) el suplente:
+        el siguiente en la cola de la elección tras el líder.
+        """
+        pass
+
+    @abstractmethod
+    def watch_config(self, on_config_change: Callable[[ConfiguracionCluster], None]) -> None:
+        """
+        Observa el documento de configuración del clúster (un único watch) y ejecuta
+        el callback solo cuando llega una versión mayor que la última aplicada.
+        """
+        pass
+
     @abstractmethod
     def stop(self) -> None:
         """
@@ -79,14 +123,116 @@ class IHttpApiAdapter(ABC):
     """
 
     @abstractmethod
-    def send_average(self, average: float) -> bool:
+    def send_average(self, average: float, round_id: Optional[str] = None) -> bool:
         """
         Envía el valor promedio calculado a la API.
 
         Args:
             average: El valor promedio de las mediciones.
+            round_id: Traza de la ronda, propagada hasta el veredicto de la API.
 
         Returns:
             True si el envío fue exitoso, False en caso contrario.
         """
         pass
+
+    @abstractmethod
+    def send_measurement(self, sensor_id: str, valor: float, round_id: Optional[str] = None) -> bool:
+        """
+        Envía a la API una lectura individual con el id de su sensor
+        (el pre-scoring del líder reenvía así las lecturas sospechosas).
+
+        Returns:
+            True si el envío fue exitoso, False en caso contrario.
+        """
+        pass
+
+    def warm_up(self) -> None:
+        """
+        (Suplente) Abre por adelantado la conexión con la API para que el primer
+        envío tras un relevo no pague el establecimiento de conexión. Opcional.
+        """
+        pass
+
+    def set_api_url(self, api_url: str) -> None:
+        """Cambia en caliente el endpoint de la API (configuración distribuida). Opcional."""
+        pass
+
+
+class IAsyncZooKeeperAdapter(ABC):
+    """
+    Equivalente asíncrono de IZooKeeperAdapter para el runtime asyncio,
+    donde muchos sensores lógicos comparten un mismo bucle de eventos.
+    Mismo contrato que la versión síncrona; los callbacks son corrutinas.
+    """
+
+    @abstractmethod
+    async def run_for_leader(self, on_become_leader_callback: Callable[[], Awaitable[None]]) -> None:
+        """
+        Presenta la candidatura del sensor. Al ganar la elección se lanza la
+        corrutina del bucle del líder como tarea; si se pierde el liderazgo se cancela.
+        """
+        pass
+
+    @abstractmethod
+    def am_i_leader(self) -> bool:
+        """Verifica si el sensor lógico ostenta el liderazgo."""
+        pass
+
+    @abstractmethod
+    async def trigger_measurement_round(self, round_id: Optional[str] = None) -> Optional[float]:
+        """(Solo Líder) Publica el trigger de ronda. Devuelve su mtime en segundos o None."""
+        pass
+
+    @abstractmethod
+    async def watch_measurement_round(self, on_trigger_callback: Callable[[Optional[str], Optional[float]], Awaitable[None]]) -> None:
+        """(Solo Seguidores) Registra la corrutina que se ejecuta con cada trigger (recibe round_id y mtime del trigger)."""
+        pass
+
+    @abstractmethod
+    async def publish_measurement(self, valor: float, round_id: Optional[str] = None) -> None:
+        """Publica la medición del sensor en su nodo efímero."""
+        pass
+
+    @abstractmethod
+    async def get_all_measurements(self) -> List[Medicion]:
+        """(Solo Líder) Obtiene todas las mediciones publicadas."""
+        pass
+
+    @abstractmethod
+    async def clear_measurements(self) -> None:
+        """(Solo Líder) Elimina las mediciones de la ronda actual."""
+        pass
+
+    @abstractmethod
+    async def commit_round(self, round_id: str) -> Optional[float]:
+        """
+        (Solo Líder) Confirma que la ronda se envió a la API (mismo znode que la versión síncrona:
+        un líder síncrono que tome el relevo no reenvía una ronda ya entregada).
+        """
+        pass
+
+    @abstractmethod
+    async def watch_config(self, on_config_change: Callable[[ConfiguracionCluster], None]) -> None:
+        """Registra el callback de configuración (solo versiones nuevas; un watch por proceso)."""
+        pass
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """Retira al sensor lógico de la elección y de los triggers."""
+        pass
+
+
+class IAsyncHttpApiAdapter(ABC):
+    """
+    Equivalente asíncrono de IHttpApiAdapter.
+    """
+
+    @abstractmethod
+    async def send_average(self, average: float, round_id: Optional[str] = None) -> bool:
+        """Envía el valor promedio a la API. True si el envío fue exitoso."""
+        pass
+
+    def set_api_url(self, api_url: str) -> None:
+        """Cambia en caliente el endpoint de la API (configuración distribuida). Opcional."""
+        pass
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import httpx
+
+from src.domain.ports import IAsyncHttpApiAdapter
+from src.infrastructure.metrics import HTTP_SEND_SECONDS
+
+
+class AsyncHttpApiAdapter(IAsyncHttpApiAdapter):
+    """
+    Versión asíncrona de HttpApiAdapter sobre httpx.AsyncClient.
+    Un único cliente (y su pool de conexiones) para todos los sensores lógicos del proceso.
+    """
+    _MAX_RETRY_AFTER_SECONDS = 5
+
+    def __init__(self, api_url: str, client: Optional[httpx.AsyncClient] = None):
+        if not api_url or not api_url.startswith("http"):
+            raise ValueError("La URL de la API es inválida.")
+        self.api_url = api_url
+        self.client = client or httpx.AsyncClient(
+            timeout=5.0,
+            headers={"Content-Type": "application/json", "User-Agent": "SensorNodeClient/1.0"}
+        )
+
+    async def send_average(self, average: float, round_id: Optional[str] = None) -> bool:
+        payload = {
+            "sensor_id": "CLUSTER_AGGREGATE",
+            "valor": average,
+            "timestamp": time.time(),
+            "round_id": round_id
+        }
+
+        logging.info(f"Enviando media {average:.2f} a la API en {self.api_url}")
+
+        t_inicio = time.perf_counter()
+        resultado = "error"
+        try:
+            response = await self.client.post(self.api_url, json=payload)
+
+            retry_after = response.headers.get("Retry-After")
+            if response.status_code == 503 and retry_after and retry_after.isdigit() \
+                    and int(retry_after) <= self._MAX_RETRY_AFTER_SECONDS:
+                logging.warning(f"API sobrecargada. Reintentando en {retry_after}s...")
+                await asyncio.sleep(int(retry_after))
+                response = await self.client.post(self.api_url, json=payload)
+
+            if response.status_code == 422:
+                logging.error(f"❌ Error de Validación de Datos (422): {response.text}")
+                return False
+
+            response.raise_for_status()
+
+            logging.info(f"Media enviada correctamente. Respuesta de la API: {response.status_code}")
+            resultado = "ok"
+            return True
+
+        except httpx.HTTPError as e:
+            logging.error(f"Error de red al contactar la API: {e}")
+            return False
+        except Exception as e:
+            logging.error(f"Error inesperado al enviar datos a la API: {e}")
+            return False
+        finally:
+            HTTP_SEND_SECONDS.labels(resultado=resultado).observe(time.perf_counter() - t_inicio)
+
+    def set_api_url(self, api_url: str) -> None:
+        """Cambia el endpoint en caliente (configuración distribuida). Una URL inválida se ignora."""
+        if not api_url.startswith("http"):
+            logging.error(f"URL de la API inválida en la configuración: {api_url}. Se mantiene {self.api_url}")
+            return
+        if api_url != self.api_url:
+            logging.info(f"Endpoint de la API actualizado: {self.api_url} -> {api_url}")
+            self.api_url = api_url
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
@@ -0,0 +1,348 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from kazoo.client import KazooClient, KazooState
+from kazoo.exceptions import NoNodeError, NodeExistsError
+
+from src.domain.ports import IAsyncZooKeeperAdapter
+from src.domain.models import ConfiguracionCluster, Medicion
+from src.infrastructure.cluster_config import ConfigCache, es_nueva, generacion_znode, parse_config
+# Mismo formato de nodo que la receta Lock/Election de Kazoo: los sensores asyncio
+# y los de un proceso por sensor compiten en la misma elección.
+from src.infrastructure.zookeeper_adapter import ZooKeeperAdapter, _LOCK_MARKER, _lock_sequence
+
+
+def _settle(future: asyncio.Future, value, error: Optional[BaseException]) -> None:
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(value)
+
+
+class SharedZooKeeperSession:
+    """
+    Una única sesión de ZooKeeper para todos los sensores lógicos de un proceso.
+    - Puente Kazoo -> asyncio: las operaciones *_async se resuelven como futures del bucle.
+    - Un solo DataWatch del trigger y de la configuración y un solo ChildrenWatch de
+      /election y /mediciones, repartidos a los sensores lógicos (en lugar de un watch por sensor).
+    Los sensores de un mismo proceso forman un único dominio de fallo: si la sesión
+    expira, todos sus znodos efímeros (candidaturas y mediciones) caen a la vez.
+    """
+
+    def __init__(self, hosts: str, zk_client: Optional[KazooClient] = None, session_timeout: float = 10.0,
+                 config_cache: Optional[ConfigCache] = None):
+        self.zk_client = zk_client or KazooClient(hosts=hosts, timeout=session_timeout)
+        self._config_cache = config_cache
+        self._config_version = config_cache.version if config_cache else 0
+        self._config_generacion = config_cache.generacion if config_cache else None
+        self.config: Optional[ConfiguracionCluster] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._views: Dict[str, "AsyncZooKeeperAdapter"] = {}
+        # Nodo de candidatura en /election -> sensor lógico que lo creó
+        self._candidates: Dict[str, "AsyncZooKeeperAdapter"] = {}
+        self._session_lost = False
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.zk_client.add_listener(self._state_listener)
+        # start() y el registro de watches son bloqueantes: fuera del bucle
+        await self._loop.run_in_executor(None, self.zk_client.start)
+        for path in (ZooKeeperAdapter._ELECTION_PATH, ZooKeeperAdapter._TRIGGER_PATH,
+                     ZooKeeperAdapter._COMMIT_PATH, ZooKeeperAdapter._MEASUREMENTS_PATH):
+            await self.call(self.zk_client.ensure_path_async(path))
+        await self._loop.run_in_executor(None, self._setup_watchers)
+        logging.info("Sesión ZooKeeper compartida iniciada.")
+
+    def call(self, async_result) -> asyncio.Future:
+        """Convierte un IAsyncResult de Kazoo en un future de asyncio."""
+        future = self._loop.create_future()
+
+        def _resolve(result):
+            try:
+                value, error = result.get(), None
+            except Exception as e:
+                value, error = None, e
+            self._loop.call_soon_threadsafe(_settle, future, value, error)
+
+        async_result.rawlink(_resolve)
+        return future
+
+    def _dispatch(self, fn, *args) -> None:
+        """Los callbacks de Kazoo llegan en su hilo: se reenvían al bucle de eventos."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(fn, *args)
+
+    def _setup_watchers(self) -> None:
+        @self.zk_client.DataWatch(ZooKeeperAdapter._TRIGGER_PATH)
+        def on_round_triggered(data, stat, event=None):
+            if data is not None:
+                self._dispatch(self._fan_out_trigger, ZooKeeperAdapter._parse_trigger(data),
+                               stat.mtime / 1000 if event is not None else None)
+
+        @self.zk_client.ChildrenWatch(ZooKeeperAdapter._ELECTION_PATH)
+        def on_candidates(children):
+            self._dispatch(self._evaluate_leadership, list(children))
+
+        @self.zk_client.ChildrenWatch(ZooKeeperAdapter._MEASUREMENTS_PATH)
+        def watch_sensors(children):
+            self._dispatch(self._log_sensors, list(children))
+
+        @self.zk_client.DataWatch(ZooKeeperAdapter._CONFIG_PATH)
+        def on_config(data, stat, event=None):
+            config = parse_config(data) if data else None
+            if config is not None:
+                self._dispatch(self._fan_out_config, config, generacion_znode(stat))
+
+    def _state_listener(self, state):
+        if state == KazooState.LOST:
+            logging.warning("Conexión con ZooKeeper perdida (sesión compartida).")
+            self._dispatch(self._on_session_lost)
+        elif state == KazooState.SUSPENDED:
+            logging.warning("Conexión con ZooKeeper suspendida (sesión compartida).")
+        elif state == KazooState.CONNECTED:
+            logging.info(f"Estado de la conexión con ZooKeeper: {state}")
+            self._dispatch(self._on_connected)
+
+    # --- Lógica en el bucle de eventos ---
+
+    def _fan_out_trigger(self, round_id: Optional[str], trigger_ts: Optional[float]) -> None:
+        for view in list(self._views.values()):
+            view._on_trigger(round_id, trigger_ts)
+
+    def _fan_out_config(self, config: ConfiguracionCluster, generacion: Optional[str]) -> None:
+        # Solo versiones nuevas: las notificaciones repetidas o atrasadas no se reaplican
+        if not es_nueva(config, generacion, self._config_version, self._config_generacion):
+            return
+        self._config_version, self._config_generacion = config.version, generacion
+        self.config = config
+        logging.info(f"[WATCHER] Configuración Distribuida - versión {config.version}: {config}")
+        if self._config_cache:
+            self._config_cache.save(config, generacion)
+        for view in list(self._views.values()):
+            view._on_config(config)
+
+    def _evaluate_leadership(self, children: List[str]) -> None:
+        leader_node = min(children, key=_lock_sequence) if children else None
+        for node, view in list(self._candidates.items()):
+            view._set_leader(node == leader_node)
+
+    def _log_sensors(self, children: List[str]) -> None:
+        if any(view.am_i_leader() for view in self._views.values()):
+            logging.info(f"[LÍDER] Watcher detectó cambio en sensores. Conectados: {children}")
+
+    def _on_session_lost(self) -> None:
+        # Las candidaturas efímeras ya no existen: nadie de este proceso es líder
+        self._session_lost = True
+        candidates, self._candidates = self._candidates, {}
+        for view in candidates.values():
+            view._set_leader(False)
+
+    def _on_connected(self) -> None:
+        if not self._session_lost:
+            return
+        self._session_lost = False
+        for view in list(self._views.values()):
+            if view._leader_callback is not None:
+                asyncio.ensure_future(view._join_election())
+
+    # --- Registro de sensores lógicos ---
+
+    def attach(self, view: "AsyncZooKeeperAdapter") -> None:
+        self._views[view.sensor_id] = view
+
+    def detach(self, view: "AsyncZooKeeperAdapter") -> None:
+        self._views.pop(view.sensor_id, None)
+        for node in [n for n, v in self._candidates.items() if v is view]:
+            del self._candidates[node]
+
+    async def create_candidate(self, view: "AsyncZooKeeperAdapter") -> str:
+        path = await self.call(self.zk_client.create_async(
+            f"{ZooKeeperAdapter._ELECTION_PATH}/{uuid.uuid4().hex}{_LOCK_MARKER}",
+            view.sensor_id.encode('utf-8'), ephemeral=True, sequence=True
+        ))
+        node = path.rsplit("/", 1)[-1]
+        self._candidates[node] = view
+        # El ChildrenWatch también se disparará; evaluamos ya para no esperar su vuelta
+        self._evaluate_leadership(await self.call(self.zk_client.get_children_async(ZooKeeperAdapter._ELECTION_PATH)))
+        return node
+
+    async def close(self) -> None:
+        if self.zk_client.state != 'CLOSED':
+            def _close():
+                self.zk_client.stop()
+                self.zk_client.close()
+            await self._loop.run_in_executor(None, _close)
+        logging.info("Sesión ZooKeeper compartida cerrada.")
+
+
+class AsyncZooKeeperAdapter(IAsyncZooKeeperAdapter):
+    """
+    Vista de un sensor lógico sobre la sesión compartida.
+    Mismos znodos y formatos que ZooKeeperAdapter: ambos runtimes conviven en el clúster.
+    """
+
+    def __init__(self, session: SharedZooKeeperSession, sensor_id: str):
+        self.session = session
+        self.sensor_id = sensor_id
+        self._is_leader = False
+        self._node: Optional[str] = None
+        self._leader_callback: Optional[Callable[[], Awaitable[None]]] = None
+        self._leader_task: Optional[asyncio.Task] = None
+        self._trigger_callback: Optional[Callable[[Optional[str]], Awaitable[None]]] = None
+        self._config_callback: Optional[Callable[[ConfiguracionCluster], None]] = None
+        self._tasks: Set[asyncio.Task] = set()
+        session.attach(self)
+
+    @property
+    def _zk(self) -> KazooClient:
+        return self.session.zk_client
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def run_for_leader(self, on_become_leader_callback: Callable[[], Awaitable[None]]) -> None:
+        self._leader_callback = on_become_leader_callback
+        await self._join_election()
+        logging.info(f"Sensor {self.sensor_id} unido a la elección.")
+
+    async def _join_election(self) -> None:
+        try:
+            self._node = await self.session.create_candidate(self)
+        except Exception as e:
+            logging.error(f"Sensor {self.sensor_id} no pudo presentar candidatura: {e}")
+
+    def _set_leader(self, leader: bool) -> None:
+        if leader and self._leader_task is None:
+            self._leader_task = self._spawn(self._lead())
+        elif not leader and self._leader_task is not None:
+            self._leader_task.cancel()
+            self._leader_task = None
+
+    async def _lead(self) -> None:
+        self._is_leader = True
+        logging.info(f"¡¡¡Sensor {self.sensor_id} es ahora LÍDER!!!")
+        try:
+            await self._leader_callback()
+        finally:
+            self._is_leader = False
+            logging.info(f"Sensor {self.sensor_id} ha cedido el liderazgo.")
+
+    def am_i_leader(self) -> bool:
+        return self._is_leader
+
+    async def trigger_measurement_round(self, round_id: Optional[str] = None) -> Optional[float]:
+        logging.info(f"Líder iniciando nueva ronda de medición ({round_id}).")
+        payload = json.dumps({"ts": time.time(), "round_id": round_id})
+        try:
+            stat = await self.session.call(self._zk.set_async(ZooKeeperAdapter._TRIGGER_PATH, payload.encode('utf-8')))
+            return stat.mtime / 1000
+        except Exception as e:
+            logging.error(f"Error al iniciar ronda: {e}")
+            return None
+
+    async def commit_round(self, round_id: str) -> Optional[float]:
+        payload = json.dumps({"ts": time.time(), "round_id": round_id})
+        try:
+            stat = await self.session.call(self._zk.set_async(ZooKeeperAdapter._COMMIT_PATH, payload.encode('utf-8')))
+            return stat.mtime / 1000
+        except Exception as e:
+            logging.error(f"Error al confirmar la ronda {round_id}: {e}")
+            return None
+
+    async def watch_measurement_round(self, on_trigger_callback: Callable[[Optional[str], Optional[float]], Awaitable[None]]) -> None:
+        self._trigger_callback = on_trigger_callback
+
+    def _on_trigger(self, round_id: Optional[str], trigger_ts: Optional[float] = None) -> None:
+        if self._trigger_callback is not None and not self.am_i_leader():
+            logging.info(f"Seguidor {self.sensor_id} recibió trigger ({round_id}).")
+            self._spawn(self._trigger_callback(round_id, trigger_ts))
+
+    async def watch_config(self, on_config_change: Callable[[ConfiguracionCluster], None]) -> None:
+        self._config_callback = on_config_change
+        # Un sensor que se registra tarde recibe la versión vigente de la sesión
+        if self.session.config is not None:
+            on_config_change(self.session.config)
+
+    def _on_config(self, config: ConfiguracionCluster) -> None:
+        if self._config_callback is not None:
+            self._config_callback(config)
+
+    async def publish_measurement(self, valor: float, round_id: Optional[str] = None) -> None:
+        path = f"{ZooKeeperAdapter._MEASUREMENTS_PATH}/{self.sensor_id}"
+        body = json.dumps({"valor": valor, "round_id": round_id}) if round_id else str(valor)
+        data = body.encode('utf-8')
+        try:
+            await self.session.call(self._zk.create_async(path, data, ephemeral=True))
+            logging.info(f"Sensor {self.sensor_id} publicó medición: {valor}")
+        except NodeExistsError:
+            try:
+                await self.session.call(self._zk.set_async(path, data))
+                logging.info(f"Sensor {self.sensor_id} actualizó medición: {valor}")
+            except Exception as e:
+                logging.error(f"Error al actualizar {self.sensor_id}: {e}")
+        except Exception as e:
+            logging.error(f"Error al publicar {self.sensor_id}: {e}")
+
+    async def get_all_measurements(self) -> List[Medicion]:
+        measurements = []
+        try:
+            children = await self.session.call(self._zk.get_children_async(ZooKeeperAdapter._MEASUREMENTS_PATH))
+            # Todas las lecturas en vuelo a la vez: una ida y vuelta en lugar de N
+            results = await asyncio.gather(
+                *(self.session.call(self._zk.get_async(f"{ZooKeeperAdapter._MEASUREMENTS_PATH}/{c}")) for c in children),
+                return_exceptions=True
+            )
+            for sensor_id, result in zip(children, results):
+                if isinstance(result, Exception):
+                    continue
+                data, stat = result
+                try:
+                    valor, round_id = ZooKeeperAdapter._parse_measurement(data)
+                except Exception:
+                    continue
+                measurements.append(Medicion(
+                    sensor_id=sensor_id, valor=valor,
+                    timestamp=datetime.fromtimestamp(stat.mtime / 1000), round_id=round_id
+                ))
+        except Exception as e:
+            logging.error(f"Error al obtener mediciones: {e}")
+        return measurements
+
+    async def clear_measurements(self) -> None:
+        try:
+            children = await self.session.call(self._zk.get_children_async(ZooKeeperAdapter._MEASUREMENTS_PATH))
+            await asyncio.gather(
+                *(self.session.call(self._zk.delete_async(f"{ZooKeeperAdapter._MEASUREMENTS_PATH}/{c}")) for c in children),
+                return_exceptions=True
+            )
+        except Exception:
+            pass
+
+    async def stop(self) -> None:
+        # Con la sesión compartida no basta con cerrarla: retiramos los znodos de este sensor
+        self._leader_callback = None
+        self._trigger_callback = None
+        self.session.detach(self)
+        for task in list(self._tasks):
+            task.cancel()
+        self._leader_task = None
+        for path in (f"{ZooKeeperAdapter._ELECTION_PATH}/{self._node}" if self._node else None,
+                     f"{ZooKeeperAdapter._MEASUREMENTS_PATH}/{self.sensor_id}"):
+            if path:
+                try:
+                    await self.session.call(self._zk.delete_async(path))
+                except NoNodeError:
+                    pass
+                except Exception as e:
+                    logging.warning(f"No se pudo borrar {path}: {e}")
+        self._node = None
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import tempfile
+from dataclasses import asdict, fields
+from typing import Optional
+
+from src.domain.models import ConfiguracionCluster
+
+# Documento único con toda la configuración del clúster (se escribe con una transacción)
+CONFIG_PATH = "/config/cluster"
+
+_CAMPOS = {f.name for f in fields(ConfiguracionCluster)}
+
+
+def _es_numero(valor) -> bool:
+    # bool es subclase de int: true/false en el JSON no es un período válido
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool)
+
+
+def config_desde_documento(doc: dict) -> ConfiguracionCluster:
+    """
+    Documento ya decodificado -> ConfiguracionCluster validada (ValueError/TypeError si no vale).
+    La usan los sensores y también init_config.py antes de publicar.
+    """
+    if not isinstance(doc, dict):
+        raise ValueError(f"el documento no es un objeto JSON: {type(doc).__name__}")
+    config = ConfiguracionCluster(**{k: v for k, v in doc.items() if k in _CAMPOS})
+    _validar(config)
+    return config
+
+
+def _validar(config: ConfiguracionCluster) -> None:
+    """Tipos de cada campo: un documento con un campo inválido se rechaza entero."""
+    if not isinstance(config.version, int) or isinstance(config.version, bool) or config.version < 0:
+        raise ValueError(f"version no es un entero >= 0: {config.version!r}")
+    for campo in ("sampling_period", "timebox"):
+        valor = getattr(config, campo)
+        if valor is not None and not (_es_numero(valor) and valor > 0):
+            raise ValueError(f"{campo} no es un número positivo: {valor!r}")
+    if config.api_url is not None and not (isinstance(config.api_url, str)
+                                           and config.api_url.startswith(("http://", "https://"))):
+        raise ValueError(f"api_url no es una URL http(s): {config.api_url!r}")
+    if config.summary_every is not None and not (isinstance(config.summary_every, int)
+                                                 and not isinstance(config.summary_every, bool)
+                                                 and config.summary_every >= 1):
+        raise ValueError(f"summary_every no es un entero >= 1: {config.summary_every!r}")
+
+
+def parse_config(data: bytes) -> Optional[ConfiguracionCluster]:
+    """JSON del znode -> ConfiguracionCluster. Las claves desconocidas se ignoran (versiones futuras)."""
+    try:
+        return config_desde_documento(json.loads(data.decode("utf-8")))
+    except (ValueError, TypeError, AttributeError) as e:
+        logging.error(f"[CONFIG] Documento de configuración inválido, se ignora: {e}")
+        return None
+
+
+def serialize_config(config: ConfiguracionCluster, generacion: Optional[str] = None) -> bytes:
+    doc = {k: v for k, v in asdict(config).items() if v is not None}
+    if generacion is not None:
+        doc["generacion"] = generacion
+    return json.dumps(doc, separators=(",", ":")).encode("utf-8")
+
+
+def generacion_znode(stat) -> Optional[str]:
+    """
+    Identidad del znode de configuración (czxid + ctime). Cambia si el znode se borra y se
+    vuelve a crear, p. ej. tras reiniciar ZooKeeper desde cero; el ctime distingue además
+    dos clústeres nuevos que hayan repetido la misma secuencia de zxids.
+    """
+    return f"{stat.czxid:x}-{stat.ctime}" if stat is not None else None
+
+
+def es_nueva(config: ConfiguracionCluster, generacion: Optional[str],
+             version_vigente: int, generacion_vigente: Optional[str]) -> bool:
+    """
+    ¿Hay que aplicar esta configuración? Dentro de un mismo znode, solo versiones mayores.
+    Un znode recreado vuelve a numerar desde 1: su documento sustituye al vigente aunque
+    su versión sea menor. Sin generación conocida (caché antigua) basta con que la versión difiera.
+    """
+    if generacion_vigente is None:
+        return config.version != version_vigente
+    if generacion is not None and generacion != generacion_vigente:
+        return True
+    return config.version > version_vigente
+
+
+class ConfigCache:
+    """
+    Copia local de la última configuración aplicada. Permite arrancar al momento con
+    ella aunque ZooKeeper tarde en responder; la versión del clúster la sustituye después.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = 0
+        self.generacion: Optional[str] = None  # Znode del que procede (ver generacion_znode)
+
+    def load(self) -> Optional[ConfiguracionCluster]:
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"[CONFIG] No se pudo leer la caché {self.path}: {e}")
+            return None
+        config = parse_config(data)
+        if config is not None:
+            self.version = config.version
+            generacion = json.loads(data.decode("utf-8")).get("generacion")
+            self.generacion = generacion if isinstance(generacion, str) else None
+        return config
+
+    def save(self, config: ConfiguracionCluster, generacion: Optional[str] = None) -> None:
+        # Escritura atómica (fichero temporal + rename): nunca se deja una caché a medias
+        try:
+            directorio = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directorio, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directorio, prefix=".config-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(serialize_config(config, generacion))
+            os.replace(tmp, self.path)
+            self.version = config.version
+            self.generacion = generacion
+        except OSError as e:
+            logging.warning(f"[CONFIG] No se pudo guardar la caché {self.path}: {e}")
@@ -1,9 +1,12 @@
 import logging
 import requests
 import time
+from typing import Optional
+from urllib.parse import urlsplit
 from requests.exceptions import RequestException
 
 from src.domain.ports import IHttpApiAdapter
+from src.infrastructure.metrics import HTTP_SEND_SECONDS
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -12,35 +15,68 @@ class HttpApiAdapter(IHttpApiAdapter):
     Implementación del adaptador HTTP para comunicarse con la API externa (Legacy).
     Utiliza la librería `requests` para realizar llamadas POST.
     """
+    # Si la API está sobrecargada (503 + Retry-After) reintentamos una vez si la espera es corta
+    _MAX_RETRY_AFTER_SECONDS = 5
+    # Identificador para diferenciar que es una media del clúster
+    _AGGREGATE_ID = "CLUSTER_AGGREGATE"
 
     def __init__(self, api_url: str):
         if not api_url or not api_url.startswith("http"):
             raise ValueError("La URL de la API es inválida.")
-        self.api_url = api_url
+        self._set_urls(api_url)
         self.session = requests.Session()
         self.session.headers.update({
             "Content-Type": "application/json",
             "User-Agent": "SensorNodeClient/1.0"
         })
 
-    def send_average(self, average: float) -> bool:
+    def _set_urls(self, api_url: str) -> None:
+        parts = urlsplit(api_url)
+        self.api_url = api_url
+        self.health_url = f"{parts.scheme}://{parts.netloc}/health"
+
+    def set_api_url(self, api_url: str) -> None:
+        """Cambia el endpoint en caliente (configuración distribuida). Una URL inválida se ignora."""
+        if not api_url.startswith("http"):
+            logging.error(f"URL de la API inválida en la configuración: {api_url}. Se mantiene {self.api_url}")
+            return
+        if api_url != self.api_url:
+            logging.info(f"Endpoint de la API actualizado: {self.api_url} -> {api_url}")
+            self._set_urls(api_url)
+
+    def send_average(self, average: float, round_id: Optional[str] = None) -> bool:
         """
         Envía el valor promedio de las mediciones a la API configurada.
         """
+        logging.info(f"Enviando media {average:.2f} a la API en {self.api_url}")
+        return self.send_measurement(self._AGGREGATE_ID, average, round_id=round_id)
+
+    def send_measurement(self, sensor_id: str, valor: float, round_id: Optional[str] = None) -> bool:
+        """
+        Envía un valor a la API bajo el sensor indicado (media del clúster o lectura individual).
+        """
         # --- CORRECCIÓN AQUÍ ---
         # El payload DEBE coincidir con el modelo Pydantic de tu API:
         # sensor_id (str), valor (float), timestamp (opcional)
         payload = {
-            "sensor_id": "CLUSTER_AGGREGATE", # Identificador para diferenciar que es una media del clúster
-            "valor": average,                 # La clave exacta que pide tu Pydantic
-            "timestamp": time.time()          # Opcional, pero recomendado
+            "sensor_id": sensor_id,
+            "valor": valor,                   # La clave exacta que pide tu Pydantic
+            "timestamp": time.time(),         # Opcional, pero recomendado
+            "round_id": round_id              # Traza de la ronda (opcional)
         }
-        
-        logging.info(f"Enviando media {average:.2f} a la API en {self.api_url}")
 
+        t_inicio = time.perf_counter()
+        resultado = "error"
         try:
             # Timeout crítico de 5s
             response = self.session.post(self.api_url, json=payload, timeout=5.0)
+
+            retry_after = response.headers.get("Retry-After")
+            if response.status_code == 503 and retry_after and retry_after.isdigit() \
+                    and int(retry_after) <= self._MAX_RETRY_AFTER_SECONDS:
+                logging.warning(f"API sobrecargada. Reintentando en {retry_after}s...")
+                time.sleep(int(retry_after))
+                response = self.session.post(self.api_url, json=payload, timeout=5.0)
             
             # Si la API devuelve 422 (Validation Error), esto nos lo dirá en el log
             if response.status_code == 422:
@@ -49,7 +85,11 @@ class HttpApiAdapter(IHttpApiAdapter):
 
             response.raise_for_status()
             
-            logging.info(f"Media enviada correctamente. Respuesta de la API: {response.status_code}")
+            if sensor_id == self._AGGREGATE_ID:
+                logging.info(f"Media enviada correctamente. Respuesta de la API: {response.status_code}")
+            else:
+                logging.info(f"Lectura individual de {sensor_id} enviada correctamente. Respuesta de la API: {response.status_code}")
+            resultado = "ok"
             return True
             
         except RequestException as e:
@@ -57,4 +97,13 @@ class HttpApiAdapter(IHttpApiAdapter):
             return False
         except Exception as e:
             logging.error(f"Error inesperado al enviar datos a la API: {e}")
-            return False
\ No newline at end of file
+            return False
+        finally:
+            HTTP_SEND_SECONDS.labels(resultado=resultado).observe(time.perf_counter() - t_inicio)
+
+    def warm_up(self) -> None:
+        """Deja una conexión keep-alive abierta en el pool de la sesión (GET /health)."""
+        try:
+            self.session.get(self.health_url, timeout=2.0)
+        except RequestException as e:
+            logging.warning(f"No se pudo precalentar la conexión con la API: {e}")
\ No newline at end of file
@@ -0,0 +1,50 @@
+import logging
+from prometheus_client import Counter, Histogram, start_http_server
+
+# Duración de una ronda completa del líder (trigger -> envío a la API)
+ROUND_SECONDS = Histogram(
+    "sensor_round_duration_seconds", "Duración de una ronda de monitorización del líder",
+    buckets=(0.5, 1.0, 2.5, 5.0, 5.5, 6.0, 7.5, 10.0, 15.0, 30.0)
+)
+
+# Tiempo entre el trigger y la publicación de cada seguidor (ambos con reloj de ZooKeeper)
+FOLLOWER_RESPONSE_SECONDS = Histogram(
+    "sensor_follower_response_seconds", "Tiempo de respuesta de los seguidores al trigger",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+HTTP_SEND_SECONDS = Histogram(
+    "sensor_http_send_seconds", "Latencia del envío de la media a la API",
+    ["resultado"], buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+ROUND_MEASUREMENTS = Histogram(
+    "sensor_round_measurements", "Mediciones recogidas por ronda",
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000)
+)
+
+ROUNDS_TOTAL = Counter("sensor_rounds_total", "Rondas ejecutadas por el líder", ["resultado"])
+
+# Pre-scoring en el líder: lecturas evaluadas y envíos a la API por tipo
+EDGE_READINGS_TOTAL = Counter("sensor_edge_readings_total", "Lecturas evaluadas por el pre-scoring", ["resultado"])
+EDGE_SENDS_TOTAL = Counter("sensor_edge_sends_total", "Envíos a la API con pre-scoring activo", ["tipo"])
+
+# Relevo del líder: desde ganar la elección hasta confirmar la primera ronda
+# (caliente = suplente con estado en memoria; frío = cualquier otro seguidor)
+FAILOVER_SECONDS = Histogram(
+    "sensor_failover_seconds", "Tiempo de toma de relevo del nuevo líder",
+    ["modo"], buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 7.5, 10.0, 15.0, 30.0)
+)
+
+# Hueco de monitorización visto por la API: última ronda confirmada del líder anterior ->
+# primera del nuevo (reloj de ZooKeeper). Incluye la detección por expiración de sesión.
+MONITORING_GAP_SECONDS = Histogram(
+    "sensor_monitoring_gap_seconds", "Hueco entre rondas confirmadas a través de un relevo",
+    buckets=(1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 120.0)
+)
+
+
+def start_metrics_server(port: int) -> None:
+    """Expone /metrics en el puerto indicado (hilo en segundo plano)."""
+    start_http_server(port)
+    logging.info(f"Métricas Prometheus expuestas en :{port}/metrics")
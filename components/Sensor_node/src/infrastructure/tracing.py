@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+import requests
+
+
+def new_round_id() -> str:
+    """Identificador de ronda/traza generado por el líder."""
+    return uuid.uuid4().hex[:16]
+
+
+class Tracer:
+    """
+    Registro de spans por fase de una ronda (seguidor, líder, envío HTTP).
+    Cada span es una línea JSON con round_id, fase e instantes de inicio/fin.
+    Destinos (ambos opcionales):
+      - TRACE_FILE: fichero JSONL local.
+      - TRACE_COLLECTOR_URL: colector HTTP que recibe lotes de spans (POST JSON).
+    """
+
+    _BATCH_SIZE = 50
+
+    def __init__(self, file_path: Optional[str] = None, collector_url: Optional[str] = None, component: str = "sensor"):
+        self.file_path = file_path
+        self.collector_url = collector_url
+        self.component = component
+        self.host = socket.gethostname()
+        self._file_lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        if collector_url:
+            self._queue = queue.Queue(maxsize=10000)
+            threading.Thread(target=self._ship, daemon=True, name="TraceShipper").start()
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(file_path=os.getenv("TRACE_FILE"), collector_url=os.getenv("TRACE_COLLECTOR_URL"))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.file_path or self.collector_url)
+
+    @contextmanager
+    def span(self, name: str, round_id: Optional[str], start: Optional[float] = None, **attrs):
+        """
+        Mide el bloque y exporta el span. 'attrs' puede ampliarse dentro del bloque.
+        'start' adelanta el inicio a un instante conocido (p. ej. el mtime del trigger en ZooKeeper).
+        """
+        start = time.time() if start is None else start
+        try:
+            yield attrs
+        finally:
+            if self.enabled and round_id:
+                end = time.time()
+                self.export({
+                    "round_id": round_id,
+                    "name": name,
+                    "component": self.component,
+                    "host": self.host,
+                    "start": start,
+                    "end": end,
+                    "duration_ms": (end - start) * 1000,
+                    "attrs": attrs,
+                })
+
+    def export(self, span: dict) -> None:
+        if self.file_path:
+            line = json.dumps(span) + "\n"
+            try:
+                with self._file_lock, open(self.file_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                logging.warning(f"No se pudo escribir el span en {self.file_path}: {e}")
+        if self._queue is not None:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                # Nunca bloqueamos la ronda por la telemetría
+                pass
+
+    def _ship(self):
+        session = requests.Session()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self._BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                session.post(self.collector_url, json=batch, timeout=2.0)
+            except Exception as e:
+                logging.warning(f"Colector de trazas no disponible ({e}). Se descartan {len(batch)} spans.")
+
+
+tracer = Tracer.from_env()
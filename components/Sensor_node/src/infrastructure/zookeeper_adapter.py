@@ -1,3 +1,4 @@
+import json
 import logging
 import threading
 import time
@@ -12,11 +13,23 @@ from kazoo.recipe.watchers import DataWatch, ChildrenWatch
 
 # Importamos las interfaces del dominio
 from src.domain.ports import IZooKeeperAdapter
-from src.domain.models import Medicion
+from src.domain.models import ConfiguracionCluster, EstadoRonda, Medicion
+from src.infrastructure.cluster_config import CONFIG_PATH, ConfigCache, es_nueva, generacion_znode, parse_config
 
 # Configuración del logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s')
 
+# Nodos de la receta Lock/Election de Kazoo: "<uuid>__lock__<secuencia>"
+_LOCK_MARKER = "__lock__"
+
+
+def _lock_sequence(node: str) -> str:
+    """Clave de orden de la cola de la elección (la misma que usa Kazoo)."""
+    idx = node.find(_LOCK_MARKER)
+    # Nodos ajenos a la receta se ordenan al final, igual que hace Kazoo
+    return node[idx + len(_LOCK_MARKER):] if idx != -1 else "~"
+
+
 class ZooKeeperAdapter(IZooKeeperAdapter):
     """
     Implementación concreta para Software Crítico (UMA).
@@ -24,28 +37,46 @@ class ZooKeeperAdapter(IZooKeeperAdapter):
     """
     _ELECTION_PATH = "/election"
     _TRIGGER_PATH = "/config/ronda_trigger"
+    # Última ronda enviada a la API: un nuevo líder reanuda desde aquí
+    _COMMIT_PATH = "/config/ronda_confirmada"
     _MEASUREMENTS_PATH = "/mediciones"
     
-    # Rutas para configuración distribuida [cite: 60]
-    _CONFIG_URL_PATH = "/config/api_url"
-    _CONFIG_PERIOD_PATH = "/config/sampling_period"
+    # Configuración distribuida: un único documento versionado [cite: 60]
+    _CONFIG_PATH = CONFIG_PATH
 
-    def __init__(self, hosts: str, sensor_id: str):
+    def __init__(self, hosts: str, sensor_id: str, zk_client: Optional[KazooClient] = None,
+                 session_timeout: float = 10.0, config_cache: Optional[ConfigCache] = None):
         self.sensor_id = sensor_id
-        self.zk_client = KazooClient(hosts=hosts)
+        # La caché local fija la versión de partida: solo se aplican versiones posteriores
+        # del mismo znode (uno recreado, p. ej. tras reiniciar ZooKeeper, manda siempre)
+        self._config_cache = config_cache
+        self._config_version = config_cache.version if config_cache else 0
+        self._config_generacion = config_cache.generacion if config_cache else None
+        # Se admite un cliente ya construido (p. ej. instrumentado por el simulador).
+        # El timeout de sesión acota cuánto tarda en detectarse la caída del líder.
+        self.zk_client = zk_client or KazooClient(hosts=hosts, timeout=session_timeout)
         self.election: Optional[Election] = None
         self._is_leader = False
         self._leader_election_thread: Optional[threading.Thread] = None
 
+        # Estado de relevo: último trigger visto, última confirmación y puesto en la elección
+        self._state_lock = threading.Lock()
+        self._trigger = (None, None, None)   # (round_id, mtime, instante monotónico observado)
+        self._commit: Optional[tuple] = None  # (round_id, mtime), solo se cachea siendo suplente
+        self._participants = 0
+        self._is_standby = False
+        self._was_standby = False
+        self._commit_watch = False  # El DataWatch de confirmaciones se registra una sola vez
+        self._standby_callback: Optional[Callable[[bool], None]] = None
+
         self.zk_client.add_listener(self._state_listener)
         self.zk_client.start()
 
         # Aseguramos rutas base persistentes [cite: 12]
         self.zk_client.ensure_path(self._ELECTION_PATH)
         self.zk_client.ensure_path(self._TRIGGER_PATH)
+        self.zk_client.ensure_path(self._COMMIT_PATH)
         self.zk_client.ensure_path(self._MEASUREMENTS_PATH)
-        self.zk_client.ensure_path(self._CONFIG_URL_PATH)
-        self.zk_client.ensure_path(self._CONFIG_PERIOD_PATH)
 
         # Inicializamos los Watchers obligatorios [cite: 58]
         self._setup_watchers()
@@ -53,19 +84,7 @@ class ZooKeeperAdapter(IZooKeeperAdapter):
     def _setup_watchers(self):
         """Configuración de DataWatch y ChildrenWatch [cite: 59, 61]"""
         
-        # 1. DataWatch para URL de la API 
-        @self.zk_client.DataWatch(self._CONFIG_URL_PATH)
-        def watch_api_url(data, stat, event=None):
-            if data:
-                logging.info(f"[WATCHER] Configuración Distribuida - Nueva URL: {data.decode('utf-8')}")
-
-        # 2. DataWatch para Periodo de Muestreo 
-        @self.zk_client.DataWatch(self._CONFIG_PERIOD_PATH)
-        def watch_sampling_period(data, stat, event=None):
-            if data:
-                logging.info(f"[WATCHER] Configuración Distribuida - Nuevo Periodo: {data.decode('utf-8')}s")
-
-        # 3. ChildrenWatch para presencia de dispositivos 
+        # ChildrenWatch para presencia de dispositivos 
         @self.zk_client.ChildrenWatch(self._MEASUREMENTS_PATH)
         def watch_sensors(children):
             # El líder debe mostrar mensajes cuando se conecten/desconecten dispositivos 
@@ -86,12 +105,18 @@ class ZooKeeperAdapter(IZooKeeperAdapter):
 
         def election_task():
             def leader_logic_wrapper():
+                # Se recuerda si llegamos como suplente (estado en memoria) antes de dejar de serlo
+                self._was_standby = self._is_standby
                 self._is_leader = True
+                self._set_standby(False)
                 logging.info(f"¡¡¡Sensor {self.sensor_id} es ahora LÍDER!!!")
                 try:
                     on_become_leader_callback()
                 finally:
                     self._is_leader = False
+                    self._was_standby = False
+                    with self._state_lock:
+                        self._commit = None
                     logging.info(f"Sensor {self.sensor_id} ha cedido el liderazgo.")
             
             self.election.run(leader_logic_wrapper)
@@ -100,29 +125,115 @@ class ZooKeeperAdapter(IZooKeeperAdapter):
         self._leader_election_thread.start()
         logging.info(f"Sensor {self.sensor_id} unido a la elección.")
 
+        # Puesto en la cola: el siguiente tras el líder actúa como suplente en caliente
+        @self.zk_client.ChildrenWatch(self._ELECTION_PATH)
+        def watch_candidates(children):
+            node = getattr(self.election.lock, "node", None) if self.election else None
+            ordered = sorted(children, key=_lock_sequence)
+            with self._state_lock:
+                self._participants = len(ordered)
+            # Puesto 0 sin liderazgo todavía = ganador a punto de arrancar: sigue contando como suplente
+            self._set_standby(node is not None and node in ordered[:2] and not self._is_leader)
+
+    def _set_standby(self, standby: bool) -> None:
+        if standby == self._is_standby:
+            return
+        self._is_standby = standby
+        if standby:
+            logging.info(f"Sensor {self.sensor_id} es ahora SUPLENTE del líder.")
+            # Registrar watches hace llamadas síncronas: fuera del hilo de callbacks de Kazoo
+            threading.Thread(target=self._watch_commits, daemon=True, name="StandbyWatch").start()
+        elif not self._is_leader:
+            # Sin el watch la caché quedaría obsoleta (al asumir el liderazgo sí se conserva)
+            with self._state_lock:
+                self._commit = None
+        if self._standby_callback:
+            threading.Thread(target=self._standby_callback, args=(standby,), daemon=True, name="StandbyCallback").start()
+
+    def _watch_commits(self) -> None:
+        with self._state_lock:
+            registrado, self._commit_watch = self._commit_watch, True
+        if registrado:
+            # Si el puesto oscila no se apilan watches: basta con refrescar la caché una vez
+            try:
+                data, stat = self.zk_client.get(self._COMMIT_PATH)
+            except Exception as e:
+                logging.error(f"Error al leer la última ronda confirmada: {e}")
+                return
+            self._cache_commit(data, stat)
+            return
+
+        @self.zk_client.DataWatch(self._COMMIT_PATH)
+        def on_round_committed(data, stat, event=None):
+            self._cache_commit(data, stat)
+
+    def _cache_commit(self, data, stat) -> None:
+        # El watch sigue vivo fuera del rol de suplente, pero solo entonces se cachea
+        with self._state_lock:
+            if self._is_standby:
+                self._commit = (self._parse_trigger(data) if data else None, stat.mtime / 1000 if stat else None)
+
+    def watch_standby(self, on_standby_change: Callable[[bool], None]) -> None:
+        self._standby_callback = on_standby_change
+
+    def watch_config(self, on_config_change: Callable[[ConfiguracionCluster], None]) -> None:
+        """Un solo DataWatch para toda la configuración; se ignoran versiones ya aplicadas [cite: 59]"""
+        @self.zk_client.DataWatch(self._CONFIG_PATH)
+        def on_config(data, stat, event=None):
+            config = parse_config(data) if data else None
+            generacion = generacion_znode(stat)
+            if config is None or not es_nueva(config, generacion, self._config_version, self._config_generacion):
+                return
+            self._config_version, self._config_generacion = config.version, generacion
+            logging.info(f"[WATCHER] Configuración Distribuida - versión {config.version}: {config}")
+            if self._config_cache:
+                self._config_cache.save(config, generacion)
+            on_config_change(config)
+
     def am_i_leader(self) -> bool:
         return self._is_leader
 
-    def trigger_measurement_round(self) -> None:
+    def trigger_measurement_round(self, round_id: Optional[str] = None) -> Optional[float]:
         """Inicia ronda notificando a seguidores vía DataWatch [cite: 84, 100]"""
-        logging.info("Líder iniciando nueva ronda de medición.")
+        logging.info(f"Líder iniciando nueva ronda de medición ({round_id}).")
+        payload = json.dumps({"ts": time.time(), "round_id": round_id})
         try:
-            self.zk_client.set(self._TRIGGER_PATH, str(time.time()).encode('utf-8'))
+            stat = self.zk_client.set(self._TRIGGER_PATH, payload.encode('utf-8'))
+            # mtime del znode: mismo reloj que las mediciones, comparable sin sincronizar relojes
+            return stat.mtime / 1000
         except Exception as e:
             logging.error(f"Error al iniciar ronda: {e}")
+            return None
+
+    @staticmethod
+    def _parse_trigger(data: bytes) -> Optional[str]:
+        # Compatibilidad: los líderes antiguos escriben solo el timestamp
+        try:
+            return json.loads(data.decode('utf-8')).get("round_id")
+        except (ValueError, AttributeError):
+            return None
 
-    def watch_measurement_round(self, on_trigger_callback: Callable[[], None]) -> None:
+    def watch_measurement_round(self, on_trigger_callback: Callable[[Optional[str], Optional[float]], None]) -> None:
         """Seguidores escuchan el trigger para medir [cite: 100, 101]"""
         @self.zk_client.DataWatch(self._TRIGGER_PATH)
         def on_round_triggered(data, stat, event=None):
+            if data is not None:
+                # La primera lectura (event None) es un trigger antiguo: sin instante observado
+                with self._state_lock:
+                    self._trigger = (self._parse_trigger(data), stat.mtime / 1000,
+                                     time.monotonic() if event is not None else None)
             if data is not None and not self.am_i_leader():
-                logging.info(f"Seguidor {self.sensor_id} recibió trigger.")
-                on_trigger_callback()
+                round_id = self._parse_trigger(data)
+                logging.info(f"Seguidor {self.sensor_id} recibió trigger ({round_id}).")
+                # El mtime permite medir también la entrega del watch (None para un trigger antiguo)
+                on_trigger_callback(round_id, stat.mtime / 1000 if event is not None else None)
 
-    def publish_measurement(self, valor: float) -> None:
+    def publish_measurement(self, valor: float, round_id: Optional[str] = None) -> None:
         """Publica en znodo efímero /mediciones/{id} [cite: 12, 43]"""
         path = f"{self._MEASUREMENTS_PATH}/{self.sensor_id}"
-        data = str(valor).encode('utf-8')
+        # Sin round_id mantenemos el formato plano que entienden los líderes antiguos
+        body = json.dumps({"valor": valor, "round_id": round_id}) if round_id else str(valor)
+        data = body.encode('utf-8')
         try:
             # Crear nodo efímero (se borra si el sensor cae) 
             self.zk_client.create(path, data, ephemeral=True)
@@ -142,13 +253,24 @@ class ZooKeeperAdapter(IZooKeeperAdapter):
             for sensor_id in children:
                 try:
                     data, stat = self.zk_client.get(f"{self._MEASUREMENTS_PATH}/{sensor_id}")
-                    valor = float(data.decode('utf-8'))
-                    measurements.append(Medicion(sensor_id=sensor_id, valor=valor, timestamp=datetime.now()))
+                    valor, round_id = self._parse_measurement(data)
+                    measurements.append(Medicion(
+                        sensor_id=sensor_id, valor=valor,
+                        timestamp=datetime.fromtimestamp(stat.mtime / 1000), round_id=round_id
+                    ))
                 except Exception: continue
         except Exception as e:
             logging.error(f"Error al obtener mediciones: {e}")
         return measurements
 
+    @staticmethod
+    def _parse_measurement(data: bytes):
+        text = data.decode('utf-8')
+        if text.startswith("{"):
+            body = json.loads(text)
+            return float(body["valor"]), body.get("round_id")
+        return float(text), None
+
     def clear_measurements(self) -> None:
         """Limpia los znodos antes de una nueva ronda [cite: 44]"""
         try:
@@ -158,6 +280,35 @@ class ZooKeeperAdapter(IZooKeeperAdapter):
                 except Exception: pass
         except Exception: pass
 
+    def commit_round(self, round_id: str) -> Optional[float]:
+        payload = json.dumps({"ts": time.time(), "round_id": round_id})
+        try:
+            stat = self.zk_client.set(self._COMMIT_PATH, payload.encode('utf-8'))
+            return stat.mtime / 1000
+        except Exception as e:
+            logging.error(f"Error al confirmar la ronda {round_id}: {e}")
+            return None
+
+    def get_round_state(self) -> EstadoRonda:
+        with self._state_lock:
+            round_id, trigger_ts, observada = self._trigger
+            commit = self._commit
+            participantes = self._participants
+        caliente = self._was_standby and commit is not None
+        if commit is None:
+            # Nodo frío: una lectura de la última confirmación
+            try:
+                data, stat = self.zk_client.get(self._COMMIT_PATH)
+                commit = (self._parse_trigger(data) if data else None, stat.mtime / 1000 if data else None)
+            except Exception as e:
+                logging.error(f"Error al leer la última ronda confirmada: {e}")
+                commit = (None, None)
+        return EstadoRonda(
+            round_id=round_id, trigger_ts=trigger_ts, observada=observada,
+            confirmada_id=commit[0], confirmada_ts=commit[1],
+            participantes=participantes, caliente=caliente
+        )
+
     def stop(self) -> None:
         if self.election:
             try: self.election.cancel()
@@ -6,6 +6,10 @@ import signal
 from application.sensor_service import SensorService
 from infrastructure.zookeeper_adapter import ZooKeeperAdapter
 from infrastructure.http_api_adapter import HttpApiAdapter
+# Mismo nombre de módulo que usan los adaptadores (evita registrar las métricas dos veces)
+from src.infrastructure.metrics import start_metrics_server
+from src.application.edge_scorer import EdgeScorer
+from src.infrastructure.cluster_config import ConfigCache
 
 # Configuración del logging para que sea informativo, incluyendo el nombre del hilo
 logging.basicConfig(
@@ -34,15 +38,38 @@ def main():
         logging.error("Error: La variable de entorno ZOO_HOSTS no está definida.")
         sys.exit("Error: ZOO_HOSTS no definida.")
 
-    api_url = os.getenv("API_URL")
+    # Última configuración del clúster conocida: arranque inmediato aunque ZooKeeper tarde
+    config_cache = ConfigCache(os.getenv("CONFIG_CACHE_FILE", f"/tmp/sensor-{sensor_id}-config.json"))
+    config = config_cache.load()
+
+    api_url = os.getenv("API_URL") or (config.api_url if config else None)
     if not api_url:
         logging.error("Error: La variable de entorno API_URL no está definida.")
         sys.exit("Error: API_URL no definida.")
+
+    # Acota la detección de la caída del líder (ZooKeeper lo limita a 2-20 ticks)
+    session_timeout = float(os.getenv("ZOO_SESSION_TIMEOUT", "10"))
     
     logging.info("--- Configuración del Nodo Sensor ---")
     logging.info(f"ID del Sensor:    {sensor_id}")
     logging.info(f"ZooKeeper Hosts:  {zoo_hosts}")
+    logging.info(f"Timeout sesión:   {session_timeout}s")
     logging.info(f"URL de la API:      {api_url}")
+    if config:
+        logging.info(f"Config. en caché: versión {config.version} ({config_cache.path})")
+
+    metrics_port = os.getenv("METRICS_PORT")
+    if metrics_port:
+        logging.info(f"Puerto métricas:  {metrics_port}")
+
+    # Pre-scoring en el líder: reenvía lecturas sospechosas y resume las rondas normales
+    scorer = None
+    if os.getenv("EDGE_SCORING", "false").lower() in ("1", "true", "yes"):
+        scorer = EdgeScorer(
+            z_threshold=float(os.getenv("EDGE_Z_THRESHOLD", "3.5")),
+            summary_every=int(os.getenv("EDGE_SUMMARY_EVERY", "4"))
+        )
+        logging.info(f"Pre-scoring:      activo (resumen cada {scorer.summary_every} rondas)")
     logging.info("------------------------------------")
 
     service: SensorService = None
@@ -57,15 +84,21 @@ def main():
     signal.signal(signal.SIGTERM, graceful_shutdown)
 
     try:
+        if metrics_port:
+            start_metrics_server(int(metrics_port))
+
         # 2. Inyección de Dependencias
         logging.info("Inicializando adaptadores y servicio...")
-        zk_adapter = ZooKeeperAdapter(hosts=zoo_hosts, sensor_id=sensor_id)
+        zk_adapter = ZooKeeperAdapter(hosts=zoo_hosts, sensor_id=sensor_id, session_timeout=session_timeout,
+                                      config_cache=config_cache)
         http_adapter = HttpApiAdapter(api_url=api_url)
         
         service = SensorService(
             sensor_id=sensor_id,
             zk_adapter=zk_adapter,
-            http_adapter=http_adapter
+            http_adapter=http_adapter,
+            scorer=scorer,
+            config=config
         )
 
         # 3. Arrancar el servicio
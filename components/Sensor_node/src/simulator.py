@@ -0,0 +1,372 @@
+"""
+Simulador en proceso de un clúster de sensores para pruebas de escala.
+
+Ejecuta cientos o miles de SensorService virtuales (cada uno con su sesión de
+ZooKeeper, igual que en producción) contra un ZooKeeper local, con un adaptador
+HTTP simulado. Inyecta caídas del líder y rotación de seguidores, y al final
+informa de latencia de ronda, completitud, tiempo de failover y operaciones
+ZooKeeper por ronda.
+
+Uso (desde components/Sensor_node):
+    python -m src.simulator --hosts 127.0.0.1:2181 --sensors 200 --duration 120
+    python -m src.simulator --zk-harness --sensors 50 --kill-leader-every 30 --churn 5
+    python -m src.simulator --sensors 50 --kill-leader-every 30 --kill-mode hard
+
+Caídas del líder (--kill-mode): 'graceful' lo para limpiamente (sus znodos efímeros
+desaparecen al instante); 'hard' corta su conexión sin cerrar la sesión, como un crash,
+y el failover incluye la detección por expiración de sesión; 'both' alterna ambas.
+
+--zk-harness levanta un ZooKeeper efímero con el harness de pruebas de kazoo
+(requiere los binarios de ZooKeeper en ZOOKEEPER_PATH).
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+from kazoo.client import KazooClient
+
+from src.application.edge_scorer import EdgeScorer
+from src.application.sensor_service import SensorService
+from src.domain.ports import IHttpApiAdapter
+from src.infrastructure.zookeeper_adapter import ZooKeeperAdapter
+
+# Prefijo de raíz aislada (chroot) para no mezclar la simulación con un clúster real
+_CHROOT = "/simulador"
+
+# Destino sin servidor: un cliente 'caído' reintenta contra él y nunca renueva su sesión
+_UNREACHABLE = [("127.0.0.1", 1)]
+
+KILL_MODES = ("graceful", "hard")
+
+
+class CountingKazooClient(KazooClient):
+    """KazooClient que cuenta cada petición enviada a ZooKeeper (incluidas las de recetas y watchers)."""
+
+    ops = Counter()
+    _ops_lock = threading.Lock()
+
+    def _call(self, request, async_object):
+        with CountingKazooClient._ops_lock:
+            CountingKazooClient.ops[type(request).__name__] += 1
+        return super()._call(request, async_object)
+
+
+class SimulationRecorder:
+    """Registro compartido de eventos de la simulación (rondas, envíos, failovers)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rounds: Dict[str, dict] = {}
+        self.triggers: List[float] = []
+        self.sends: List[float] = []
+        self.kills: List[tuple] = []  # (instante, modo)
+        self.forwarded = 0
+        self.alive = 0
+
+    def on_trigger(self, round_id: str, leader: str):
+        now = time.time()
+        with self.lock:
+            self.triggers.append(now)
+            self.rounds[round_id] = {"leader": leader, "trigger": now, "alive": self.alive}
+
+    def on_collect(self, round_id: str, count: int, last_publish: Optional[float]):
+        with self.lock:
+            entry = self.rounds.setdefault(round_id, {})
+            entry["measurements"] = count
+            entry["last_publish"] = last_publish
+
+    def on_send(self, round_id: Optional[str]):
+        now = time.time()
+        with self.lock:
+            self.sends.append(now)
+            if round_id in self.rounds:
+                self.rounds[round_id]["sent"] = now
+
+
+class SimZooKeeperAdapter(ZooKeeperAdapter):
+    """Adaptador real de ZooKeeper con ganchos para registrar cada fase de la ronda."""
+
+    def __init__(self, hosts: str, sensor_id: str, recorder: SimulationRecorder, session_timeout: float):
+        client = CountingKazooClient(hosts=hosts + _CHROOT, timeout=session_timeout)
+        self.recorder = recorder
+        self._current_round: Optional[str] = None
+        super().__init__(hosts=hosts, sensor_id=sensor_id, zk_client=client)
+
+    def trigger_measurement_round(self, round_id: Optional[str] = None) -> Optional[float]:
+        self._current_round = round_id
+        self.recorder.on_trigger(round_id, self.sensor_id)
+        return super().trigger_measurement_round(round_id=round_id)
+
+    def get_round_state(self):
+        # Un relevo que reanuda la ronda pendiente no vuelve a disparar: se sigue contando como la misma
+        estado = super().get_round_state()
+        if estado.pendiente:
+            self._current_round = estado.round_id
+        return estado
+
+    def get_all_measurements(self):
+        measurements = super().get_all_measurements()
+        current = [m for m in measurements if m.round_id in (None, self._current_round)]
+        last = max((m.timestamp.timestamp() for m in current), default=None)
+        self.recorder.on_collect(self._current_round, len(current), last)
+        return measurements
+
+
+class StubHttpApiAdapter(IHttpApiAdapter):
+    """Sustituto de la API: registra el envío y simula una latencia configurable."""
+
+    def __init__(self, recorder: SimulationRecorder, latency: float = 0.0):
+        self.recorder = recorder
+        self.latency = latency
+        self.dead = False  # Nodo caído: sus hilos residuales no llegan a la API
+
+    def send_average(self, average: float, round_id: Optional[str] = None) -> bool:
+        if self.dead:
+            return False
+        if self.latency:
+            time.sleep(self.latency)
+        self.recorder.on_send(round_id)
+        return True
+
+    def send_measurement(self, sensor_id: str, valor: float, round_id: Optional[str] = None) -> bool:
+        if self.dead:
+            return False
+        if self.latency:
+            time.sleep(self.latency)
+        with self.recorder.lock:
+            self.recorder.forwarded += 1
+        return True
+
+
+class ClusterSimulator:
+    def __init__(self, args):
+        self.args = args
+        self.recorder = SimulationRecorder()
+        self.services: Dict[str, SensorService] = {}
+        # Nodos caídos en modo 'hard': se cierran al final, cuando su sesión ya expiró
+        self.crashed: List[SensorService] = []
+        self._next_id = 0
+        self._kills = 0
+
+    def _spawn(self) -> str:
+        sensor_id = f"sim-{self._next_id:05d}"
+        self._next_id += 1
+        zk = SimZooKeeperAdapter(self.args.hosts, sensor_id, self.recorder, self.args.session_timeout)
+        service = SensorService(
+            sensor_id=sensor_id,
+            zk_adapter=zk,
+            http_adapter=StubHttpApiAdapter(self.recorder, self.args.api_latency),
+            round_interval=self.args.round_interval,
+            timebox=self.args.timebox,
+            scorer=EdgeScorer(summary_every=self.args.edge_summary_every) if self.args.edge_scoring else None,
+        )
+        service.start()
+        self.services[sensor_id] = service
+        with self.recorder.lock:
+            self.recorder.alive = len(self.services)
+        return sensor_id
+
+    def _kill(self, sensor_id: str):
+        service = self.services.pop(sensor_id)
+        service.stop()
+        with self.recorder.lock:
+            self.recorder.alive = len(self.services)
+
+    def _crash(self, sensor_id: str):
+        """
+        Caída abrupta: el nodo deja de hablar con ZooKeeper sin enviar CloseSession.
+        Sus znodos efímeros (candidatura, mediciones) siguen ahí hasta que el servidor
+        expira la sesión tras session_timeout, igual que cuando un proceso muere de verdad.
+        """
+        service = self.services.pop(sensor_id)
+        service.http_adapter.dead = True
+        # Los hilos del nodo no mueren con él: se les pide salir para que no reintenten en bucle
+        service._stop_event.set()
+        client = service.zk_adapter.zk_client
+        client.hosts = _UNREACHABLE
+        sock = getattr(client._connection, "_socket", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.crashed.append(service)
+        with self.recorder.lock:
+            self.recorder.alive = len(self.services)
+
+    def _next_kill_mode(self) -> str:
+        if self.args.kill_mode != "both":
+            return self.args.kill_mode
+        mode = KILL_MODES[self._kills % len(KILL_MODES)]
+        self._kills += 1
+        return mode
+
+    def _leader_id(self) -> Optional[str]:
+        for sensor_id, service in self.services.items():
+            if service.zk_adapter.am_i_leader():
+                return sensor_id
+        return None
+
+    def run(self) -> dict:
+        args = self.args
+        logging.warning(f"Arrancando {args.sensors} sensores virtuales...")
+        t0 = time.time()
+        for _ in range(args.sensors):
+            self._spawn()
+        startup = time.time() - t0
+        CountingKazooClient.ops.clear()
+
+        started = time.time()
+        next_kill = started + args.kill_leader_every if args.kill_leader_every else math.inf
+        next_churn = started + args.churn_every if args.churn else math.inf
+        while time.time() - started < args.duration:
+            time.sleep(0.2)
+            now = time.time()
+            if now >= next_kill:
+                leader = self._leader_id()
+                if leader:
+                    mode = self._next_kill_mode()
+                    logging.warning(f"💥 Matando al líder {leader} ({mode})")
+                    with self.recorder.lock:
+                        self.recorder.kills.append((time.time(), mode))
+                    if mode == "hard":
+                        self._crash(leader)
+                    else:
+                        self._kill(leader)
+                    self._spawn()
+                next_kill = now + args.kill_leader_every
+            if now >= next_churn:
+                followers = [s for s in self.services if s != self._leader_id()]
+                for sensor_id in random.sample(followers, min(args.churn, len(followers))):
+                    self._kill(sensor_id)
+                for _ in range(args.churn):
+                    self._spawn()
+                next_churn = now + args.churn_every
+
+        ops = dict(CountingKazooClient.ops)
+        for sensor_id in list(self.services):
+            self._kill(sensor_id)
+        for service in self.crashed:
+            try:
+                service.zk_adapter.stop()
+            except Exception:
+                pass
+        return self._report(startup, ops)
+
+    def _report(self, startup: float, ops: dict) -> dict:
+        rec = self.recorder
+        rounds = [r for r in rec.rounds.values() if "trigger" in r]
+        coordination = sorted(
+            (r["last_publish"] - r["trigger"]) * 1000 for r in rounds if r.get("last_publish")
+        )
+        end_to_end = sorted((r["sent"] - r["trigger"]) * 1000 for r in rounds if r.get("sent"))
+        completeness = sorted(r["measurements"] / r["alive"] for r in rounds if r.get("alive") and "measurements" in r)
+
+        failovers = []
+        for kill, mode in rec.kills:
+            trigger = next((t for t in rec.triggers if t > kill), None)
+            send = next((t for t in rec.sends if t > kill), None)
+            failovers.append({
+                "modo": mode,
+                "hasta_trigger_s": trigger - kill if trigger else None,
+                "hasta_envio_s": send - kill if send else None,
+            })
+
+        def pct(values, q):
+            if not values:
+                return None
+            return values[max(1, math.ceil(q / 100 * len(values))) - 1]
+
+        # Una parada limpia libera los znodos al instante; un crash espera a la expiración de sesión
+        failover_por_modo = {}
+        for mode in sorted({f["modo"] for f in failovers}):
+            caidas_modo = [f for f in failovers if f["modo"] == mode]
+            failover_por_modo[mode] = {"caidas": len(caidas_modo)}
+            for campo in ("hasta_trigger_s", "hasta_envio_s"):
+                valores = sorted(f[campo] for f in caidas_modo if f[campo] is not None)
+                failover_por_modo[mode][campo] = {"p50": pct(valores, 50), "max": valores[-1] if valores else None}
+
+        return {
+            "sensores": self.args.sensors,
+            "arranque_s": startup,
+            "rondas": len(rounds),
+            "latencia_coordinacion_ms": {"p50": pct(coordination, 50), "p95": pct(coordination, 95), "p99": pct(coordination, 99)},
+            "latencia_ronda_ms": {"p50": pct(end_to_end, 50), "p95": pct(end_to_end, 95), "p99": pct(end_to_end, 99)},
+            "completitud": {
+                "media": sum(completeness) / len(completeness) if completeness else None,
+                "p5": pct(completeness, 5),
+            },
+            "failovers": failovers,
+            "failover_por_modo": failover_por_modo,
+            "envios_api": len(rec.sends),
+            "lecturas_reenviadas": rec.forwarded,
+            "ops_zookeeper_total": sum(ops.values()),
+            "ops_zookeeper_por_ronda": sum(ops.values()) / len(rounds) if rounds else None,
+            "ops_zookeeper_por_tipo": ops,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador de clúster de sensores en un solo proceso.")
+    parser.add_argument("--hosts", default="127.0.0.1:2181", help="ZooKeeper local")
+    parser.add_argument("--zk-harness", action="store_true", help="Levantar ZooKeeper con el harness de kazoo")
+    parser.add_argument("--sensors", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=60, help="Segundos de simulación")
+    parser.add_argument("--round-interval", type=float, default=2.0)
+    parser.add_argument("--timebox", type=float, default=1.0)
+    parser.add_argument("--session-timeout", type=float, default=10.0)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Latencia simulada de la API (s)")
+    parser.add_argument("--kill-leader-every", type=float, default=0, help="Matar al líder cada N segundos (0 = nunca)")
+    parser.add_argument("--kill-mode", choices=("graceful", "hard", "both"), default="both",
+                        help="Caída del líder: parada limpia, crash (expira la sesión) o alternar")
+    parser.add_argument("--churn", type=int, default=0, help="Seguidores que se reemplazan en cada rotación")
+    parser.add_argument("--churn-every", type=float, default=15.0)
+    parser.add_argument("--edge-scoring", action="store_true", help="Activar el pre-scoring en el líder")
+    parser.add_argument("--edge-summary-every", type=int, default=4, help="Rondas normales por resumen")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Fichero JSON con el informe")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # Con cientos de sensores el log INFO de cada nodo es ruido: solo avisos
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    # take_measurement usa np.random: sin sembrarlo las lecturas no son reproducibles
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+
+    cluster = None
+    if args.zk_harness:
+        from kazoo.testing.harness import get_global_cluster
+        cluster = get_global_cluster()
+        cluster.start()
+        args.hosts = cluster[0].address
+
+    # La raíz aislada debe existir antes de que los clientes hagan chroot
+    bootstrap = KazooClient(hosts=args.hosts)
+    bootstrap.start()
+    bootstrap.ensure_path(_CHROOT)
+    bootstrap.stop()
+    bootstrap.close()
+
+    try:
+        report = ClusterSimulator(args).run()
+    finally:
+        if cluster is not None:
+            cluster.terminate()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import types
+
+import pytest
+
+from src.domain.models import ConfiguracionCluster
+from src.infrastructure.cluster_config import (
+    ConfigCache, config_desde_documento, es_nueva, generacion_znode, parse_config, serialize_config
+)
+
+
+def _stat(czxid, ctime):
+    return types.SimpleNamespace(czxid=czxid, ctime=ctime)
+
+
+def test_generacion_identifica_el_znode():
+    assert generacion_znode(None) is None
+    assert generacion_znode(_stat(0x1A, 1000)) == "1a-1000"
+    # Mismo czxid en un clúster recreado: el ctime los distingue
+    assert generacion_znode(_stat(0x1A, 1000)) != generacion_znode(_stat(0x1A, 2000))
+
+
+@pytest.mark.parametrize("version, generacion, vigente, generacion_vigente, esperado", [
+    (3, "a", 2, "a", True),      # Mismo znode: solo versiones mayores
+    (2, "a", 2, "a", False),
+    (1, "a", 2, "a", False),
+    (1, "b", 7, "a", True),      # Znode recreado (ZooKeeper reiniciado): manda aunque sea menor
+    (7, "b", 7, "a", True),
+    (1, None, 2, "a", False),    # Sin generación en la notificación: se compara la versión
+    (1, "a", 7, None, True),     # Caché antigua sin generación: basta con que difiera
+    (7, "a", 7, None, False),
+    (1, "a", 0, None, True),     # Arranque sin caché
+])
+def test_es_nueva(version, generacion, vigente, generacion_vigente, esperado):
+    config = ConfiguracionCluster(version=version)
+    assert es_nueva(config, generacion, vigente, generacion_vigente) is esperado
+
+
+def test_parse_config_ignora_claves_desconocidas():
+    config = parse_config(b'{"version":3,"sampling_period":15,"api_url":"https://api/x","futuro":1}')
+    assert config == ConfiguracionCluster(version=3, sampling_period=15, api_url="https://api/x")
+
+
+@pytest.mark.parametrize("data", [
+    b"no es json",
+    b"\xff\xfe",
+    b"[1, 2]",
+    b'{"version":"3"}',
+    b'{"version":true}',
+    b'{"version":-1}',
+    b'{"version":1,"sampling_period":"15"}',
+    b'{"version":1,"timebox":0}',
+    b'{"version":1,"timebox":false}',
+    b'{"version":1,"api_url":"ftp://x"}',
+    b'{"version":1,"summary_every":0}',
+    b'{"version":1,"summary_every":2.5}',
+])
+def test_parse_config_rechaza_el_documento_entero(data):
+    assert parse_config(data) is None
+
+
+def test_config_desde_documento_lanza_valueerror():
+    with pytest.raises(ValueError):
+        config_desde_documento({"version": 1, "sampling_period": -5})
+
+
+def test_cache_conserva_version_y_generacion(tmp_path):
+    path = tmp_path / "sub" / "config.json"
+    config = ConfiguracionCluster(version=4, sampling_period=10.0, summary_every=3)
+    ConfigCache(str(path)).save(config, "1a-1000")
+
+    cache = ConfigCache(str(path))
+    assert cache.load() == config
+    assert (cache.version, cache.generacion) == (4, "1a-1000")
+    # La generación no es un campo de la configuración: los sensores la ignoran al parsear
+    assert parse_config(serialize_config(config, "1a-1000")) == config
+
+
+def test_cache_inexistente_o_corrupta(tmp_path):
+    assert ConfigCache(str(tmp_path / "nada.json")).load() is None
+    corrupta = tmp_path / "corrupta.json"
+    corrupta.write_bytes(b'{"version":1,"timebox":"x"}')
+    cache = ConfigCache(str(corrupta))
+    assert cache.load() is None
+    assert (cache.version, cache.generacion) == (0, None)
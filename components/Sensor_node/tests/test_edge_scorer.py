@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.application.edge_scorer import EdgeScorer, EvaluacionRonda
+from src.domain.models import Medicion
+
+
+def _ronda(valores):
+    return [Medicion(sensor_id=f"s{i}", valor=v, timestamp=datetime.now()) for i, v in enumerate(valores)]
+
+
+def _evaluacion(agregado):
+    return EvaluacionRonda(sospechosas=[], agregado=agregado, mediana=agregado, mad=0.0, n=1)
+
+
+def test_ronda_vacia():
+    evaluacion = EdgeScorer().score([])
+    assert evaluacion.n == 0 and evaluacion.agregado is None and not evaluacion.sospechosas
+
+
+def test_outlier_entre_sensores_se_excluye_del_agregado():
+    scorer = EdgeScorer(z_threshold=3.5)
+    evaluacion = scorer.score(_ronda([50.0, 50.4, 49.8, 50.1, 49.9, 90.0]))
+    assert [m.sensor_id for m, _ in evaluacion.sospechosas] == ["s5"]
+    assert "z_ronda" in evaluacion.sospechosas[0][1]
+    assert evaluacion.mediana == pytest.approx(50.05)
+    assert evaluacion.agregado == pytest.approx(np.mean([50.0, 50.4, 49.8, 50.1, 49.9]))
+
+
+def test_con_pocos_sensores_no_se_usa_la_mad_de_la_ronda():
+    evaluacion = EdgeScorer().score(_ronda([50.0, 95.0]))
+    assert not evaluacion.sospechosas
+    assert evaluacion.agregado == pytest.approx(72.5)
+
+
+def test_banda_del_propio_sensor():
+    # Un único sensor: solo puede saltar su banda histórica (no hay ronda con la que comparar)
+    scorer = EdgeScorer(band_k=4.0)
+    rng = np.random.default_rng(3)
+    for v in rng.normal(50.0, 1.0, EdgeScorer._MIN_HISTORIA):
+        assert not scorer.score(_ronda([v])).sospechosas
+    evaluacion = scorer.score(_ronda([70.0]))
+    assert len(evaluacion.sospechosas) == 1
+    assert "banda" in evaluacion.sospechosas[0][1]
+
+
+def test_la_tabla_de_historia_crece_con_nuevos_sensores():
+    scorer = EdgeScorer(capacity=2)
+    evaluacion = scorer.score(_ronda([50.0, 50.1, 49.9, 50.2, 49.8]))
+    assert evaluacion.n == 5
+    assert scorer._history.shape[0] >= 5
+
+
+def test_accumulate_devuelve_el_resumen_al_completar_la_ventana():
+    scorer = EdgeScorer(summary_every=3)
+    assert scorer.accumulate("r1", _evaluacion(10.0)) is None
+    assert scorer.accumulate("r2", _evaluacion(20.0)) is None
+    resumen = scorer.accumulate("r3", _evaluacion(60.0))
+    assert resumen.rondas == 3 and resumen.round_ids == ["r1", "r2", "r3"]
+    assert (resumen.media, resumen.minimo, resumen.maximo) == (30.0, 10.0, 60.0)
+
+
+def test_sin_confirmar_el_resumen_se_reintenta_con_la_siguiente_ronda():
+    scorer = EdgeScorer(summary_every=2)
+    scorer.accumulate("r1", _evaluacion(1.0))
+    assert scorer.accumulate("r2", _evaluacion(2.0)).rondas == 2
+    # Envío fallido: no se confirma y la ventana sigue ahí
+    resumen = scorer.accumulate("r3", _evaluacion(3.0))
+    assert resumen.round_ids == ["r1", "r2", "r3"]
+    scorer.confirm(resumen)
+    assert scorer.flush() is None
+
+
+def test_confirm_conserva_las_rondas_posteriores_al_resumen():
+    scorer = EdgeScorer(summary_every=10)
+    scorer.accumulate("r1", _evaluacion(1.0))
+    resumen = scorer.flush()
+    scorer.accumulate("r2", _evaluacion(2.0))
+    scorer.confirm(resumen)
+    assert scorer.flush().round_ids == ["r2"]
+
+
+def test_flush_no_vacia_la_ventana():
+    scorer = EdgeScorer(summary_every=10)
+    assert scorer.flush() is None
+    scorer.accumulate("r1", _evaluacion(5.0))
+    assert scorer.flush().round_ids == ["r1"]
+    assert scorer.flush().round_ids == ["r1"]
+
+
+def test_ronda_sin_agregado_no_se_acumula():
+    scorer = EdgeScorer(summary_every=1)
+    assert scorer.accumulate("r1", _evaluacion(None)) is None
+    assert scorer.flush() is None
@@ -1,23 +1,86 @@
-from kazoo.client import KazooClient
+import argparse
+import json
+import os
 import sys
 
-if len(sys.argv) != 3:
-    print("Uso: python init_config.py <sampling_period> <api_url>")
-    sys.exit(1)
+from kazoo.client import KazooClient
+from kazoo.exceptions import BadVersionError, NodeExistsError, NoNodeError
 
-sampling_period = sys.argv[1]
-api_url = sys.argv[2]
+# Mismo znode y misma validación que el nodo sensor: no se publica nada que los sensores rechacen
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "Sensor_node"))
+from src.infrastructure.cluster_config import CONFIG_PATH, config_desde_documento  # noqa: E402
 
-# Se conecta al clúster que tienes en Docker a través de localhost
-client = KazooClient(hosts="127.0.0.1:2181")
-client.start()
+parser = argparse.ArgumentParser(
+    description="Publica una nueva versión de la configuración del clúster en un único znode.",
+    epilog="Los campos no indicados conservan su valor de la versión anterior."
+)
+parser.add_argument("sampling_period", nargs="?", type=float, help="Intervalo entre rondas del líder (s)")
+parser.add_argument("api_url", nargs="?", help="Endpoint de la API de detección")
+parser.add_argument("--timebox", type=float, help="Ventana de recolección de cada ronda (s)")
+parser.add_argument("--summary-every", type=int, help="Rondas por resumen del pre-scoring en el líder")
+parser.add_argument("--hosts", default="127.0.0.1:2181", help="ZooKeeper (por defecto, el clúster de Docker en localhost)")
+parser.add_argument("--force", action="store_true",
+                    help="Sobrescribir un documento actual ilegible (se parte solo de los campos indicados)")
+args = parser.parse_args()
 
-# Crear/actualizar configuración en ZooKeeper
+cambios = {
+    "sampling_period": args.sampling_period, "api_url": args.api_url,
+    "timebox": args.timebox, "summary_every": args.summary_every,
+}
+cambios = {k: v for k, v in cambios.items() if v is not None}
+if not cambios:
+    parser.error("Indica al menos un parámetro de configuración.")
+
+client = KazooClient(hosts=args.hosts)
+client.start()
 client.ensure_path("/config")
-client.ensure_path("/config/sampling_period")
-client.set("/config/sampling_period", sampling_period.encode("utf-8"))
-client.ensure_path("/config/api_url")
-client.set("/config/api_url", api_url.encode("utf-8"))
 
-print(f"Configuración inicializada: período={sampling_period}s, url={api_url}")
-client.stop()
\ No newline at end of file
+
+def salir(mensaje: str):
+    client.stop()
+    raise SystemExit(mensaje)
+
+
+# Compare-and-set: si otro operador publica a la vez, se relee y se reintenta sobre su versión
+while True:
+    try:
+        data, stat = client.get(CONFIG_PATH)
+    except NoNodeError:
+        data, stat = None, None
+
+    try:
+        actual = json.loads(data.decode("utf-8")) if data else {}
+        version_actual = actual.get("version", 0) if isinstance(actual, dict) else None
+        if not isinstance(version_actual, int) or isinstance(version_actual, bool):
+            raise ValueError("no es un objeto JSON con una versión entera")
+        version = version_actual + 1
+    except (UnicodeDecodeError, ValueError) as e:
+        if not args.force:
+            salir(f"El documento actual de {CONFIG_PATH} es ilegible ({e}). "
+                  f"Corrígelo o usa --force para sustituirlo por los campos indicados.")
+        # Cada set incrementa stat.version: la nueva versión supera a cualquiera publicada con esta herramienta
+        actual, version = {}, stat.version + 1
+
+    documento = {**actual, **cambios, "version": version}
+    try:
+        config_desde_documento(documento)
+    except (ValueError, TypeError) as e:
+        salir(f"Configuración inválida, no se publica: {e}")
+    payload = json.dumps(documento, separators=(",", ":")).encode("utf-8")
+
+    transaction = client.transaction()
+    if stat is None:
+        transaction.create(CONFIG_PATH, payload)
+    else:
+        transaction.check(CONFIG_PATH, stat.version)
+        transaction.set_data(CONFIG_PATH, payload)
+    resultados = transaction.commit()
+    fallo = next((r for r in resultados if isinstance(r, Exception)), None)
+    if isinstance(fallo, (BadVersionError, NodeExistsError)):
+        continue
+    if fallo is not None:
+        salir(f"No se pudo publicar la configuración: {fallo!r}")
+    break
+
+print(f"Configuración publicada en {CONFIG_PATH} (versión {documento['version']}): {documento}")
+client.stop()
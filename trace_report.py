@@ -0,0 +1,113 @@
+import argparse
+import json
+import math
+import sys
+from collections import defaultdict
+
+# Fases de una ronda, en orden de ejecución
+PHASES = [
+    # Empieza en el mtime del trigger en ZooKeeper: incluye la entrega del watch al seguidor
+    ("seguidor.publicacion", "Seguidores: trigger -> medición publicada (máx. por ronda)"),
+    ("lider.recoleccion", "Líder: trigger + timebox + lectura de mediciones"),
+    ("lider.envio_http", "Líder: envío HTTP (transporte + inferencia)"),
+    ("transporte", "Red + colas HTTP (envío - inferencia)"),
+    ("api.persistencia", "API: guardado en Redis"),
+    ("api.votacion", "API: votación del ensemble"),
+    ("api.inferencia", "API: procesamiento completo"),
+    ("lider.ronda", "Ronda completa vista por el líder"),
+]
+
+
+def percentile(sorted_values, q):
+    """Percentil por rango más cercano (sin dependencias)."""
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def load_spans(paths):
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for n, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    print(f"Aviso: línea {n} de {path} no es JSON válido, se ignora.", file=sys.stderr)
+    return spans
+
+
+def breakdown(spans):
+    """Agrupa los spans por round_id y obtiene la duración (ms) de cada fase."""
+    rounds = defaultdict(lambda: defaultdict(list))
+    for span in spans:
+        rounds[span["round_id"]][span["name"]].append(span)
+
+    result = {}
+    for round_id, by_name in rounds.items():
+        phases = {}
+        for name, items in by_name.items():
+            # Varios seguidores por ronda: el más lento es el que marca el ritmo
+            phases[name] = max(s["duration_ms"] for s in items)
+        if "lider.envio_http" in phases and "api.inferencia" in phases:
+            phases["transporte"] = max(0.0, phases["lider.envio_http"] - phases["api.inferencia"])
+        starts = [s["start"] for items in by_name.values() for s in items]
+        ends = [s["end"] for items in by_name.values() for s in items]
+        result[round_id] = {"start": min(starts), "end_to_end_ms": (max(ends) - min(starts)) * 1000, "phases": phases}
+    return result
+
+
+def percentiles(rounds):
+    table = {}
+    for name, _ in PHASES + [("end_to_end", "")]:
+        if name == "end_to_end":
+            values = [r["end_to_end_ms"] for r in rounds.values()]
+        else:
+            values = [r["phases"][name] for r in rounds.values() if name in r["phases"]]
+        if not values:
+            continue
+        values.sort()
+        table[name] = {
+            "n": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": values[-1],
+        }
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Desglose de latencias por ronda a partir de ficheros de spans (JSONL).")
+    parser.add_argument("files", nargs="+", help="Ficheros TRACE_FILE de sensores y API")
+    parser.add_argument("--rondas", type=int, default=0, help="Muestra el desglose de las últimas N rondas")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    rounds = breakdown(load_spans(args.files))
+    if not rounds:
+        print("No se encontraron spans.")
+        sys.exit(1)
+    table = percentiles(rounds)
+
+    if args.json:
+        print(json.dumps({"rondas": len(rounds), "percentiles_ms": table}, indent=2))
+        return
+
+    descriptions = dict(PHASES + [("end_to_end", "Extremo a extremo (relojes de varios hosts)")])
+    print(f"Rondas analizadas: {len(rounds)}\n")
+    print(f"{'fase':<22}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for name, row in table.items():
+        print(f"{name:<22}{row['n']:>6}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}{row['max']:>10.1f}  {descriptions[name]}")
+
+    if args.rondas:
+        print(f"\nÚltimas {args.rondas} rondas:")
+        for round_id, r in sorted(rounds.items(), key=lambda kv: kv[1]["start"])[-args.rondas:]:
+            detail = ", ".join(f"{k}={v:.1f}" for k, v in r["phases"].items())
+            print(f"  {round_id}  e2e={r['end_to_end_ms']:.1f}ms  {detail}")
+
+
+if __name__ == "__main__":
+    main()